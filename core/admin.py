@@ -1,16 +1,23 @@
 from decimal import Decimal
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
 from django.db import transaction
+from django.utils import timezone
+from django.urls import reverse
 from django.utils.html import format_html
 
-from . import models
+from . import broadcast, jobs, models
+from .pagination import AFTER_VAR, BEFORE_VAR, EstimatedCountPaginator
+from .search import search_queryset
 # Telegram‑уведомления
 from .notifications import (
     notify_new_user,
     notify_referral_signup,
     notify_balance_credit,
     notify_withdraw_request,
+    notify_withdrawal_request_admin,
     notify_withdrawal_confirmed,
+    notify_user_withdrawal_confirmed,
     notify_deposit_request_created,
     notify_deposit_request_confirmed,
     notify_referral_bonus,
@@ -21,17 +28,94 @@ from .notifications import (
 
 
 
-# Регистрируем модели без кастомных классов
-admin.site.register(models.DailyReport)
-admin.site.register(models.ScooterStats)
+class KeysetChangeList(ChangeList):
+    """
+    Changelist со ссылками «назад/дальше» по курсору (?after= / ?before=),
+    см. EstimatedCountPaginator. Курсоры — не фильтры, и в ссылки
+    на другие страницы, сортировку и фильтры они не переносятся.
+    """
+    KEYSET_PARAMS = (AFTER_VAR, BEFORE_VAR)
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        for name in self.KEYSET_PARAMS:
+            params.pop(name, None)
+        return params
+
+    def get_query_string(self, new_params=None, remove=None):
+        return super().get_query_string(new_params, [*(remove or ()), *self.KEYSET_PARAMS])
+
+    def get_results(self, request):
+        super().get_results(request)
+        page = getattr(self.paginator, 'last_page', None)
+        self.previous_url = self.next_url = None
+        if page is None or (self.show_all and self.can_show_all):
+            return
+        if page.previous_before is not None:
+            self.previous_url = self.get_query_string({PAGE_VAR: page.number - 1, BEFORE_VAR: page.previous_before})
+        if page.next_after is not None:
+            self.next_url = self.get_query_string({PAGE_VAR: page.number + 1, AFTER_VAR: page.next_after})
+
+
+class LargeTableAdminMixin:
+    """
+    Общие настройки для таблиц, которые растут вместе с числом пользователей:
+    без точного COUNT(*), keyset-пагинация по pk, пользователь выбирается
+    по id, а не выпадающим списком из всех auth_user.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ('-pk',)
+    raw_id_fields = ('user',)
+    change_list_template = 'admin/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            after=request.GET.get(AFTER_VAR), before=request.GET.get(BEFORE_VAR),
+        )
+
+
+class IndexedSearchMixin:
+    """
+    Поиск в changelist через core.search (FTS5 / pg_trgm) вместо
+    icontains по search_fields. search_fields нужны только для того,
+    чтобы админка показала строку поиска.
+    """
+    search_user_field = 'user'
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return search_queryset(queryset, search_term, user_field=self.search_user_field), False
+
+
+@admin.register(models.DailyReport)
+class DailyReportAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'report_date', 'total_distance', 'number_of_trips', 'profit_amount', 'profit_percentage')
+    search_fields = ('user__username',)
+    list_select_related = ('user',)
+    date_hierarchy = 'report_date'
+
+
+@admin.register(models.ScooterStats)
+class ScooterStatsAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'report_date', 'scooter_number', 'distance', 'trips', 'profit', 'percentage')
+    search_fields = ('user__username',)
+    list_select_related = ('user',)
+    date_hierarchy = 'report_date'
 
 
 @admin.register(models.Profile)
-class ProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'balance', 'wallet', 'invited_by')
+class ProfileAdmin(IndexedSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'balance', 'wallet', 'invited_by', 'telegram_chat_id')
     # Убрали 'level' — больше не ломает админку
     search_fields = ('user__username', 'wallet')
     list_select_related = ('user', 'invited_by')
+    raw_id_fields = ('user', 'invited_by')
 
 
     def save_model(self, request, obj, form, change):
@@ -44,11 +128,12 @@ class ProfileAdmin(admin.ModelAdmin):
 
 
 @admin.register(models.Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(IndexedSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'type', 'amount', 'created_at', 'comment')
     list_filter = ('type', 'created_at')
     search_fields = ('user__username', 'comment')
     list_select_related = ('user',)
+    date_hierarchy = 'created_at'
 
     def save_model(self, request, obj, form, change):
         is_new = obj.pk is None
@@ -83,100 +168,58 @@ class ScooterLevelAdmin(admin.ModelAdmin):
     display_photo.short_description = 'Фото'
 
 
-def distribute_referral_bonuses(user, deposit_amount):
-    """
-    Начисляет реферальные бонусы 3‑х уровней и шлёт notify_referral_bonus.
-    """
-    try:
-        profile = models.Profile.objects.select_related('invited_by__profile').get(user=user)
-        ref = profile.invited_by
-        for lvl, pct in enumerate([Decimal('0.09'), Decimal('0.03'), Decimal('0.01')], start=1):
-            if not ref:
-                break
-            bonus = deposit_amount * pct
-            with transaction.atomic():
-                ref.profile.balance += bonus
-                ref.profile.save()
-                models.Transaction.objects.create(
-                    user=ref,
-                    type='referral',
-                    amount=bonus,
-                    comment=f'Бонус {pct*100:.0f}% за Level {lvl} (от {user.username})'
-                )
-            notify_referral_bonus(ref, bonus, lvl)
-            ref = ref.profile.invited_by
-    except models.Profile.DoesNotExist:
-        pass
-
-
 @admin.register(models.BuyRequest)
-class BuyRequestAdmin(admin.ModelAdmin):
+class BuyRequestAdmin(IndexedSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'level', 'status', 'created_at')
     list_filter = ('status', 'level')
     search_fields = ('user__username',)
+    list_select_related = ('user', 'level')
+    date_hierarchy = 'created_at'
     actions = ['approve_selected_requests']
 
     @admin.action(description='✅ Одобрить выбранные запросы и начислить бонусы')
     def approve_selected_requests(self, request, queryset):
-        successful = 0
-        for req in queryset.filter(status='pending'):
-            user = req.user
-            lvl = req.level
-            try:
-                with transaction.atomic():
-                    # 1) создаём/обновляем самокат
-                    us, created = models.UserScooter.objects.get_or_create(
-                        user=user, level=lvl, defaults={'quantity': 1}
-                    )
-                    if not created:
-                        us.quantity += 1
-                        us.save()
-                    # 2) списываем за покупку
-                    models.Transaction.objects.create(
-                        user=user,
-                        type='buy',
-                        amount=-lvl.price,
-                        comment=f"Покупка Level {lvl.number}"
-                    )
-                    # 3) реферальные бонусы
-                    distribute_referral_bonuses(user, lvl.price)
-                    # 4) меняем статус и уведомляем
-                    req.status = 'approved'
-                    req.save()
-                    notify_buy_request_status_change(user, lvl.name, 'approved')
-                    successful += 1
-            except Exception as e:
-                self.message_user(
-                    request,
-                    f"Ошибка при обработке запроса {user.username}: {e}",
-                    level='error'
-                )
-        self.message_user(request, f"Успешно одобрено {successful} запросов.")
+        # Начисления и уведомления выполняет воркер (manage.py run_workers),
+        # запрос админки только ставит задачу в очередь
+        ids = list(queryset.filter(status='pending').values_list('pk', flat=True))
+        if not ids:
+            self.message_user(request, "Нет запросов в ожидании.", level='warning')
+            return
+        job = jobs.enqueue('core.approve_buy_requests', {'request_ids': ids})
+        url = reverse('admin:core_job_change', args=[job.pk])
+        self.message_user(
+            request,
+            format_html('Задача <a href="{}">#{}</a> поставлена в очередь: {} запросов.', url, job.pk, len(ids)),
+        )
 
 
 @admin.register(models.UserScooter)
-class UserScooterAdmin(admin.ModelAdmin):
+class UserScooterAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'level', 'quantity', 'purchase_date')
     list_filter = ('purchase_date', 'level')
     search_fields = ('user__username',)
     list_editable = ('quantity',)
     list_select_related = ('user', 'level')
+    date_hierarchy = 'purchase_date'
 
 
 @admin.register(models.WithdrawalRequest)
-class WithdrawalRequestAdmin(admin.ModelAdmin):
+class WithdrawalRequestAdmin(IndexedSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'amount', 'wallet_address', 'status', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('user__username', 'wallet_address')
     list_editable = ('status',)
+    list_select_related = ('user',)
+    date_hierarchy = 'created_at'
 
     def save_model(self, request, obj, form, change):
         if 'status' in form.changed_data:
             with transaction.atomic():
                 if obj.status == 'pending':
-                    notify_withdraw_request(obj)
+                    notify_withdrawal_request_admin(obj)
                 elif obj.status == 'approved':
                     notify_withdrawal_confirmed(obj)
+                    notify_user_withdrawal_confirmed(obj)
                     models.Transaction.objects.create(
                         user=obj.user,
                         type='withdraw',
@@ -195,3 +238,122 @@ class WithdrawalRequestAdmin(admin.ModelAdmin):
                         comment="Возврат после отклонения вывода"
                     )
         super().save_model(request, obj, form, change)
+
+
+@admin.register(models.Job)
+class JobAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'task', 'status', 'progress_display', 'attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'task')
+    date_hierarchy = 'created_at'
+    raw_id_fields = ()
+    readonly_fields = (
+        'task', 'payload', 'status', 'attempts', 'max_attempts', 'progress', 'progress_total',
+        'result', 'last_error', 'locked_by', 'locked_at', 'created_at', 'finished_at',
+    )
+    fields = ('priority', 'run_at') + readonly_fields
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Прогресс')
+    def progress_display(self, obj):
+        if not obj.progress_total:
+            return '—'
+        return f"{obj.progress}/{obj.progress_total} ({obj.progress * 100 // obj.progress_total}%)"
+
+    @admin.action(description='🔁 Перезапустить выбранные задачи')
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status='running').update(
+            status='queued', attempts=0, run_at=timezone.now(), finished_at=None, last_error='',
+        )
+        self.message_user(request, f"Перезапущено задач: {count}.")
+
+
+@admin.register(models.JobSchedule)
+class JobScheduleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'task', 'cron', 'enabled', 'next_run_at', 'last_run_at')
+    list_editable = ('enabled',)
+
+    def save_model(self, request, obj, form, change):
+        # Пересчитываем время следующего запуска при изменении cron
+        obj.next_run_at = jobs.next_run(obj)
+        super().save_model(request, obj, form, change)
+
+
+@admin.register(models.OutboxMessage)
+class OutboxMessageAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'status', 'category', 'priority', 'short_text', 'attempts', 'created_at', 'sent_at', 'next_attempt_at')
+    list_filter = ('status', 'category')
+    date_hierarchy = 'created_at'
+    raw_id_fields = ()
+    readonly_fields = (
+        'text', 'category', 'amount', 'digest', 'delivered_to', 'attempts', 'last_error',
+        'locked_at', 'created_at', 'sent_at',
+    )
+    actions = ['retry_messages']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Текст')
+    def short_text(self, obj):
+        return obj.text[:80]
+
+    @admin.action(description='🔁 Отправить повторно')
+    def retry_messages(self, request, queryset):
+        count = queryset.filter(status='failed').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"Возвращено в очередь: {count}.")
+
+
+@admin.register(models.BroadcastCampaign)
+class BroadcastCampaignAdmin(admin.ModelAdmin):
+    list_display = ('name', 'audience', 'status', 'total', 'sent', 'failed', 'throughput', 'created_at', 'finished_at')
+    list_filter = ('status', 'audience')
+    readonly_fields = ('status', 'total', 'sent', 'failed', 'metrics_display', 'created_at', 'started_at', 'finished_at')
+    actions = ['start_campaigns', 'pause_campaigns']
+
+    @admin.display(description='msg/s')
+    def throughput(self, obj):
+        return broadcast.metrics(obj)['throughput'] if obj.started_at else '—'
+
+    @admin.display(description='Метрики')
+    def metrics_display(self, obj):
+        if not obj.pk:
+            return '—'
+        m = broadcast.metrics(obj)
+        return (
+            f"{m['sent']} из {m['total']} отправлено, ошибок {m['failed']} ({m['failure_rate']:.1%}), "
+            f"{m['throughput']} msg/s за {m['elapsed_seconds']} с; по статусам: {m['by_status']}"
+        )
+
+    @admin.action(description='🚀 Запустить / продолжить')
+    def start_campaigns(self, request, queryset):
+        started = 0
+        for campaign in queryset.exclude(status__in=['running', 'done']):
+            broadcast.start(campaign)
+            started += 1
+        self.message_user(request, f"Запущено рассылок: {started}. Отправку выполняет run_workers.")
+
+    @admin.action(description='⏸ Поставить на паузу')
+    def pause_campaigns(self, request, queryset):
+        paused = sum(broadcast.pause(campaign) for campaign in queryset)
+        self.message_user(request, f"На паузе: {paused}.")
+
+
+@admin.register(models.BroadcastRecipient)
+class BroadcastRecipientAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'campaign', 'user', 'chat_id', 'status', 'attempts', 'sent_at')
+    list_filter = ('status', 'campaign')
+    list_select_related = ('campaign', 'user')
+    readonly_fields = ('campaign', 'user', 'chat_id', 'attempts', 'error', 'locked_at', 'sent_at')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(models.ClaimReminder)
+class ClaimReminderAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'due_at', 'status', 'sent_at')
+    list_filter = ('status',)
+    list_select_related = ('user',)
@@ -0,0 +1,58 @@
+"""
+Сайт админки Zeepy: стандартный AdminSite + сводка KPI на главной.
+Подключается через core.apps.ZeepyAdminConfig вместо django.contrib.admin,
+поэтому @admin.register и admin.site продолжают работать как раньше.
+"""
+from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from . import catalog, forecast, outbox, rollups
+from .db import metrics as db_metrics
+from .forms import PayoutForecastForm
+
+
+class ZeepyAdminSite(admin.AdminSite):
+    site_header = "Zeepy — администрирование"
+    index_template = 'admin/zeepy_index.html'
+
+    def index(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        # Только сводные таблицы — без агрегатов по Transaction и заявкам
+        extra_context['kpis'] = rollups.platform_kpis()
+        extra_context['outbox'] = outbox.stats()
+        extra_context['db'] = db_metrics.snapshot()
+        return super().index(request, extra_context)
+
+    def get_urls(self):
+        return [
+            path('forecast/', self.admin_view(self.forecast_view), name='payout_forecast'),
+        ] + super().get_urls()
+
+    def forecast_view(self, request):
+        """Прогноз выплат по текущим самокатам и сценарий изменения уровней."""
+        if not request.user.has_perm('core.view_scooterlevel'):
+            raise PermissionDenied
+        levels = catalog.get_catalog().levels
+        form = PayoutForecastForm(request.POST or None, levels=levels)
+        baseline = result = None
+        if request.method == 'POST' and form.is_valid():
+            params = {
+                'days': form.cleaned_data['days'],
+                'simulations': form.cleaned_data['simulations'],
+                'claim_rate': float(form.cleaned_data['claim_rate']),
+                'seed': 0,
+            }
+            baseline = forecast.cached_forecast(**params)
+            overrides = form.overrides()
+            if overrides:
+                result = forecast.cached_forecast(overrides=overrides, **params)
+        context = {
+            **self.each_context(request),
+            'title': "Прогноз выплат",
+            'form': form,
+            'baseline': baseline,
+            'scenario': result,
+        }
+        return TemplateResponse(request, 'admin/payout_forecast.html', context)
@@ -0,0 +1,105 @@
+"""
+Асинхронные версии API начислений и заявок — для запуска под ASGI.
+
+    ASYNC_API=1 gunicorn zeepy.asgi:application -k uvicorn_worker.UvicornWorker
+
+Под WSGI процесс, пока ждёт БД в одном запросе, не обслуживает другие;
+под ASGI эти view — корутины, и воркер принимает следующие запросы, пока
+текущий ждёт. Чтения идут через асинхронный ORM (aexists, afirst).
+Синхронное остаётся синхронным и вызывается явно через sync_to_async:
+загрузка пользователя из сессии, каталог уровней и транзакции записи
+(atomic() в асинхронном коде недоступен) — это те же функции, что
+у синхронных view в core/views.py, так что правила у версий общие.
+Уведомления — записи в outbox внутри транзакции, HTTP к Telegram
+в запросе нет (его делает dispatch_outbox).
+
+Декораторы Django 4.2 (login_required, require_POST, csrf_exempt)
+корутины не поддерживают, поэтому проверки — в api_view.
+
+Выигрыш есть, только когда запрос в основном ждёт сеть (удалённая БД).
+На локальной SQLite, где ожидания нет, ASGI медленнее: в Django 4.2 ORM
+всё равно выполняется в одном потоке на воркер, и добавляются переходы
+sync_to_async. Замер — manage.py bench_api_concurrency (1 воркер,
+32 клиента, SQLite): WSGI 214 запросов/с, p95 370 мс; ASGI 106/с,
+p95 1304 мс. Поэтому по умолчанию ASYNC_API выключен, а деплой остаётся
+на WSGI до замера на PostgreSQL.
+"""
+import json
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import JsonResponse
+from django.utils import timezone
+
+from . import queries, views
+from .auth import request_profile
+from .catalog import get_level_or_404
+from .models import UserScooter
+
+
+def _load_user(request):
+    """Пользователь с профилем или None — в потоке, как и весь sync-код."""
+    user = request.user
+    if not user.is_authenticated:
+        return None, None
+    return user, request_profile(request)
+
+
+def api_view(methods=('POST',), csrf_exempt=False):
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            user, profile = await sync_to_async(_load_user)(request)
+            if user is None:
+                return redirect_to_login(request.get_full_path())
+            if request.method not in methods:
+                return JsonResponse({'status': 'error', 'message': 'Неверный метод'}, status=405)
+            return await view(request, user, profile, *args, **kwargs)
+
+        wrapper.csrf_exempt = csrf_exempt
+        return wrapper
+    return decorator
+
+
+@api_view(csrf_exempt=True)  # как и у синхронной версии — убрать по готовности фронта
+async def create_buy_request(request, user, profile):
+    data = json.loads(request.body)
+    level_id = data.get('level_id')
+    if not level_id:
+        return JsonResponse({'status': 'error', 'message': 'Level ID не указан'}, status=400)
+    level = await sync_to_async(get_level_or_404)(level_id)
+    await sync_to_async(views.save_buy_request)(user, level)
+    return JsonResponse({'status': 'success', 'message': 'Запрос успешно создан'})
+
+
+@api_view()
+async def claim_profit_view(request, user, profile):
+    if not await UserScooter.objects.filter(user=user).aexists():
+        return JsonResponse({'status': 'error', 'message': 'Нет активных самокатов'}, status=400)
+
+    last_tx = await queries.earnings(user).order_by('-created_at').afirst()
+    if not last_tx:
+        return JsonResponse(await sync_to_async(views.start_claims)(user, profile))
+    error = views.claim_cooldown_error(last_tx)
+    if error:
+        return JsonResponse(error, status=400)
+    data, status = await sync_to_async(views.credit_daily_profit)(user, profile)
+    return JsonResponse(data, status=status)
+
+
+@api_view()
+async def create_withdrawal_request(request, user, profile):
+    amount, wallet, error = views.parse_withdrawal(request.body, profile)
+    if error:
+        return JsonResponse(error, status=400)
+
+    since = timezone.now() - timedelta(hours=12)
+    if await queries.recent_withdrawals(user, since).aexists():
+        return JsonResponse({'status': 'error', 'message': 'Вывод можно делать раз в 12 часов'}, status=400)
+
+    error = await sync_to_async(views.save_withdrawal)(user, profile, amount, wallet)
+    if error:
+        return JsonResponse(error, status=400)
+    return JsonResponse({'status': 'success', 'new_balance': float(profile.balance)})
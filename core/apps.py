@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.contrib.admin import apps as admin_apps
 
 
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        from . import checks, signals, tasks  # noqa: F401
+
+
+class ZeepyAdminConfig(admin_apps.AdminConfig):
+    default = False
+    default_site = "core.admin_site.ZeepyAdminSite"
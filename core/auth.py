@@ -0,0 +1,34 @@
+"""
+Загрузка пользователя вместе с профилем.
+
+ProfileBackend.get_user() — его вызывает AuthenticationMiddleware на каждом
+запросе — читает auth_user JOIN core_profile одним запросом. Пользователь
+кэшируется на request (request._cached_user), профиль — на пользователе,
+поэтому request.user.profile до конца запроса обходится без запросов.
+Сессию нужно прочитать раньше, чтобы узнать, какого пользователя загружать:
+с Redis (REDIS_URL) она берётся из кэша, без него — отдельный запрос к
+django_session по ключу (см. settings). Итого на запрос — не больше двух
+запросов: сессия и пользователь с профилем.
+"""
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.http import Http404
+
+from .models import Profile
+
+
+class ProfileBackend(ModelBackend):
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.select_related('profile').get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+def request_profile(request):
+    """Профиль текущего пользователя; 404, если его нет (например, у суперпользователя)."""
+    try:
+        return request.user.profile
+    except Profile.DoesNotExist:
+        raise Http404("Профиль не найден")
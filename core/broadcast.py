@@ -0,0 +1,275 @@
+"""
+Рассылки пользователям в Telegram.
+
+    campaign = BroadcastCampaign.objects.create(name=..., text=...)
+    broadcast.start(campaign)   # задача core.run_broadcast в очереди
+    # или синхронно: manage.py run_broadcast <id>
+
+Писать можно только тем, кто привязал чат: пользователь получает в настройках
+одноразовую ссылку t.me/<бот>?start=<токен> (issue_link_token), нажимает
+/start, и sync_chat_ids() записывает chat_id в Profile.telegram_chat_id.
+sync_chat_ids запускается задачей core.sync_telegram_chats по расписанию
+раз в минуту (JobSchedule из миграции 0037) или вручную
+`manage.py sync_telegram_chats`.
+
+Получатели фиксируются при первом запуске строками BroadcastRecipient.
+Отправитель забирает их пачками (как outbox), шлёт через TelegramTransport
+— параллельно, в пределах лимитов Bot API — и отмечает результат каждого.
+Прерванная рассылка продолжается с того же места: отправленные повторно
+не шлются, зависшие в sending возвращаются в pending.
+"""
+import hashlib
+import logging
+import secrets
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BroadcastCampaign, BroadcastRecipient, Profile, TelegramLinkToken
+from .telegram import TelegramError
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+LOCK_TIMEOUT = timedelta(minutes=5)
+POPULATE_BATCH = 5000
+# Ошибки Bot API, после которых повторять бессмысленно
+PERMANENT_ERRORS = (400, 403)
+LINK_TOKEN_TTL = timedelta(minutes=15)
+
+
+# === Привязка чатов ===
+
+def _token_hash(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_link_token(user, replace=False):
+    """
+    Новая ссылка привязки для пользователя; прежние неиспользованные
+    перестают действовать. replace=True — разрешить замену уже привязанного
+    чата (выдавать только после повторного ввода пароля). -> токен
+    """
+    now = timezone.now()
+    token = secrets.token_urlsafe(24)  # в start-параметре допустимы A-Z a-z 0-9 _ -
+    with transaction.atomic():
+        # Удаляем, а не истекаем: срок сверяется со временем сообщения
+        TelegramLinkToken.objects.filter(user=user, used_at__isnull=True).delete()
+        TelegramLinkToken.objects.create(
+            user=user, token_hash=_token_hash(token), replace=replace, expires_at=now + LINK_TOKEN_TTL,
+        )
+    return token
+
+
+def link_url(token):
+    return f"https://t.me/{settings.TELEGRAM_BOT_USERNAME}?start={token}"
+
+
+def link_chat(token, chat_id, sent_at=None):
+    """
+    Привязывает чат по токену из /start. Токен одноразовый и с коротким
+    сроком; чужой или уже привязанный чат без replace не перезаписывается,
+    и чат остаётся привязан только к одному профилю. Срок сверяется со
+    временем сообщения sent_at, а не разбора: getUpdates может дойти до
+    него позже. -> True, если привязан.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        link = TelegramLinkToken.objects.select_for_update().filter(
+            token_hash=_token_hash(token), used_at__isnull=True, expires_at__gt=sent_at or now,
+        ).first()
+        if link is None:
+            return False
+        profile = Profile.objects.select_for_update().filter(user_id=link.user_id).first()
+        if profile is None:
+            return False
+        if profile.telegram_chat_id not in (None, chat_id) and not link.replace:
+            logger.warning("Профиль %s уже привязан к другому чату — нужна ссылка с подтверждением", profile.pk)
+            return False
+        link.used_at = now
+        link.chat_id = chat_id
+        link.save(update_fields=['used_at', 'chat_id'])
+        Profile.objects.filter(telegram_chat_id=chat_id).exclude(pk=profile.pk).update(telegram_chat_id=None)
+        profile.telegram_chat_id = chat_id
+        profile.save(update_fields=['telegram_chat_id'])
+    return True
+
+
+def sync_chat_ids(transport):
+    """
+    Разбирает getUpdates и привязывает чаты по /start <токен> из ссылки
+    issue_link_token(). Имя в Telegram и реферальный код для привязки
+    не годятся: их знают или могут выставить другие. Не работает, если
+    у бота настроен webhook. Возвращает число привязанных.
+    """
+    linked = 0
+    offset = None
+    while True:
+        params = {'timeout': 0, 'allowed_updates': ['message']}
+        if offset is not None:
+            params['offset'] = offset
+        updates = transport.call('getUpdates', **params)
+        if not updates:
+            return linked
+        for update in updates:
+            offset = update['update_id'] + 1
+            message = update.get('message') or {}
+            chat = message.get('chat') or {}
+            if chat.get('type', 'private') != 'private' or 'id' not in chat:
+                continue
+            parts = (message.get('text') or '').split()
+            if len(parts) == 2 and parts[0] == '/start':
+                sent_at = None
+                if 'date' in message:
+                    sent_at = datetime.fromtimestamp(message['date'], tz=dt_timezone.utc)
+                linked += link_chat(parts[1], chat['id'], sent_at)
+
+
+# === Рассылка ===
+
+def audience_queryset(campaign):
+    profiles = Profile.objects.filter(telegram_chat_id__isnull=False)
+    if campaign.audience == 'investors':
+        profiles = profiles.filter(user__userscooter__isnull=False).distinct()
+    return profiles
+
+
+def populate(campaign):
+    """Фиксирует список получателей (повторный вызов не создаёт дубликатов)."""
+    rows = audience_queryset(campaign).order_by('user_id').values_list('user_id', 'telegram_chat_id')
+    batch = []
+    for user_id, chat_id in rows.iterator(chunk_size=POPULATE_BATCH):
+        batch.append(BroadcastRecipient(campaign=campaign, user_id=user_id, chat_id=chat_id))
+        if len(batch) >= POPULATE_BATCH:
+            BroadcastRecipient.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    BroadcastRecipient.objects.bulk_create(batch, ignore_conflicts=True)
+    campaign.total = campaign.recipients.count()
+    BroadcastCampaign.objects.filter(pk=campaign.pk).update(total=campaign.total)
+    return campaign.total
+
+
+def start(campaign):
+    """Ставит рассылку (новую или на паузе) в очередь фоновых задач."""
+    from . import jobs
+    BroadcastCampaign.objects.filter(pk=campaign.pk).update(status='running')
+    return jobs.enqueue('core.run_broadcast', {'campaign_id': campaign.pk})
+
+
+def pause(campaign):
+    """Отправитель остановится после текущей пачки; start() продолжит."""
+    return BroadcastCampaign.objects.filter(pk=campaign.pk, status='running').update(status='paused')
+
+
+def recover_stale(campaign):
+    return campaign.recipients.filter(status='sending', locked_at__lt=timezone.now() - LOCK_TIMEOUT).update(
+        status='pending', locked_at=None,
+    )
+
+
+def claim(campaign, limit):
+    now = timezone.now()
+    ready = campaign.recipients.filter(status='pending').order_by('id')
+    update = {'status': 'sending', 'locked_at': now, 'attempts': F('attempts') + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            BroadcastRecipient.objects.filter(pk__in=ids).update(**update)
+    else:
+        ids = list(ready.values_list('pk', flat=True)[:limit])
+        # Пачкой: строки, которые успел забрать другой отправитель, не обновятся
+        BroadcastRecipient.objects.filter(pk__in=ids, status='pending').update(**update)
+        ids = list(BroadcastRecipient.objects.filter(pk__in=ids, status='sending', locked_at=now).values_list('pk', flat=True))
+    return list(BroadcastRecipient.objects.filter(pk__in=ids).order_by('id'))
+
+
+def send_batch(campaign, recipients, transport):
+    """Отправляет пачку и записывает результаты. Возвращает (отправлено, ошибок)."""
+    results = transport.send_many([(r.chat_id, campaign.text) for r in recipients])
+    now = timezone.now()
+    sent, retry, failed, blocked = [], [], {}, []
+    for recipient, error in zip(recipients, results):
+        if error is None:
+            sent.append(recipient.pk)
+        elif isinstance(error, TelegramError) and error.error_code == 403:
+            blocked.append(recipient)
+        elif (isinstance(error, TelegramError) and error.error_code in PERMANENT_ERRORS) \
+                or recipient.attempts >= MAX_ATTEMPTS:
+            failed.setdefault(str(error), []).append(recipient.pk)
+        else:
+            retry.append(recipient.pk)
+
+    BroadcastRecipient.objects.filter(pk__in=sent).update(status='sent', sent_at=now, locked_at=None, error='')
+    BroadcastRecipient.objects.filter(pk__in=retry).update(status='pending', locked_at=None)
+    for error, ids in failed.items():
+        BroadcastRecipient.objects.filter(pk__in=ids).update(status='failed', locked_at=None, error=error)
+    if blocked:
+        BroadcastRecipient.objects.filter(pk__in=[r.pk for r in blocked]).update(
+            status='blocked', locked_at=None, error='Бот заблокирован пользователем',
+        )
+        # В следующие рассылки такие пользователи не попадут
+        Profile.objects.filter(user_id__in=[r.user_id for r in blocked]).update(telegram_chat_id=None)
+
+    errors = len(blocked) + sum(len(ids) for ids in failed.values())
+    BroadcastCampaign.objects.filter(pk=campaign.pk).update(sent=F('sent') + len(sent), failed=F('failed') + errors)
+    return len(sent), errors
+
+
+def run_campaign(campaign, transport, batch_size=500, progress=None):
+    """
+    Отправляет рассылку до конца (или до паузы). progress(done, total)
+    вызывается после каждой пачки. Возвращает metrics().
+    """
+    # Пауза, выставленная админом между start() и запуском, сильнее запуска
+    started = BroadcastCampaign.objects.filter(pk=campaign.pk, status__in=['draft', 'running']).update(
+        status='running', started_at=Coalesce(F('started_at'), timezone.now()),
+    )
+    campaign.refresh_from_db()
+    if not started:
+        logger.info("Рассылка #%s не запущена: статус %s", campaign.pk, campaign.status)
+        return metrics(campaign)
+    if not campaign.total:
+        populate(campaign)
+    recover_stale(campaign)
+
+    while True:
+        if BroadcastCampaign.objects.filter(pk=campaign.pk, status='paused').exists():
+            logger.info("Рассылка #%s поставлена на паузу", campaign.pk)
+            break
+        batch = claim(campaign, batch_size)
+        if not batch:
+            break
+        send_batch(campaign, batch, transport)
+        if progress:
+            campaign.refresh_from_db(fields=['sent', 'failed', 'total'])
+            progress(campaign.sent + campaign.failed, campaign.total)
+
+    if not campaign.recipients.filter(status__in=['pending', 'sending']).exists():
+        BroadcastCampaign.objects.filter(pk=campaign.pk, status='running').update(
+            status='done', finished_at=timezone.now(),
+        )
+    campaign.refresh_from_db()
+    return metrics(campaign)
+
+
+def metrics(campaign):
+    """Счётчики по статусам, длительность, скорость (сообщений/с) и доля ошибок."""
+    counts = dict(campaign.recipients.order_by().values_list('status').annotate(count=Count('id')))
+    elapsed = 0.0
+    if campaign.started_at:
+        elapsed = ((campaign.finished_at or timezone.now()) - campaign.started_at).total_seconds()
+    processed = campaign.sent + campaign.failed
+    return {
+        'status': campaign.status,
+        'total': campaign.total,
+        'sent': campaign.sent,
+        'failed': campaign.failed,
+        'by_status': counts,
+        'elapsed_seconds': round(elapsed, 1),
+        'throughput': round(campaign.sent / elapsed, 1) if elapsed else 0.0,
+        'failure_rate': round(campaign.failed / processed, 4) if processed else 0.0,
+    }
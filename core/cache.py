@@ -0,0 +1,243 @@
+"""
+Двухуровневый кэш: LRU в памяти процесса перед общим кэшем Django
+(CACHES['default'] — Redis или таблица в БД, один на все воркеры и инстансы).
+
+    from core.cache import cached, tiered
+
+    @cached(timeout=300, stale=300)
+    def cached_forecast(**params): ...
+
+    value = tiered.get_or_compute(key, compute, timeout=60, stale=300)
+
+- Локальный уровень хранит до max_entries записей не дольше local_ttl
+  секунд: дольше изменение, сделанное другим воркером, не будет видно.
+- single-flight: одновременные промахи по ключу вычисляют значение один
+  раз. Потоки процесса ждут вычисляющего на threading.Event, процессы —
+  на блокировке cache.add в общем кэше.
+- stale-while-revalidate: после timeout значение ещё stale секунд
+  отдаётся как есть, пока его пересчитывает один запрос.
+- metrics() — счётчики попаданий и промахов процесса (под блокировкой:
+  их увеличивают потоки gunicorn --threads и ASGI).
+
+Значения общие для всех потоков процесса — изменять их нельзя.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.core.cache import caches
+
+DEFAULT_LOCAL_TTL = 5.0
+DEFAULT_MAX_ENTRIES = 1000
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 2.0
+POLL_INTERVAL = 0.05
+
+METRIC_NAMES = ('local_hits', 'shared_hits', 'stale_hits', 'misses', 'computes', 'waits')
+
+
+class LRUCache:
+    """Ограниченный по числу записей словарь с TTL; потокобезопасный."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class _Flight:
+    __slots__ = ('event',)
+
+    def __init__(self):
+        self.event = threading.Event()
+
+
+class TieredCache:
+    def __init__(self, alias='default', prefix='tiered', max_entries=DEFAULT_MAX_ENTRIES,
+                 local_ttl=DEFAULT_LOCAL_TTL, lock_timeout=LOCK_TIMEOUT, wait=LOCK_WAIT):
+        self.alias = alias
+        self.prefix = prefix
+        self.local = LRUCache(max_entries)
+        self.local_ttl = local_ttl
+        self.lock_timeout = lock_timeout
+        self.wait = wait
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._metrics = dict.fromkeys(METRIC_NAMES, 0)
+        self._metrics_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self._metrics[name] += 1
+
+    # Запись — пара (значение, свежо до time.time()); в общем кэше она
+    # лежит timeout + stale секунд, локально — не дольше local_ttl.
+
+    def _lookup(self, key):
+        entry = self.local.get(key)
+        if entry is not None:
+            self._count('local_hits')
+            return entry
+        entry = self.shared.get(self._key(key))
+        if entry is not None:
+            self._count('shared_hits')
+            self.local.set(key, entry, self.local_ttl)
+        return entry
+
+    def get(self, key, default=None):
+        entry = self._lookup(key)
+        if entry is None:
+            self._count('misses')
+            return default
+        return entry[0]
+
+    def set(self, key, value, timeout, stale=0):
+        entry = (value, time.time() + timeout)
+        self.shared.set(self._key(key), entry, timeout + stale)
+        self.local.set(key, entry, min(self.local_ttl, timeout + stale))
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(self._key(key))
+
+    def get_or_compute(self, key, compute, timeout, stale=0):
+        """
+        Значение по ключу; при промахе вычисляет compute() — один раз на все
+        одновременные запросы. Исключение compute() пробрасывается вызвавшему.
+        """
+        entry = self._lookup(key)
+        if entry is not None and entry[1] > time.time():
+            return entry[0]
+        if entry is None:
+            self._count('misses')
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            if entry is not None:
+                self._count('stale_hits')
+                return entry[0]
+            self._count('waits')
+            flight.event.wait(self.lock_timeout)
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry[0]
+            # Вычислявший поток упал — считаем сами
+            return self._compute(key, compute, timeout, stale)
+
+        try:
+            return self._lead(key, entry, compute, timeout, stale)
+        finally:
+            with self._flights_lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _lead(self, key, entry, compute, timeout, stale):
+        lock_key = self._key(f'{key}:lock')
+        if self.shared.add(lock_key, 1, self.lock_timeout):
+            try:
+                return self._compute(key, compute, timeout, stale)
+            finally:
+                self.shared.delete(lock_key)
+        # Пересчитывает другой процесс
+        if entry is not None:
+            self._count('stale_hits')
+            return entry[0]
+        self._count('waits')
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = self.shared.get(self._key(key))
+            if entry is not None:
+                self.local.set(key, entry, self.local_ttl)
+                return entry[0]
+        return self._compute(key, compute, timeout, stale)
+
+    def _compute(self, key, compute, timeout, stale):
+        self._count('computes')
+        value = compute()
+        self.set(key, value, timeout, stale)
+        return value
+
+    def metrics(self):
+        with self._metrics_lock:
+            data = dict(self._metrics)
+        lookups = data['local_hits'] + data['shared_hits'] + data['misses']
+        data['hit_ratio'] = round((data['local_hits'] + data['shared_hits']) / lookups, 4) if lookups else 0.0
+        data['local_entries'] = len(self.local)
+        return data
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self._metrics = dict.fromkeys(METRIC_NAMES, 0)
+
+
+tiered = TieredCache()
+
+
+def args_key(args, kwargs):
+    return hashlib.md5(repr((args, sorted(kwargs.items()))).encode()).hexdigest()
+
+
+def cached(timeout, stale=0, key=None, cache=None):
+    """
+    Кэширует результат функции по её аргументам (repr) или по key(*args, **kwargs).
+    wrapper.invalidate(*args, **kwargs) удаляет запись.
+    """
+    def decorator(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        def make_key(args, kwargs):
+            return f'{name}:{key(*args, **kwargs) if key else args_key(args, kwargs)}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return (cache or tiered).get_or_compute(
+                make_key(args, kwargs), lambda: func(*args, **kwargs), timeout, stale,
+            )
+
+        wrapper.invalidate = lambda *args, **kwargs: (cache or tiered).delete(make_key(args, kwargs))
+        return wrapper
+    return decorator
@@ -0,0 +1,113 @@
+"""
+Каталог уровней самокатов (ScooterLevel) в памяти процесса.
+
+    from core import catalog
+    cat = catalog.get_catalog()
+    cat.levels          # кортеж уровней по возрастанию номера
+    cat.get(level_id)   # O(1), None если нет
+    cat.by_number(3)
+
+Уровней около десятка, меняются они только из админки, а нужны почти
+на каждой странице. Снимок загружается одним запросом и хранится в
+процессе; актуальность проверяется по версии в общем кэше (CACHE_KEY),
+которую сигналы ScooterLevel увеличивают после коммита. Экземпляры в
+снимке общие для всех запросов процесса — их нельзя изменять.
+"""
+import threading
+import time
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+
+from .models import ScooterLevel
+
+CACHE_KEY = 'core:catalog:version'
+# Как часто сверять версию с общим кэшем, сек: в своём процессе изменение
+# видно сразу, в остальных — не позже чем через CHECK_INTERVAL
+CHECK_INTERVAL = 1.0
+# Страховка на случай кэша, не общего для процессов (LocMemCache по умолчанию):
+# снимок старше MAX_AGE перечитывается из БД в любом случае
+MAX_AGE = 300.0
+
+
+class Catalog:
+    __slots__ = ('version', 'loaded_at', 'levels', '_by_id', '_by_number')
+
+    def __init__(self, version, levels):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.levels = tuple(sorted(levels, key=lambda level: level.number))
+        self._by_id = MappingProxyType({level.pk: level for level in self.levels})
+        self._by_number = MappingProxyType({level.number: level for level in self.levels})
+
+    def __iter__(self):
+        return iter(self.levels)
+
+    def __len__(self):
+        return len(self.levels)
+
+    def get(self, level_id):
+        try:
+            return self._by_id.get(int(level_id))
+        except (TypeError, ValueError):
+            return None
+
+    def by_number(self, number):
+        try:
+            return self._by_number.get(int(number))
+        except (TypeError, ValueError):
+            return None
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def current_version():
+    version = cache.get(CACHE_KEY)
+    if version is None:
+        # Начальная версия — время: после очистки кэша она не совпадёт
+        # ни с одной из уже виденных процессами
+        cache.add(CACHE_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CACHE_KEY)
+    return version
+
+
+def get_catalog():
+    global _snapshot, _checked_at
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked_at < CHECK_INTERVAL:
+        return snapshot
+    with _lock:
+        version = current_version()
+        if (_snapshot is None or _snapshot.version != version
+                or time.monotonic() - _snapshot.loaded_at > MAX_AGE):
+            # Из основной базы: снимок с отстающей реплики жил бы под новой версией
+            _snapshot = Catalog(version, ScooterLevel.objects.using(DEFAULT_DB_ALIAS))
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+def get_level(level_id):
+    return get_catalog().get(level_id)
+
+
+def get_level_or_404(level_id):
+    level = get_level(level_id)
+    if level is None:
+        raise Http404("Уровень не найден")
+    return level
+
+
+def invalidate():
+    """Новая версия каталога для всех процессов; вызывать после коммита."""
+    global _snapshot
+    try:
+        cache.incr(CACHE_KEY)
+    except ValueError:
+        cache.add(CACHE_KEY, time.time_ns(), timeout=None)
+    with _lock:
+        _snapshot = None
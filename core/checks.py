@@ -0,0 +1,267 @@
+"""
+Проверки производительности для manage.py check:
+
+    python manage.py check --tag performance
+
+Проверяется код приложений проекта (не сторонних пакетов), статически:
+- core.W001 — колонка-связь в list_display ModelAdmin, которую changelist
+  догружает отдельным запросом на каждую строку;
+- core.W002 — __str__ обращается к связанному объекту (self.user.username):
+  запрос на каждый объект в списках, логах и выпадающих списках;
+- core.W003 — view из urls передаёт в шаблон queryset без ограничения
+  (без среза и пагинации) — страница растёт вместе с таблицей;
+- core.W004 — filter()/get() по полям, ни одно из которых не начинает индекс.
+
+Ложное срабатывание глушится как обычно — SILENCED_SYSTEM_CHECKS.
+"""
+import ast
+import inspect
+from functools import lru_cache
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.core.checks import Warning, register
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F
+from django.urls import URLPattern, URLResolver, get_resolver
+
+TAG = 'performance'
+# Методы, которые возвращают queryset (а не объект или число)
+QUERYSET_METHODS = {
+    'all', 'filter', 'exclude', 'order_by', 'select_related', 'prefetch_related', 'annotate',
+    'values', 'values_list', 'only', 'defer', 'distinct', 'reverse', 'using',
+}
+LOOKUP_METHODS = {'filter', 'exclude', 'get', 'get_or_create', 'update_or_create'}
+MANAGERS = {'objects', '_default_manager'}
+# Таблицы-справочники на десятки строк: полный просмотр дешевле индекса
+SMALL_TABLES = {'core.jobschedule', 'core.scooterlevel', 'core.broadcastcampaign'}
+SKIP_PARTS = {'migrations', 'tests', 'tests.py'}
+
+
+def _project_apps(app_configs=None):
+    base = Path(settings.BASE_DIR).resolve()
+    for config in app_configs or apps.get_app_configs():
+        path = Path(config.path).resolve()
+        if base in path.parents and 'site-packages' not in path.parts:
+            yield config
+
+
+def _location(path, node):
+    return f'{Path(path).relative_to(settings.BASE_DIR)}:{node.lineno}'
+
+
+@lru_cache(maxsize=None)
+def _parse(path):
+    return ast.parse(Path(path).read_text(encoding='utf-8'), filename=str(path))
+
+
+def _source_files(config):
+    for path in sorted(Path(config.path).rglob('*.py')):
+        if not SKIP_PARTS.intersection(path.relative_to(config.path).parts):
+            yield path
+
+
+def _chain(node):
+    """Звенья цепочки вызовов снаружи внутрь: [(метод, Call), ...] и её корень."""
+    links = []
+    while True:
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            links.append((node.func.attr, node))
+            node = node.func.value
+        elif isinstance(node, ast.Subscript):
+            links.append(('[]', node))
+            node = node.value
+        else:
+            return links, node
+
+
+def _manager_model(root, models_by_name):
+    """Модель, если корень цепочки — Model.objects."""
+    if isinstance(root, ast.Attribute) and root.attr in MANAGERS and isinstance(root.value, ast.Name):
+        return models_by_name.get(root.value.id)
+    return None
+
+
+def _leading_index_columns(model):
+    opts = model._meta
+    columns = {'pk', opts.pk.name}
+    for field in opts.fields:
+        if field.primary_key or field.unique or field.db_index:
+            columns.add(field.name)
+    for index in opts.indexes:
+        if index.fields:
+            columns.add(index.fields[0].lstrip('-'))
+        elif index.expressions:
+            # Функциональный индекс, например Upper('email'), — по полю внутри
+            columns.update(e.name for e in index.expressions[0].flatten() if isinstance(e, F))
+    for fields in (*opts.unique_together, *opts.index_together):
+        columns.add(fields[0])
+    for constraint in opts.constraints:
+        if getattr(constraint, 'fields', None):
+            columns.add(constraint.fields[0])
+    return columns
+
+
+@register(TAG)
+def check_admin_select_related(app_configs=None, **kwargs):
+    project = {config.label for config in _project_apps(app_configs)}
+    errors = []
+    for model, model_admin in admin.site._registry.items():
+        if model._meta.app_label not in project:
+            continue
+        covered = model_admin.list_select_related
+        for name in model_admin.list_display:
+            if not isinstance(name, str):
+                continue
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if not (field.many_to_one or field.one_to_one) or not field.concrete or covered is True:
+                continue
+            # Без list_select_related changelist сам делает select_related(), но
+            # только по NOT NULL связям
+            if covered is False and not field.null:
+                continue
+            if covered and any(item == name or item.startswith(f'{name}__') for item in covered):
+                continue
+            errors.append(Warning(
+                f"Колонка {name!r} загружается отдельным запросом для каждой строки списка.",
+                hint=f"Добавьте {name!r} в list_select_related.",
+                obj=type(model_admin),
+                id='core.W001',
+            ))
+    return errors
+
+
+@register(TAG)
+def check_str_relations(app_configs=None, **kwargs):
+    errors = []
+    for config in _project_apps(app_configs):
+        for model in config.get_models():
+            method = model.__dict__.get('__str__')
+            if method is None:
+                continue
+            relations = {f.name for f in model._meta.fields if f.many_to_one or f.one_to_one}
+            tree = ast.parse(inspect.cleandoc('\n' + inspect.getsource(method)))
+            used = sorted({
+                node.attr for node in ast.walk(tree)
+                if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name)
+                and node.value.id == 'self' and node.attr in relations
+            })
+            if used:
+                errors.append(Warning(
+                    f"__str__ обращается к связанным объектам ({', '.join(used)}): "
+                    "запрос на каждый объект при выводе списка.",
+                    hint="Используйте поля самой модели и *_id или core.models.related_label().",
+                    obj=model,
+                    id='core.W002',
+                ))
+    return errors
+
+
+def _url_views(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _url_views(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.callback
+
+
+def _unbounded_queryset(node, assigned, seen=()):
+    if isinstance(node, ast.Name) and node.id in assigned and node.id not in seen:
+        return _unbounded_queryset(assigned[node.id], assigned, (*seen, node.id))
+    links, root = _chain(node)
+    if not links or links[0][0] not in QUERYSET_METHODS:
+        return False
+    return isinstance(root, ast.Attribute) and root.attr in MANAGERS
+
+
+def _render_context(call):
+    if len(call.args) >= 3:
+        return call.args[2]
+    return next((kw.value for kw in call.keywords if kw.arg == 'context'), None)
+
+
+@register(TAG, 'urls')
+def check_view_querysets(app_configs=None, **kwargs):
+    modules = {config.name for config in _project_apps(app_configs)}
+    errors = []
+    checked = set()
+    for callback in _url_views(get_resolver().url_patterns):
+        view = inspect.unwrap(callback)
+        if view in checked or not inspect.isfunction(view) or view.__module__.split('.')[0] not in modules:
+            continue
+        checked.add(view)
+        path = inspect.getsourcefile(view)
+        tree = next((
+            node for node in ast.walk(_parse(path))
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == view.__name__
+        ), None)
+        if tree is None:
+            continue
+        assigned = {
+            target.id: node.value
+            for node in ast.walk(tree) if isinstance(node, ast.Assign)
+            for target in node.targets if isinstance(target, ast.Name)
+        }
+        for node in ast.walk(tree):
+            is_render = isinstance(node, ast.Call) and (
+                getattr(node.func, 'id', None) == 'render' or getattr(node.func, 'attr', None) == 'render'
+            )
+            context = _render_context(node) if is_render else None
+            if not isinstance(context, ast.Dict):
+                continue
+            for key, value in zip(context.keys, context.values):
+                if isinstance(key, ast.Constant) and _unbounded_queryset(value, assigned):
+                    errors.append(Warning(
+                        f"{view.__module__}.{view.__name__} передаёт в шаблон {key.value!r} — "
+                        "queryset без ограничения числа строк.",
+                        hint="Сделайте срез или постраничный вывод (core.pagination.EstimatedCountPaginator).",
+                        obj=_location(path, value),
+                        id='core.W003',
+                    ))
+    return errors
+
+
+@register(TAG, 'database')
+def check_filter_indexes(app_configs=None, **kwargs):
+    configs = list(_project_apps(app_configs))
+    models_by_name = {model.__name__: model for config in configs for model in config.get_models()}
+    indexed = {}
+    errors = []
+    for config in configs:
+        for path in _source_files(config):
+            tree = _parse(path)
+            inner = {
+                id(node.func.value) for node in ast.walk(tree)
+                if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+            }
+            for node in ast.walk(tree):
+                # Цепочка Model.objects.filter(...).filter(...) целиком — по внешнему вызову
+                if not isinstance(node, ast.Call) or id(node) in inner:
+                    continue
+                links, root = _chain(node)
+                model = _manager_model(root, models_by_name)
+                if model is None or model._meta.label_lower in SMALL_TABLES:
+                    continue
+                if model not in indexed:
+                    indexed[model] = _leading_index_columns(model)
+                attnames = {f.attname: f.name for f in model._meta.concrete_fields}
+                fields = [
+                    attnames.get(kw.arg.split('__')[0], kw.arg.split('__')[0])
+                    for name, call in links if name in LOOKUP_METHODS
+                    for kw in call.keywords if kw.arg
+                ]
+                if not fields:
+                    continue
+                if not indexed[model].intersection(fields):
+                    errors.append(Warning(
+                        f"{model.__name__}: выборка по {', '.join(sorted(set(fields)))} без индекса.",
+                        hint="Добавьте индекс в Meta.indexes, начинающийся с одного из этих полей.",
+                        obj=_location(path, node),
+                        id='core.W004',
+                    ))
+    return errors
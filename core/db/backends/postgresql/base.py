@@ -0,0 +1,100 @@
+"""
+PostgreSQL-бэкенд Django с учётом соединений и необязательным пулом.
+
+    DATABASES['default']['ENGINE'] = 'core.db.backends.postgresql'
+    DATABASES['default']['POOL'] = {'max_size': 10, 'timeout': 10}  # необязательно
+
+Без POOL — обычные постоянные соединения Django (CONN_MAX_AGE,
+CONN_HEALTH_CHECKS): по одному на поток, проверка перед повторным
+использованием. Бэкенд только считает открытия, повторные использования,
+закрытия и проваленные проверки (core/db/metrics.py).
+
+С POOL соединения берутся из общего для потоков процесса пула
+(core/db/pool.py) и возвращаются в него при закрытии — вместо закрытия
+в конце каждого запроса (CONN_MAX_AGE = 0). Перед возвратом
+незавершённая транзакция откатывается.
+"""
+import threading
+import time
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core.db import metrics
+from core.db.pool import ConnectionPool, PoolTimeout
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _check(conn):
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def _reset(conn):
+    if conn.closed:
+        return False
+    status = conn.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+    return True
+
+
+def pool_stats():
+    """Размер пулов процесса по алиасам БД."""
+    with _pools_lock:
+        return {alias: pool.stats() for alias, pool in _pools.items()}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _pool(self):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        with _pools_lock:
+            pool = _pools.get(self.alias)
+            if pool is None:
+                pool = _pools[self.alias] = ConnectionPool(
+                    connect=self._connect_new, check=_check, reset=_reset, close=lambda conn: conn.close(),
+                    **options,
+                )
+            return pool
+
+    def _connect_new(self, conn_params=None):
+        return super().get_new_connection(conn_params or self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        pool = self._pool()
+        if pool is None:
+            started = time.monotonic()
+            connection = super().get_new_connection(conn_params)
+            metrics.record('connects')
+            metrics.record('connect_ms', (time.monotonic() - started) * 1000)
+            return connection
+        # Уровень изоляции выставляет родительский метод только для новых соединений
+        self.isolation_level = base.IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', base.IsolationLevel.READ_COMMITTED)
+        )
+        try:
+            return pool.acquire()
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+
+    def close_if_health_check_failed(self):
+        if self.connection is None or not self.health_check_enabled or self.health_check_done:
+            return
+        super().close_if_health_check_failed()
+        metrics.record('reuses' if self.connection is not None else 'health_check_failures')
+
+    def _close(self):
+        if self.connection is None:
+            return
+        pool = self._pool()
+        if pool is None:
+            metrics.record('closes')
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.release(self.connection)
@@ -0,0 +1,39 @@
+"""
+SQLite-бэкенд Django для установок на одном сервере.
+
+    DATABASES['default']['ENGINE'] = 'core.db.backends.sqlite3'
+    DATABASES['default']['PRAGMAS'] = {'mmap_size': 0}  # необязательно, поверх PRAGMAS
+
+Со стандартными настройками одновременные начисления и выводы падают с
+«database is locked»: журнал отката блокирует чтение на время записи,
+а транзакция, начатая как чтение (BEGIN), не может дождаться права
+на запись — SQLite сразу отвечает SQLITE_BUSY, не глядя на busy_timeout.
+Поэтому:
+- каждое новое соединение получает PRAGMAS: WAL (читатели не ждут
+  писателя), synchronous=NORMAL (в WAL не теряет целостность, fsync —
+  только на контрольных точках), mmap, кэш страниц и busy_timeout;
+- atomic() начинает транзакцию с BEGIN IMMEDIATE: право на запись
+  берётся сразу, и конкурирующий писатель ждёт его до busy_timeout,
+  а не получает ошибку посреди транзакции.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # мс
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # отрицательное — в КиБ, т.е. 64 МиБ
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in {**PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,40 @@
+"""
+Счётчики соединений с БД в памяти процесса (core/db/backends/postgresql).
+
+    from core.db import metrics
+    metrics.snapshot()  # {'connects': 3, 'reuses': 1200, 'reuse_ratio': 0.9975, ...}
+
+- connects / connect_ms — новые физические соединения и время их установки;
+- reuses — запросы, обслуженные уже открытым соединением (постоянным или из пула);
+- closes — закрытые физические соединения (вместе с connects — «текучка»);
+- health_check_failures — соединения, не прошедшие проверку перед повторным использованием;
+- waits / wait_ms / timeouts — ожидание свободного соединения в пуле.
+"""
+import threading
+
+COUNTERS = ('connects', 'connect_ms', 'reuses', 'closes', 'health_check_failures', 'waits', 'wait_ms', 'timeouts')
+
+_lock = threading.Lock()
+_counters = dict.fromkeys(COUNTERS, 0)
+
+
+def record(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot():
+    with _lock:
+        data = dict(_counters)
+    checkouts = data['connects'] + data['reuses']
+    data['reuse_ratio'] = round(data['reuses'] / checkouts, 4) if checkouts else 0.0
+    data['avg_connect_ms'] = round(data['connect_ms'] / data['connects'], 2) if data['connects'] else 0.0
+    data['avg_wait_ms'] = round(data['wait_ms'] / data['waits'], 2) if data['waits'] else 0.0
+    data['connect_ms'] = round(data['connect_ms'], 2)
+    data['wait_ms'] = round(data['wait_ms'], 2)
+    return data
+
+
+def reset():
+    with _lock:
+        _counters.update(dict.fromkeys(COUNTERS, 0))
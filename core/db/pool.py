@@ -0,0 +1,129 @@
+"""
+Ограниченный пул соединений, общий для потоков процесса.
+
+Нужен потоковым воркерам (gunicorn --threads) и ASGI: вместо соединения
+на поток — не больше max_size на процесс. Сам пул не знает о драйвере:
+открытие, проверка и сброс соединения — функции, которые передаёт
+бэкенд (core/db/backends/postgresql/base.py).
+
+- acquire() отдаёт последнее возвращённое соединение (оно «тёплое»);
+  простоявшее дольше check_after сначала проверяется check();
+- свободных нет и пул полон — ждёт до timeout секунд, затем PoolTimeout;
+- release() возвращает соединение, если reset() привёл его в исходное
+  состояние и оно не старше max_lifetime, иначе закрывает.
+"""
+import threading
+import time
+from collections import deque
+
+from . import metrics
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    def __init__(self, connect, check, reset, close, max_size=10, timeout=10.0,
+                 max_lifetime=600.0, check_after=5.0):
+        self._connect = connect
+        self._check = check
+        self._reset = reset
+        self._close_conn = close
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._idle = deque()  # (соединение, когда открыто, когда возвращено)
+        self._opened_at = {}
+        self._size = 0
+        self._cond = threading.Condition()
+
+    def stats(self):
+        with self._cond:
+            return {'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+    def acquire(self):
+        conn = waited = None
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, opened_at, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                now = time.monotonic()
+                if waited is None:
+                    waited = now
+                    metrics.record('waits')
+                if now - waited >= self.timeout:
+                    metrics.record('wait_ms', (now - waited) * 1000)
+                    metrics.record('timeouts')
+                    raise PoolTimeout(f"Нет свободного соединения за {self.timeout} с (пул {self.max_size})")
+                self._cond.wait(self.timeout - (now - waited))
+        if waited is not None:
+            metrics.record('wait_ms', (time.monotonic() - waited) * 1000)
+        if conn is None:
+            return self._open()
+
+        now = time.monotonic()
+        if now - opened_at > self.max_lifetime:
+            self._close(conn)
+        elif now - released_at > self.check_after and not self._safe(self._check, conn):
+            metrics.record('health_check_failures')
+            self._close(conn)
+        else:
+            metrics.record('reuses')
+            return conn
+        # Место в пуле остаётся за нами — открываем замену
+        return self._open()
+
+    def release(self, conn):
+        opened_at = self._opened_at.get(conn)
+        if (opened_at is None or time.monotonic() - opened_at > self.max_lifetime
+                or not self._safe(self._reset, conn)):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, opened_at, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        """Закрывает свободные соединения (выданные закроются при возврате)."""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _, _ in idle:
+            self._discard(conn)
+
+    def _open(self):
+        started = time.monotonic()
+        try:
+            conn = self._connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        metrics.record('connects')
+        metrics.record('connect_ms', (time.monotonic() - started) * 1000)
+        self._opened_at[conn] = time.monotonic()
+        return conn
+
+    def _close(self, conn):
+        self._opened_at.pop(conn, None)
+        self._safe(self._close_conn, conn)
+        metrics.record('closes')
+
+    def _discard(self, conn):
+        self._close(conn)
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _safe(func, conn):
+        try:
+            return func(conn) is not False
+        except Exception:
+            return False
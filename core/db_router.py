@@ -0,0 +1,127 @@
+"""
+Чтение с реплики для страниц, которые только читают.
+
+    DATABASE_REPLICA_URL=postgres://...   # или sqlite:////tmp/replica.db локально
+
+Реплика используется только в GET/HEAD-запросах, чей view разрешён
+(settings.REPLICA_READ_VIEWS или декоратор @replica_reads), и только пока:
+- пользователь не «закреплён» за основной базой: после записи — своей или
+  чужой в его данные (core/versioning.py) — его чтения REPLICA_PIN_SECONDS
+  идут в default, чтобы он увидел свои изменения несмотря на отставание;
+- в этом запросе ещё не было записи;
+- не открыта транзакция на default (select_for_update и чтение перед
+  записью должны видеть основную базу).
+Сессии и кэш в БД всегда читаются из default. Команды, воркеры и прочий
+код вне запроса реплику не используют.
+"""
+import contextvars
+from fnmatch import fnmatch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+DEFAULT_PIN_SECONDS = 10
+# Таблицы, которые пишутся почти на каждом запросе и читаются сразу после записи
+PRIMARY_APPS = {'sessions', 'django_cache'}
+
+
+class _Routing:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+
+
+_routing = contextvars.ContextVar('replica_routing', default=None)
+
+
+def replica_alias():
+    alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def _pin_key(user_id):
+    return f'core:replica_pin:{user_id}'
+
+
+def pin_user(user_id):
+    """Следующие REPLICA_PIN_SECONDS чтения пользователя идут в default."""
+    if replica_alias():
+        cache.set(_pin_key(user_id), 1, getattr(settings, 'REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS))
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id)) is not None
+
+
+def replica_reads(view):
+    """Разрешает чтение с реплики для view (в дополнение к REPLICA_READ_VIEWS)."""
+    view.replica_reads = True
+    return view
+
+
+def primary_reads(view):
+    """Запрещает реплику для view, даже если он попадает в REPLICA_READ_VIEWS."""
+    view.replica_reads = False
+    return view
+
+
+def _view_allowed(request, view_func):
+    flag = getattr(view_func, 'replica_reads', None)
+    if flag is not None:
+        return flag
+    match = request.resolver_match
+    name = match.view_name if match else ''
+    return any(fnmatch(name, pattern) for pattern in getattr(settings, 'REPLICA_READ_VIEWS', ()))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.replica or state.wrote:
+            return None
+        if model._meta.app_label in PRIMARY_APPS or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return replica_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None and model._meta.app_label not in PRIMARY_APPS:
+            state.wrote = True
+        # Явно default: иначе объект, прочитанный с реплики, сохранялся бы туда же
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия default
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Ставится после AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _Routing()
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        user = getattr(request, 'user', None)
+        if state.wrote and user is not None and user.is_authenticated:
+            pin_user(user.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ('GET', 'HEAD') or not replica_alias() or not _view_allowed(request, view_func):
+            return None
+        state = _routing.get()
+        # request.user загружается здесь, до включения реплики — из default
+        if request.user.is_authenticated and is_pinned(request.user.pk):
+            return None
+        state.replica = True
+        return None
@@ -0,0 +1,119 @@
+"""
+Лента изменений пользователя для инкрементальной синхронизации клиента.
+
+    GET /api/me/changes/?cursor=<курсор>&limit=100
+    -> {"events": [...], "cursor": "...", "has_more": false}
+
+Потоки: операции (Transaction, по created_at — они не изменяются),
+отчёты, заявки на покупку и на вывод (по updated_at — статус и суммы
+меняются). Каждый поток читается диапазоном по индексу
+(user, <время>, id) от своей позиции в курсоре, результаты сливаются
+по времени. Без курсора лента отдаётся с начала.
+
+Курсор — подписанные позиции всех потоков; клиент хранит его как есть.
+Строки, изменённые менее SETTLE назад, откладываются до следующего
+запроса: транзакция, начатая раньше, но закоммиченная позже, не окажется
+позади уже выданного курсора.
+"""
+from datetime import timedelta
+
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import BuyRequest, DailyReport, Transaction, WithdrawalRequest
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+SETTLE = timedelta(seconds=2)
+SALT = 'core.feeds'
+
+
+def _transaction(row):
+    return {'type': row['type'], 'amount': float(row['amount']), 'comment': row['comment'] or ''}
+
+
+def _report(row):
+    return {
+        'date': row['report_date'].isoformat(),
+        'trips': row['number_of_trips'],
+        'distance': float(row['total_distance']),
+        'profit': float(row['profit_amount']),
+        'percentage': float(row['profit_percentage']),
+    }
+
+
+def _buy_request(row):
+    return {'level': row['level__number'], 'status': row['status'], 'created_at': row['created_at'].isoformat()}
+
+
+def _withdrawal(row):
+    return {'amount': float(row['amount']), 'status': row['status'], 'created_at': row['created_at'].isoformat()}
+
+
+# имя потока -> (модель, поле времени, поля для values(), сериализатор)
+STREAMS = {
+    'transaction': (Transaction, 'created_at', ('type', 'amount', 'comment'), _transaction),
+    'report': (
+        DailyReport, 'updated_at',
+        ('report_date', 'number_of_trips', 'total_distance', 'profit_amount', 'profit_percentage'), _report,
+    ),
+    'buy_request': (BuyRequest, 'updated_at', ('level__number', 'status', 'created_at'), _buy_request),
+    'withdrawal': (WithdrawalRequest, 'updated_at', ('amount', 'status', 'created_at'), _withdrawal),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(user, positions, salt=SALT):
+    return signing.dumps(
+        {'u': user.pk, 'p': {name: [at.isoformat(), pk] for name, (at, pk) in positions.items()}},
+        salt=salt, compress=True,
+    )
+
+
+def decode_cursor(user, token, salt=SALT):
+    """Позиции потоков {имя: (время, id)}; пустой курсор — начало ленты."""
+    if not token:
+        return {}
+    try:
+        data = signing.loads(token, salt=salt)
+    except signing.BadSignature:
+        raise InvalidCursor("Повреждённый курсор")
+    if data.get('u') != user.pk:
+        raise InvalidCursor("Курсор другого пользователя")
+    return {name: (parse_datetime(at), pk) for name, (at, pk) in data['p'].items() if name in STREAMS}
+
+
+def _scan(user, name, position, until, limit):
+    model, field, fields, _ = STREAMS[name]
+    rows = model.objects.filter(user=user, **{f'{field}__lt': until})
+    if position:
+        at, pk = position
+        rows = rows.filter(Q(**{f'{field}__gt': at}) | Q(**{field: at, 'pk__gt': pk}))
+    return list(rows.order_by(field, 'pk').values('pk', field, *fields)[:limit])
+
+
+def changes(user, cursor=None, limit=DEFAULT_LIMIT):
+    """Не больше limit событий после курсора, следующий курсор и признак has_more."""
+    limit = max(1, min(limit, MAX_LIMIT))
+    positions = decode_cursor(user, cursor)
+    until = timezone.now() - SETTLE
+
+    candidates = []
+    has_more = False
+    for name, (_, field, _, _) in STREAMS.items():
+        rows = _scan(user, name, positions.get(name), until, limit)
+        has_more = has_more or len(rows) == limit
+        candidates.extend((row[field], row['pk'], name, row) for row in rows)
+    candidates.sort(key=lambda item: item[:3])
+    has_more = has_more or len(candidates) > limit
+
+    events = []
+    for at, pk, name, row in candidates[:limit]:
+        positions[name] = (at, pk)
+        events.append({'type': name, 'id': pk, 'at': at.isoformat(), 'data': STREAMS[name][3](row)})
+    return {'events': events, 'cursor': encode_cursor(user, positions), 'has_more': has_more}
@@ -0,0 +1,137 @@
+"""
+Прогноз выплат по всем самокатам пользователей (Монте-Карло на NumPy).
+
+Распределение то же, что в views.generate_scooter_stats: каждый самокат
+уровня за день приносит U(min_daily_profit, max_daily_profit); уровни с
+некорректными границами (min <= 0, max <= 0, min >= max) не начисляют.
+
+Сумма n одинаково распределённых равномерных величин моделируется:
+  - точно (n отдельных выборок), если n <= EXACT_UNITS_LIMIT;
+  - нормальным приближением (ЦПТ) со средним n*(a+b)/2 и дисперсией
+    n*(b-a)^2/12 — для миллионов самокатов ошибка пренебрежимо мала,
+    а время не зависит от их числа.
+"""
+import numpy as np
+from django.db.models import Sum
+
+from . import catalog
+from .cache import args_key, cached
+from .models import UserScooter
+
+EXACT_UNITS_LIMIT = 64
+DEFAULT_PERCENTILES = (5, 50, 95)
+CACHE_TIMEOUT = 300
+
+
+def load_units_by_level():
+    """
+    Количество самокатов по уровням: (level_ids, units) как массивы NumPy.
+    Группировка делается в БД — миллионы строк UserScooter в Python не грузятся.
+    """
+    rows = (
+        UserScooter.objects.values_list('level_id')
+        .annotate(units=Sum('quantity'))
+        .order_by('level_id')
+    )
+    data = np.array(list(rows), dtype=np.int64).reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
+
+def level_parameters(level_ids, overrides=None):
+    """
+    Массивы min/max/price для уровней; overrides — {level_id: {'min_daily_profit': ..,
+    'max_daily_profit': .., 'price': ..}} для сценария «что если».
+    """
+    overrides = overrides or {}
+    levels = catalog.get_catalog()
+    params = np.zeros((len(level_ids), 3), dtype=np.float64)
+    for i, level_id in enumerate(level_ids):
+        level = levels.get(int(level_id))
+        if level is None:
+            continue
+        values = {
+            'min_daily_profit': level.min_daily_profit,
+            'max_daily_profit': level.max_daily_profit,
+            'price': level.price,
+        }
+        values.update(overrides.get(int(level_id), {}))
+        params[i] = [float(values['min_daily_profit']), float(values['max_daily_profit']), float(values['price'])]
+    return params[:, 0], params[:, 1], params[:, 2]
+
+
+def simulate_daily_totals(units, low, high, days, simulations, claim_rate=1.0, seed=None):
+    """
+    Возвращает массив (simulations, days) с суммарными выплатами платформы
+    за каждый день. claim_rate — доля самокатов, по которым в день делают claim.
+    """
+    rng = np.random.default_rng(seed)
+    totals = np.zeros((simulations, days), dtype=np.float64)
+    valid = (low > 0) & (high > 0) & (low < high)
+    for n, a, b in zip(units[valid], low[valid], high[valid]):
+        n = int(n)
+        if n <= 0:
+            continue
+        if n <= EXACT_UNITS_LIMIT:
+            draws = rng.uniform(a, b, size=(simulations, days, n))
+            if claim_rate < 1.0:
+                draws *= rng.random(size=draws.shape) < claim_rate
+            totals += draws.sum(axis=2)
+            continue
+        claimed = rng.binomial(n, claim_rate, size=(simulations, days)) if claim_rate < 1.0 else n
+        mean = claimed * (a + b) / 2.0
+        std = np.sqrt(claimed * (b - a) ** 2 / 12.0)
+        totals += rng.normal(mean, std)
+    return totals
+
+
+def forecast_liability(days=30, simulations=2000, overrides=None, claim_rate=1.0,
+                       percentiles=DEFAULT_PERCENTILES, seed=None):
+    """
+    Прогноз выплат на days дней вперёд. Возвращает словарь:
+      daily       — {перцентиль: [выплаты за день 1..days]}
+      cumulative  — {перцентиль: [накопленные выплаты к дню 1..days]}
+      daily_mean  — ожидаемая выплата в день (аналитически)
+      invested    — вложенный капитал (units * price), для оценки доходности
+      levels      — разбивка по уровням
+    """
+    level_ids, units = load_units_by_level()
+    low, high, price = level_parameters(level_ids, overrides)
+    totals = simulate_daily_totals(units, low, high, days, simulations, claim_rate, seed)
+    cumulative = np.cumsum(totals, axis=1)
+
+    valid = (low > 0) & (high > 0) & (low < high)
+    expected = np.where(valid, units * (low + high) / 2.0, 0.0) * claim_rate
+    invested = float((units * price).sum())
+    levels = catalog.get_catalog()
+    return {
+        'days': days,
+        'simulations': simulations,
+        'units': int(units.sum()),
+        'daily': {p: np.percentile(totals, p, axis=0).round(2).tolist() for p in percentiles},
+        'cumulative': {p: np.percentile(cumulative, p, axis=0).round(2).tolist() for p in percentiles},
+        'daily_mean': round(float(expected.sum()), 2),
+        'invested': round(invested, 2),
+        'levels': [
+            {
+                'level': levels.get(int(level_id)),
+                'units': int(n),
+                'min_daily_profit': float(a),
+                'max_daily_profit': float(b),
+                'price': float(p),
+                'daily_mean': round(float(e), 2),
+            }
+            for level_id, n, a, b, p, e in zip(level_ids, units, low, high, price, expected)
+        ],
+    }
+
+
+@cached(
+    timeout=CACHE_TIMEOUT, stale=CACHE_TIMEOUT,
+    key=lambda **params: f'{catalog.get_catalog().version}:{args_key((), params)}',
+)
+def cached_forecast(**params):
+    """
+    forecast_liability для админки: одинаковые параметры считаются один раз
+    на все воркеры, повторный запрос — из кэша. Имеет смысл только с seed.
+    """
+    return forecast_liability(**params)
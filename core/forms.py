@@ -30,4 +30,36 @@ class ProfileUpdateForm(forms.ModelForm):
 
     class Meta:
         model = Profile
-        fields = ['telegram_username', 'wallet']
\ No newline at end of file
+        fields = ['telegram_username', 'wallet']
+
+class PayoutForecastForm(forms.Form):
+    """Параметры прогноза выплат (админка) + сценарий изменения уровней."""
+    days = forms.IntegerField(label="Горизонт (дней)", min_value=1, max_value=365, initial=30)
+    simulations = forms.IntegerField(label="Симуляций", min_value=100, max_value=20000, initial=2000)
+    claim_rate = forms.DecimalField(label="Доля claim в день", min_value=0, max_value=1, initial=1, decimal_places=2)
+
+    LEVEL_FIELDS = ('min_daily_profit', 'max_daily_profit', 'price')
+
+    def __init__(self, *args, levels=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.levels = list(levels)
+        for level in self.levels:
+            for name in self.LEVEL_FIELDS:
+                self.fields[f'{name}_{level.pk}'] = forms.DecimalField(
+                    label=f"{level} {name}", min_value=0, decimal_places=2,
+                    initial=getattr(level, name),
+                )
+
+    def level_rows(self):
+        for level in self.levels:
+            yield level, [self[f'{name}_{level.pk}'] for name in self.LEVEL_FIELDS]
+
+    def overrides(self):
+        """Только изменённые значения: {level_id: {поле: значение}}."""
+        result = {}
+        for level in self.levels:
+            for name in self.LEVEL_FIELDS:
+                value = self.cleaned_data.get(f'{name}_{level.pk}')
+                if value is not None and value != getattr(level, name):
+                    result.setdefault(level.pk, {})[name] = value
+        return result
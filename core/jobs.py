@@ -0,0 +1,246 @@
+"""
+Очередь фоновых задач в БД (без внешнего брокера).
+
+    from core import jobs
+
+    @jobs.task('core.example')
+    def example(job, user_id):
+        ...
+        jobs.set_progress(job, done, total)
+
+    jobs.enqueue('core.example', {'user_id': 1})
+
+Задачи выполняет `manage.py run_workers`. Захват задачи:
+  - PostgreSQL: SELECT ... FOR UPDATE SKIP LOCKED — воркеры не ждут друг друга;
+  - SQLite и прочие: условный UPDATE ... WHERE status='queued' (кто обновил
+    строку, тот и взял задачу).
+Упавшая задача перезапускается с экспоненциальной задержкой, после
+max_attempts — статус failed. Периодические задачи — JobSchedule (cron).
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job, JobSchedule
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+# Задача в статусе running дольше этого — воркер, скорее всего, умер
+LOCK_TIMEOUT = timedelta(minutes=30)
+BACKOFF_BASE = 10  # секунд
+BACKOFF_MAX = 3600
+
+
+def task(name, max_attempts=5):
+    """Регистрирует функцию fn(job, **payload) как задачу с именем name."""
+    def decorator(fn):
+        fn.task_name = name
+        fn.max_attempts = max_attempts
+        REGISTRY[name] = fn
+        return fn
+    return decorator
+
+
+def enqueue(name, payload=None, run_at=None, priority=0):
+    """
+    Ставит задачу в очередь. Внутри transaction.atomic() задача станет
+    видна воркерам только после коммита — вместе с данными, которые ей нужны.
+    """
+    fn = REGISTRY.get(name)
+    if fn is None:
+        raise KeyError(f"Неизвестная задача: {name}")
+    return Job.objects.create(
+        task=name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        priority=priority,
+        max_attempts=fn.max_attempts,
+    )
+
+
+def set_progress(job, done, total=None):
+    """Обновляет прогресс (виден в админке, пока задача выполняется)."""
+    job.progress = done
+    fields = {'progress': done}
+    if total is not None:
+        job.progress_total = total
+        fields['progress_total'] = total
+    Job.objects.filter(pk=job.pk).update(**fields)
+
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+# === Захват и выполнение ===
+
+def _ready_jobs(now):
+    return Job.objects.filter(status='queued', run_at__lte=now).order_by('-priority', 'run_at')
+
+
+def claim_job(worker_id):
+    now = timezone.now()
+    claim = {
+        'status': 'running', 'locked_by': worker_id, 'locked_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = _ready_jobs(now).select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**claim)
+    else:
+        for pk in _ready_jobs(now).values_list('pk', flat=True)[:10]:
+            if Job.objects.filter(pk=pk, status='queued').update(**claim):
+                break
+        else:
+            return None
+        job = Job(pk=pk)
+    job.refresh_from_db()
+    return job
+
+
+def _owned(job):
+    """
+    Задача, пока она ещё за этим воркером. Зависшую задачу recover_stale_jobs
+    мог вернуть в очередь и отдать другому воркеру — тогда locked_at другой,
+    и итог первого запуска не должен перезаписать её состояние.
+    """
+    return Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by, locked_at=job.locked_at)
+
+
+def run_job(job):
+    fn = REGISTRY.get(job.task)
+    try:
+        if fn is None:
+            raise KeyError(f"Неизвестная задача: {job.task}")
+        result = fn(job, **job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.error("Задача #%s %s упала (попытка %s):\n%s", job.pk, job.task, job.attempts, error)
+        if job.attempts < job.max_attempts:
+            updated = _owned(job).update(
+                status='queued', last_error=error, locked_by='', locked_at=None,
+                run_at=timezone.now() + backoff_delay(job.attempts),
+            )
+        else:
+            updated = _owned(job).update(
+                status='failed', last_error=error, finished_at=timezone.now(),
+            )
+        if not updated:
+            logger.warning("Задача #%s уже не за воркером %s — ошибка не записана", job.pk, job.locked_by)
+        return False
+    updated = _owned(job).update(
+        status='done', result='' if result is None else str(result),
+        finished_at=timezone.now(),
+    )
+    if not updated:
+        logger.warning("Задача #%s уже не за воркером %s — результат не записан", job.pk, job.locked_by)
+    return bool(updated)
+
+
+def recover_stale_jobs():
+    """Возвращает в очередь задачи, чей воркер пропал посреди выполнения."""
+    return Job.objects.filter(status='running', locked_at__lt=timezone.now() - LOCK_TIMEOUT).update(
+        status='queued', locked_by='', locked_at=None,
+    )
+
+
+# === Расписание ===
+
+class CronExpression:
+    """
+    Cron из 5 полей: минута, час, день месяца, месяц, день недели (0 = вс).
+    Поддерживаются *, */n, a-b, a-b/n и списки через запятую.
+    """
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Ожидается 5 полей cron: {expression!r}")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/')
+                step = int(step)
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(x) for x in part.split('-'))
+            else:
+                start = end = int(part)
+            if start < low or end > high or step < 1:
+                raise ValueError(f"Значение вне диапазона {low}-{high}: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, dt):
+        weekday = (dt.weekday() + 1) % 7
+        if self.any_day:
+            return self.any_weekday or weekday in self.weekdays
+        if self.any_weekday:
+            return dt.day in self.days
+        # Как в cron: если заданы оба поля, достаточно совпадения любого
+        return dt.day in self.days or weekday in self.weekdays
+
+    def next_after(self, dt):
+        """Ближайшее время срабатывания строго после dt (в часовом поясе dt)."""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 4)
+        while dt < limit:
+            if dt.month not in self.months or not self._day_matches(dt):
+                dt = (dt + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if dt.hour not in self.hours:
+                dt = (dt + timedelta(hours=1)).replace(minute=0)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError("Cron-выражение никогда не срабатывает")
+
+
+def next_run(schedule, after=None):
+    after = timezone.localtime(after or timezone.now())
+    return CronExpression(schedule.cron).next_after(after)
+
+
+def run_due_schedules():
+    """
+    Ставит в очередь задачи, у которых наступило время по расписанию.
+    Несколько воркеров могут вызывать это одновременно: next_run_at
+    сдвигается условным UPDATE, поэтому задача ставится ровно один раз.
+    """
+    now = timezone.now()
+    enqueued = 0
+    for schedule in JobSchedule.objects.filter(enabled=True, next_run_at__isnull=True):
+        JobSchedule.objects.filter(pk=schedule.pk, next_run_at__isnull=True).update(next_run_at=next_run(schedule))
+    for schedule in JobSchedule.objects.filter(enabled=True, next_run_at__lte=now):
+        with transaction.atomic():
+            moved = JobSchedule.objects.filter(pk=schedule.pk, next_run_at=schedule.next_run_at).update(
+                next_run_at=next_run(schedule, now), last_run_at=now,
+            )
+            if moved:
+                enqueue(schedule.task, schedule.payload)
+                enqueued += 1
+    return enqueued
@@ -0,0 +1,167 @@
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from core.models import Profile, ScooterLevel, Transaction, UserScooter
+
+USER_PREFIX = 'bench-api-'
+# Одинаковые воркеры gunicorn, разный класс: синхронный WSGI и uvicorn под ASGI
+DEPLOYMENTS = {
+    'wsgi': (['zeepy.wsgi:application'], '0'),
+    'asgi': (['zeepy.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'], '1'),
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise CommandError("Сервер завершился при запуске")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError("Сервер не поднялся")
+
+
+def _post(url, session_key, csrf_token):
+    request = urllib.request.Request(url, data=b'', method='POST', headers={
+        'Cookie': f'{settings.SESSION_COOKIE_NAME}={session_key}; {settings.CSRF_COOKIE_NAME}={csrf_token}',
+        'X-CSRFToken': csrf_token,
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as exc:
+        exc.read()
+        return exc.code
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочное сравнение API начислений (POST /api/claim_profit/) под WSGI "
+        "(синхронные view) и ASGI (ASYNC_API=1, core/api_async.py) при одинаковом "
+        "числе воркеров gunicorn. Каждый прогон — на временной SQLite-базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=32, help="Одновременных клиентов")
+        parser.add_argument('--requests', type=int, default=1000, help="Запросов на прогон")
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=1, help="Воркеров gunicorn")
+        parser.add_argument('--deployment', choices=sorted(DEPLOYMENTS), action='append', help="По умолчанию — оба")
+        parser.add_argument('--seed', action='store_true', help="Внутренний режим: заполнить текущую базу")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            return self.seed(options['users'])
+        for name in options['deployment'] or ('wsgi', 'asgi'):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = {
+                    **os.environ,
+                    'DATABASE_URL': f'sqlite:///{tmp}/bench.db',
+                    'SESSION_CACHE_DIR': f'{tmp}/sessions',
+                    'ALLOWED_HOSTS': '127.0.0.1',
+                    'DEBUG': 'False',
+                    'ASYNC_API': DEPLOYMENTS[name][1],
+                }
+                self.manage(env, 'migrate', '--no-input', '-v', '0')
+                sessions = self.manage(env, 'bench_api_concurrency', '--seed', '--users', str(options['users'])).split()
+                result = self.run(env, DEPLOYMENTS[name][0], sessions, options)
+            self.stdout.write(f"{name:<5} {result}")
+
+    def manage(self, env, *args):
+        result = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr else f"{args[0]} завершился с ошибкой")
+        return result.stdout
+
+    def run(self, env, app, sessions, options):
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *app, '-b', f'127.0.0.1:{port}', '-w', str(options['workers'])],
+            env=env, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_for_port(port, server)
+            url = f'http://127.0.0.1:{port}/api/claim_profit/'
+            csrf_token = get_random_string(32)
+            _post(url, sessions[0], csrf_token)  # прогрев: импорт view, соединение с БД
+
+            latencies = []
+            statuses = {}
+            lock = threading.Lock()
+
+            def call(i):
+                started = time.monotonic()
+                status = _post(url, sessions[i % len(sessions)], csrf_token)
+                elapsed = time.monotonic() - started
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+
+            started = time.monotonic()
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                list(pool.map(call, range(options['requests'])))
+            total = time.monotonic() - started
+        finally:
+            server.terminate()
+            server.wait()
+
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000
+        codes = ', '.join(f'{code}: {count}' for code, count in sorted(statuses.items()))
+        return (
+            f"{options['requests']} запросов, {options['concurrency']} клиентов: {total:.2f} с "
+            f"({options['requests'] / total:.0f}/с), p50 {p50:.0f} мс, p95 {p95:.0f} мс; ответы {codes}"
+        )
+
+    def seed(self, users):
+        """Пользователи с самокатами и готовым начислением; печатает ключи их сессий."""
+        SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
+        level = ScooterLevel.objects.create(
+            number=1, price=Decimal('100'), min_daily_profit=Decimal('1'), max_daily_profit=Decimal('3'),
+        )
+        started = timezone.now() - timedelta(hours=1)
+        for i in range(users):
+            user = User.objects.create(username=f'{USER_PREFIX}{i}', email=f'{USER_PREFIX}{i}@example.com')
+            Profile.objects.create(user=user)
+            UserScooter.objects.create(user=user, level=level, quantity=2)
+            tx = Transaction.objects.create(user=user, type='earning', amount=Decimal('0'), comment='Старт')
+            Transaction.objects.filter(pk=tx.pk).update(created_at=started)
+
+            session = SessionStore()
+            session[SESSION_KEY] = str(user.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.create()
+            self.stdout.write(session.session_key)
@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import RequestFactory
+from django.utils import timezone
+
+from core.models import Profile, ScooterLevel, Transaction, UserScooter
+
+PROFILES = {'standard': '0', 'wal': '1'}
+USER_PREFIX = 'bench-claim-'
+
+
+def _claim_worker(index, workers, start_at, results):
+    from core.views import claim_profit_view
+
+    users = User.objects.select_related('profile').filter(username__startswith=USER_PREFIX).order_by('pk')
+    users = list(users)[index::workers]
+    factory = RequestFactory()
+    done = locked = failed = 0
+    time.sleep(max(0.0, start_at - time.time()))
+    for user in users:
+        request = factory.post('/api/claim_profit/')
+        request.user = user
+        try:
+            response = claim_profit_view(request)
+        except OperationalError as exc:
+            locked += 'locked' in str(exc)
+            failed += 'locked' not in str(exc)
+            continue
+        if response.status_code == 200:
+            done += 1
+        else:
+            failed += 1
+    connections.close_all()
+    results.put((done, locked, failed, time.time()))
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк начислений (claim) на SQLite из нескольких процессов: стандартный "
+        "бэкенд против профиля core.db.backends.sqlite3 (WAL, busy_timeout, BEGIN IMMEDIATE). "
+        "Каждый прогон — на временной базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Процессов, одновременно делающих claim")
+        parser.add_argument('--users', type=int, default=400, help="Пользователей (по одному claim на каждого)")
+        parser.add_argument('--profile', choices=sorted(PROFILES), action='append', help="По умолчанию — оба")
+        parser.add_argument('--run', action='store_true', help="Внутренний режим: прогон на текущей базе")
+
+    def handle(self, *args, **options):
+        if options['run']:
+            return self.run(options['workers'], options['users'])
+        for profile in options['profile'] or ('standard', 'wal'):
+            with tempfile.TemporaryDirectory() as tmp:
+                env = {
+                    **os.environ,
+                    'DATABASE_URL': f'sqlite:///{tmp}/bench.db',
+                    'SQLITE_PROFILE': PROFILES[profile],
+                }
+                self.manage(env, 'migrate', '--no-input', '-v', '0')
+                output = self.manage(
+                    env, 'bench_sqlite_claims', '--run',
+                    '--workers', str(options['workers']), '--users', str(options['users']),
+                )
+            self.stdout.write(f"{profile:<9} {output.strip()}")
+
+    def manage(self, env, *args):
+        result = subprocess.run(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), *args],
+            env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1] if result.stderr else f"{args[0]} завершился с ошибкой")
+        return result.stdout
+
+    def run(self, workers, users):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Бенчмарк только для SQLite")
+        self.seed(users)
+        # Соединения с БД не должны переходить в дочерние процессы
+        connections.close_all()
+        results = multiprocessing.Queue()
+        start_at = time.time() + 0.5
+        processes = [
+            multiprocessing.Process(target=_claim_worker, args=(i, workers, start_at, results))
+            for i in range(workers)
+        ]
+        for proc in processes:
+            proc.start()
+        rows = [results.get() for _ in processes]
+        for proc in processes:
+            proc.join()
+
+        done = sum(row[0] for row in rows)
+        locked = sum(row[1] for row in rows)
+        failed = sum(row[2] for row in rows)
+        elapsed = max(row[3] for row in rows) - start_at
+        self.stdout.write(
+            f"{workers} процессов: {done} claim за {elapsed:.2f} с ({done / elapsed:.1f}/с), "
+            f"database is locked: {locked}, прочих ошибок: {failed}"
+        )
+
+    def seed(self, users):
+        level = ScooterLevel.objects.create(
+            number=1, price=Decimal('100'), min_daily_profit=Decimal('1'), max_daily_profit=Decimal('3'),
+        )
+        started = timezone.now() - timedelta(hours=1)
+        for i in range(users):
+            user = User.objects.create(username=f'{USER_PREFIX}{i}', email=f'{USER_PREFIX}{i}@example.com')
+            Profile.objects.create(user=user)
+            UserScooter.objects.create(user=user, level=level, quantity=2)
+            tx = Transaction.objects.create(user=user, type='earning', amount=Decimal('0'), comment='Старт')
+            Transaction.objects.filter(pk=tx.pk).update(created_at=started)
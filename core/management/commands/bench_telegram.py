@@ -0,0 +1,59 @@
+import logging
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from core.telegram import TelegramTransport
+from core.telegram_fake import FakeBotAPI
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк отправки в Telegram на локальной заглушке Bot API: "
+        "последовательный requests.post против TelegramTransport."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=300)
+        parser.add_argument('--chats', type=int, default=100)
+        parser.add_argument('--latency', type=float, default=0.05, help="Задержка ответа заглушки, сек")
+        parser.add_argument('--global-rate', type=float, default=30, help="Сообщений/с на бота (0 — без лимита)")
+        parser.add_argument('--per-chat-rate', type=float, default=1, help="Сообщений/с в один чат (0 — без лимита)")
+        parser.add_argument('--pool-size', type=int, default=16)
+        parser.add_argument('--skip-naive', action='store_true', help="Не гонять последовательный вариант")
+
+    def handle(self, *args, **options):
+        logging.getLogger('urllib3').setLevel(logging.WARNING)
+        messages = [(i % options['chats'], f'Сообщение {i}') for i in range(options['messages'])]
+        unlimited = 10 ** 6
+
+        if not options['skip_naive']:
+            with FakeBotAPI(latency=options['latency']) as api:
+                started = time.monotonic()
+                for chat_id, text in messages:
+                    requests.post(
+                        f'{api.url}/bottest/sendMessage',
+                        data={'chat_id': chat_id, 'text': text, 'parse_mode': 'HTML'}, timeout=5,
+                    ).raise_for_status()
+                self.report('requests.post', started, len(api.messages), api.connections)
+
+        with FakeBotAPI(latency=options['latency']) as api:
+            transport = TelegramTransport(
+                token='test', api_url=api.url, pool_size=options['pool_size'],
+                global_rate=options['global_rate'] or unlimited,
+                per_chat_rate=options['per_chat_rate'] or unlimited,
+            )
+            started = time.monotonic()
+            errors = [e for e in transport.send_many(messages) if e is not None]
+            self.report('TelegramTransport', started, len(api.messages), api.connections)
+            transport.close()
+            if errors:
+                self.stderr.write(f"Ошибок: {len(errors)}, первая: {errors[0]}")
+
+    def report(self, name, started, sent, connections):
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"{name:<18} {sent} сообщений за {elapsed:.2f} с "
+            f"({sent / elapsed:.1f} msg/s), соединений: {connections}"
+        )
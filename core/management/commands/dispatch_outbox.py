@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import outbox
+from core.telegram import get_transport
+
+RECOVER_INTERVAL = 60
+DIGEST_INTERVAL = 10
+
+
+class Command(BaseCommand):
+    help = "Отправляет накопившиеся Telegram-уведомления из outbox (core.OutboxMessage) с повторами."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Пауза при пустой очереди, сек")
+        parser.add_argument('--once', action='store_true', help="Разобрать очередь один раз и выйти")
+        parser.add_argument('--flush-digests', action='store_true', help="Сразу собрать сводки, не дожидаясь окон")
+
+    def handle(self, *args, **options):
+        transport = get_transport()
+        last_recover = last_digest = 0
+        force_digests = options['flush_digests']
+        while True:
+            close_old_connections()
+            if time.monotonic() - last_recover > RECOVER_INTERVAL:
+                outbox.recover_stale()
+                last_recover = time.monotonic()
+            if force_digests or time.monotonic() - last_digest > DIGEST_INTERVAL:
+                outbox.flush_digests(force=force_digests)
+                force_digests = False
+                last_digest = time.monotonic()
+            batch = outbox.claim_batch(options['batch_size'])
+            if batch:
+                outbox.deliver_batch(batch, transport)
+            if options['once'] and not batch:
+                stats = outbox.stats()
+                self.stdout.write(
+                    f"Очередь: {stats['depth']}, ждут сводки: {stats['held']}, "
+                    f"ошибок: {stats['failed']}, задержка: {stats['lag_seconds']} с"
+                )
+                return
+            if not batch:
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,68 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import catalog, forecast
+
+
+class Command(BaseCommand):
+    help = (
+        "Монте-Карло прогноз выплат по всем самокатам пользователей. "
+        "Пример сценария: --set 3:min_daily_profit=2,max_daily_profit=5"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+        parser.add_argument('--simulations', type=int, default=2000)
+        parser.add_argument('--claim-rate', type=float, default=1.0)
+        parser.add_argument('--percentiles', default='5,50,95')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument(
+            '--set', action='append', default=[], dest='overrides',
+            help="Изменение уровня: <номер>:поле=значение[,поле=значение]",
+        )
+
+    def parse_overrides(self, items):
+        overrides = {}
+        for item in items:
+            try:
+                number, assignments = item.split(':', 1)
+                level = catalog.get_catalog().by_number(number)
+                if level is None:
+                    raise CommandError(f"Нет уровня {number}")
+                values = {}
+                for assignment in assignments.split(','):
+                    name, value = assignment.split('=', 1)
+                    if name not in ('min_daily_profit', 'max_daily_profit', 'price'):
+                        raise CommandError(f"Неизвестное поле {name}")
+                    values[name] = Decimal(value)
+            except (ValueError, InvalidOperation) as e:
+                raise CommandError(f"Неверный --set {item!r}: {e}")
+            overrides[level.pk] = values
+        return overrides
+
+    def handle(self, *args, **options):
+        percentiles = tuple(int(p) for p in options['percentiles'].split(','))
+        result = forecast.forecast_liability(
+            days=options['days'],
+            simulations=options['simulations'],
+            overrides=self.parse_overrides(options['overrides']),
+            claim_rate=options['claim_rate'],
+            percentiles=percentiles,
+            seed=options['seed'],
+        )
+        self.stdout.write(
+            f"Самокатов: {result['units']}, капитал: {result['invested']} $, "
+            f"ожидаемые выплаты в день: {result['daily_mean']} $"
+        )
+        for row in result['levels']:
+            self.stdout.write(
+                f"  {row['level']}: {row['units']} шт., "
+                f"{row['min_daily_profit']}–{row['max_daily_profit']} $, в день {row['daily_mean']} $"
+            )
+        self.stdout.write("День  " + "  ".join(f"P{p:>12}" for p in percentiles))
+        for day in range(result['days']):
+            values = "  ".join(f"{result['daily'][p][day]:>13,.2f}" for p in percentiles)
+            self.stdout.write(f"{day + 1:>4}  {values}")
+        totals = "  ".join(f"{result['cumulative'][p][-1]:>13,.2f}" for p in percentiles)
+        self.stdout.write(f"Итого {totals}")
@@ -0,0 +1,260 @@
+"""
+Массовый импорт пользователей партнёрских когорт.
+
+Формат — CSV с заголовком или JSONL, поля одной записи:
+  email              обязательно, он же username
+  password           пароль в открытом виде (или password_hash — уже готовый хэш)
+  ref                referral_code пригласившего (из БД или из этого же файла,
+                     в том числе из записи ниже — такие связи ставятся в конце)
+  referral_code      свой реферальный код (иначе генерируется; занятый
+                     другим пользователем заменяется новым — см. отчёт)
+  wallet, telegram_username
+  scooters           "номер_уровня:количество;..." (в JSONL можно {"1": 2})
+
+В отличие от register() здесь нет запроса на каждого пользователя и
+нет уведомлений в Telegram: записи пишутся bulk_create пачками, пароли
+хэшируются параллельно в пуле процессов, а прогресс (вместе с ещё не
+разрешёнными ссылками ref) сохраняется в <файл>.progress, так что
+прерванный импорт продолжается с места остановки.
+"""
+import csv
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core import catalog, rollups, search
+from core.models import Profile, UserScooter
+from core.notifications import send_telegram_message
+
+
+def _init_worker():
+    # Нужен для start method 'spawn'; при 'fork' настройки уже загружены
+    django.setup()
+
+
+def _hash_password(raw):
+    return make_password(raw or None)
+
+
+def read_records(path, fmt):
+    with open(path, encoding='utf-8', newline='') as fh:
+        if fmt == 'csv':
+            yield from csv.DictReader(fh)
+        else:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def parse_scooters(value):
+    """'1:2;3:1' или {'1': 2} -> {1: 2, 3: 1}"""
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        items = value.items()
+    else:
+        items = (part.split(':', 1) for part in str(value).split(';') if part.strip())
+    return {int(number): int(quantity) for number, quantity in items if int(quantity) > 0}
+
+
+class Command(BaseCommand):
+    help = "Импорт пользователей, профилей, рефералов и самокатов из CSV/JSONL пачками."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="По умолчанию — по расширению файла")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Процессов для хэширования паролей")
+        parser.add_argument('--restart', action='store_true', help="Игнорировать сохранённый прогресс")
+        parser.add_argument('--notify-summary', action='store_true', help="Отправить в Telegram одно итоговое сообщение")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"Файл не найден: {path}")
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+        progress_path = f'{path}.progress'
+
+        done = 0
+        # user_id -> ref, которого ещё нет в БД (пригласивший ниже в файле)
+        self.pending_refs = {}
+        if not options['restart'] and os.path.exists(progress_path):
+            with open(progress_path) as fh:
+                progress = json.load(fh)
+            done = progress.get('records', 0)
+            self.pending_refs = {int(k): v for k, v in progress.get('pending_refs', {}).items()}
+            self.stdout.write(f"Продолжаем с записи {done}")
+
+        self.levels = catalog.get_catalog()
+        self.referrers = {}  # referral_code -> user_id (кэш между пачками)
+        self.totals = {'users': 0, 'skipped': 0, 'scooters': 0}
+        self.renamed_codes = []
+
+        records = islice(read_records(path, fmt), done, None)
+        with ProcessPoolExecutor(max_workers=max(options['workers'], 1), initializer=_init_worker) as pool:
+            while True:
+                chunk = list(islice(records, options['chunk_size']))
+                if not chunk:
+                    break
+                self.import_chunk(chunk, pool)
+                done += len(chunk)
+                with open(progress_path, 'w') as fh:
+                    json.dump({'records': done, 'pending_refs': self.pending_refs}, fh)
+                self.stdout.write(
+                    f"{done} записей: создано {self.totals['users']}, пропущено {self.totals['skipped']}"
+                )
+
+        unresolved = self.link_pending_refs()
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+        for email, code, new_code in self.renamed_codes:
+            self.stdout.write(self.style.WARNING(f"{email}: код {code} уже занят, выдан {new_code}"))
+        for email, code in unresolved:
+            self.stdout.write(self.style.WARNING(f"{email}: пригласивший с кодом {code} не найден"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово: пользователей {self.totals['users']}, самокатов {self.totals['scooters']}, "
+            f"пропущено {self.totals['skipped']}, кодов заменено {len(self.renamed_codes)}, "
+            f"без пригласившего {len(unresolved)}"
+        ))
+        if options['notify_summary'] and self.totals['users']:
+            send_telegram_message(
+                f"<b>📥 Импорт пользователей</b>\n"
+                f"👥 Новых: {self.totals['users']}\n"
+                f"🛴 Самокатов: {self.totals['scooters']}"
+            )
+
+    def import_chunk(self, chunk, pool):
+        rows = []
+        seen = set()
+        for record in chunk:
+            email = (record.get('email') or '').strip().lower()
+            if not email or email in seen:
+                self.totals['skipped'] += 1
+                continue
+            seen.add(email)
+            rows.append((email, record))
+
+        # Повторный запуск после сбоя между коммитом и записью прогресса
+        # не должен создавать дубликаты — уже существующих пропускаем
+        existing = set(User.objects.filter(username__in=[e for e, _ in rows]).values_list('username', flat=True))
+        self.totals['skipped'] += len(existing)
+        rows = [(e, r) for e, r in rows if e not in existing]
+        if not rows:
+            return
+
+        to_hash = [r.get('password') or '' for _, r in rows if not r.get('password_hash')]
+        hashes = iter(pool.map(_hash_password, to_hash, chunksize=max(len(to_hash) // 32, 1)))
+        now = timezone.now()
+        users = [
+            User(
+                username=email, email=email, date_joined=now,
+                password=record.get('password_hash') or next(hashes),
+            )
+            for email, record in rows
+        ]
+
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+            user_ids = dict(User.objects.filter(username__in=[e for e, _ in rows]).values_list('username', 'id'))
+
+            profiles = []
+            codes = self.referral_codes(rows)
+            for email, record in rows:
+                self.referrers[codes[email]] = user_ids[email]
+                profiles.append(Profile(
+                    user_id=user_ids[email],
+                    referral_code=codes[email],
+                    wallet=record.get('wallet') or None,
+                    telegram_username=record.get('telegram_username') or None,
+                ))
+            self.resolve_referrers([(r.get('ref') or '').strip() for _, r in rows])
+            for profile, (_, record) in zip(profiles, rows):
+                ref = (record.get('ref') or '').strip()
+                referrer = self.referrers.get(ref)
+                if referrer is None and ref:
+                    self.pending_refs[profile.user_id] = ref
+                elif referrer != profile.user_id:  # ref на свой же код не считаем
+                    profile.invited_by_id = referrer
+            Profile.objects.bulk_create(profiles)
+
+            scooters = []
+            units_by_level = {}
+            for email, record in rows:
+                for number, quantity in parse_scooters(record.get('scooters')).items():
+                    level = self.levels.by_number(number)
+                    if level is None:
+                        raise CommandError(f"{email}: неизвестный уровень {number}")
+                    scooters.append(UserScooter(user_id=user_ids[email], level=level, quantity=quantity))
+                    units_by_level[level.pk] = units_by_level.get(level.pk, 0) + quantity
+            UserScooter.objects.bulk_create(scooters)
+
+            # bulk_create не шлёт сигналы — поисковый индекс и сводки обновляем сами
+            created_users = list(User.objects.filter(id__in=user_ids.values()).only('id', 'username', 'email'))
+            search.index_objects(User, created_users)
+            search.index_objects(Profile, Profile.objects.filter(user_id__in=user_ids.values()))
+            rollups.bump_daily(timezone.localdate(now), registrations=len(users))
+            for level_id, units in units_by_level.items():
+                rollups.bump_counter(rollups.level_units_key(level_id), units)
+
+        self.totals['users'] += len(users)
+        self.totals['scooters'] += sum(units_by_level.values())
+
+    def referral_codes(self, rows):
+        """
+        email -> referral_code. Код из файла, занятый в БД или повторённый
+        в файле, заменяется сгенерированным: иначе bulk_create упал бы на
+        уникальности и откатил всю пачку, а ref на этот код уже означает
+        его прежнего владельца.
+        """
+        wanted = {email: (record.get('referral_code') or '').strip() for email, record in rows}
+        taken = set(Profile.objects.filter(referral_code__in=[c for c in wanted.values() if c])
+                    .values_list('referral_code', flat=True))
+        codes = {}
+        for email, code in wanted.items():
+            if code and code not in taken:
+                codes[email] = code
+                taken.add(code)
+                continue
+            new_code = uuid.uuid4().hex[:10]
+            while new_code in taken or Profile.objects.filter(referral_code=new_code).exists():
+                new_code = uuid.uuid4().hex[:10]
+            taken.add(new_code)
+            codes[email] = new_code
+            if code:
+                self.renamed_codes.append((email, code, new_code))
+        return codes
+
+    def link_pending_refs(self):
+        """Второй проход: ref на записи ниже по файлу. -> [(email, код)] ненайденных"""
+        if not self.pending_refs:
+            return []
+        self.resolve_referrers(set(self.pending_refs.values()))
+        by_referrer = {}
+        for user_id, code in self.pending_refs.items():
+            referrer = self.referrers.get(code)
+            if referrer is not None and referrer != user_id:
+                by_referrer.setdefault(referrer, []).append(user_id)
+        with transaction.atomic():
+            for referrer, user_ids in by_referrer.items():
+                Profile.objects.filter(user_id__in=user_ids, invited_by__isnull=True).update(invited_by_id=referrer)
+        linked = {user_id for user_ids in by_referrer.values() for user_id in user_ids}
+        missing = {user_id: code for user_id, code in self.pending_refs.items() if user_id not in linked}
+        emails = dict(User.objects.filter(id__in=missing).values_list('id', 'username'))
+        return sorted((emails.get(user_id, f'#{user_id}'), code) for user_id, code in missing.items())
+
+    def resolve_referrers(self, codes):
+        missing = {c for c in codes if c and c not in self.referrers}
+        if missing:
+            self.referrers.update(
+                Profile.objects.filter(referral_code__in=missing).values_list('referral_code', 'user_id')
+            )
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Догоняющий пересчёт сводок платформы (PlatformDailyStats / PlatformCounter) "
+        "по исходным таблицам. По умолчанию — текущие счётчики и последние 2 дня."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help="Сколько последних дней пересчитать")
+        parser.add_argument('--since', help="Пересчитать начиная с даты YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['since']:
+            start = parse_date(options['since'])
+        else:
+            start = today - timedelta(days=max(options['days'], 1) - 1)
+
+        rollups.rebuild_counters()
+        self.stdout.write("Счётчики пересчитаны")
+        day = start
+        while day <= today:
+            rollups.rebuild_day(day)
+            self.stdout.write(f"{day}: готово")
+            day += timedelta(days=1)
@@ -0,0 +1,34 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Перестраивает поисковый индекс админки (core.SearchEntry) по всем индексируемым моделям."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--model', action='append', dest='models',
+            help="Ограничить перестройку моделью (например core.transaction). Можно повторять.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        labels = options['models'] or list(search.INDEXED_FIELDS)
+        for label in labels:
+            model = apps.get_model(label)
+            fields = ('pk',) + search.INDEXED_FIELDS[search.model_label(model)]
+            total = 0
+            last_pk = 0
+            while True:
+                batch = list(
+                    model._default_manager.filter(pk__gt=last_pk)
+                    .order_by('pk').only(*fields)[:batch_size]
+                )
+                if not batch:
+                    break
+                total += search.index_objects(model, batch, batch_size=batch_size)
+                last_pk = batch[-1].pk
+            self.stdout.write(f"{label}: {total} записей")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import broadcast
+from core.models import BroadcastCampaign
+from core.telegram import TelegramTransport
+
+
+class Command(BaseCommand):
+    help = "Отправляет рассылку (core.BroadcastCampaign); прерванная продолжается с места остановки."
+
+    def add_arguments(self, parser):
+        parser.add_argument('campaign_id', type=int)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pool-size', type=int, default=16, help="Параллельных отправок")
+        parser.add_argument(
+            '--global-rate', type=float, default=None,
+            help="Сообщений/с (по умолчанию TELEGRAM_GLOBAL_RATE; при нескольких отправителях делите лимит)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            campaign = BroadcastCampaign.objects.get(pk=options['campaign_id'])
+        except BroadcastCampaign.DoesNotExist:
+            raise CommandError(f"Рассылка #{options['campaign_id']} не найдена")
+
+        transport = TelegramTransport(pool_size=options['pool_size'], global_rate=options['global_rate'])
+
+        def progress(done, total):
+            self.stdout.write(f"{done}/{total}")
+
+        try:
+            result = broadcast.run_campaign(campaign, transport, options['batch_size'], progress)
+        finally:
+            transport.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['status']}: отправлено {result['sent']} из {result['total']}, ошибок {result['failed']} "
+            f"({result['failure_rate']:.1%}), {result['throughput']} msg/s за {result['elapsed_seconds']} с"
+        ))
+        self.stdout.write(f"По статусам: {result['by_status']}")
@@ -0,0 +1,51 @@
+import signal
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import reminders
+
+PRUNE_INTERVAL = 3600
+# id выдаются до коммита: строка с меньшим id может стать видна позже —
+# новые напоминания перечитываем с запасом за последние LOOKBACK секунд
+LOOKBACK = 10
+
+
+class Command(BaseCommand):
+    help = (
+        "Отправляет напоминания «доход готов» (core.ClaimReminder) по колесу таймеров. "
+        "Запускайте один процесс."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tick', type=float, default=1.0, help="Шаг колеса, сек")
+        parser.add_argument('--once', action='store_true', help="Отправить просроченные и выйти")
+
+    def handle(self, *args, **options):
+        wheel = reminders.TimingWheel(tick=options['tick'], start=time.time())
+        last_id = reminders.load_pending(wheel)
+        self.stdout.write(f"В колесе: {len(wheel)} напоминаний")
+
+        history = deque([(time.monotonic(), last_id)])
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+        last_prune = 0
+        while not stopping:
+            close_old_connections()
+            # Новые напоминания — по id, без перечитывания всей таблицы
+            while len(history) > 1 and time.monotonic() - history[1][0] > LOOKBACK:
+                history.popleft()
+            last_id = max(last_id, reminders.load_pending(wheel, history[0][1]))
+            history.append((time.monotonic(), last_id))
+            due = wheel.advance(time.time())
+            if due:
+                sent = reminders.fire(due)
+                self.stdout.write(f"Отправлено напоминаний: {sent}")
+            if options['once']:
+                return
+            if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                reminders.prune()
+                last_prune = time.monotonic()
+            time.sleep(options['tick'])
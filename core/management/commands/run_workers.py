@@ -0,0 +1,87 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from core import jobs
+
+RECOVER_INTERVAL = 60
+
+
+def worker_loop(worker_id, poll_interval, stop_event, once=False):
+    """Цикл одного процесса: расписание -> захват задачи -> выполнение."""
+    last_recover = 0
+    while not stop_event.is_set():
+        close_old_connections()
+        if time.monotonic() - last_recover > RECOVER_INTERVAL:
+            jobs.recover_stale_jobs()
+            last_recover = time.monotonic()
+        jobs.run_due_schedules()
+        job = jobs.claim_job(worker_id)
+        if job is None:
+            if once:
+                break
+            stop_event.wait(poll_interval)
+            continue
+        jobs.run_job(job)
+    connections.close_all()
+
+
+def _child_main(worker_id, poll_interval, stop_event):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    worker_loop(worker_id, poll_interval, stop_event)
+
+
+class Command(BaseCommand):
+    help = "Запускает воркеры очереди фоновых задач (core.Job) и планировщик JobSchedule."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=int(os.environ.get('JOB_WORKERS', 2)))
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Пауза при пустой очереди, сек")
+        parser.add_argument('--once', action='store_true', help="Выполнить готовые задачи в текущем процессе и выйти")
+
+    def handle(self, *args, **options):
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        if options['once']:
+            worker_loop(f"{prefix}:0", 0, multiprocessing.Event(), once=True)
+            return
+
+        # Соединения с БД не должны переходить в дочерние процессы
+        connections.close_all()
+        stop_event = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(
+                target=_child_main, args=(f"{prefix}:{i}", options['poll_interval'], stop_event), daemon=True,
+            )
+            for i in range(max(options['processes'], 1))
+        ]
+        for proc in processes:
+            proc.start()
+        self.stdout.write(f"Запущено воркеров: {len(processes)}")
+
+        # В обработчике сигнала только флаг: Event.set() оттуда может
+        # заблокироваться, если основной поток сам ждёт на этом Event
+        stopping = []
+
+        def stop(signum, frame):
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        while not stopping:
+            for i, proc in enumerate(processes):
+                if not proc.is_alive():
+                    # Упавший процесс перезапускаем, его задачу вернёт recover_stale_jobs
+                    processes[i] = multiprocessing.Process(
+                        target=_child_main, args=(f"{prefix}:{i}", options['poll_interval'], stop_event), daemon=True,
+                    )
+                    processes[i].start()
+            time.sleep(1)
+        stop_event.set()
+        for proc in processes:
+            proc.join(timeout=30)
+        self.stdout.write("Воркеры остановлены")
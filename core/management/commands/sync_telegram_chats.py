@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core import broadcast
+from core.telegram import get_transport
+
+
+class Command(BaseCommand):
+    help = (
+        "Привязывает Telegram-чаты к профилям по /start <токен> из одноразовой ссылки в настройках (getUpdates). "
+        "В работе запускается воркером по расписанию sync_telegram_chats раз в минуту."
+    )
+
+    def handle(self, *args, **options):
+        linked = broadcast.sync_chat_ids(get_transport())
+        self.stdout.write(self.style.SUCCESS(f"Привязано чатов: {linked}"))
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:13
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_alter_dailyreport_report_date'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='buyrequest',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания'),
+        ),
+        migrations.AlterField(
+            model_name='dailyreport',
+            name='report_date',
+            field=models.DateField(auto_now_add=True, db_index=True, verbose_name='Дата отчета'),
+        ),
+        migrations.AlterField(
+            model_name='scooterstats',
+            name='report_date',
+            field=models.DateField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата отчета'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='userscooter',
+            name='purchase_date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата покупки'),
+        ),
+        migrations.AlterField(
+            model_name='withdrawalrequest',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания'),
+        ),
+    ]
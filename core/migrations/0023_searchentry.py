@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:13
+
+from django.db import migrations, models
+
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_searchentry_fts USING fts5("
+    "content, content='core_searchentry', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS core_searchentry_ai AFTER INSERT ON core_searchentry BEGIN "
+    "INSERT INTO core_searchentry_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS core_searchentry_ad AFTER DELETE ON core_searchentry BEGIN "
+    "INSERT INTO core_searchentry_fts(core_searchentry_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS core_searchentry_au AFTER UPDATE ON core_searchentry BEGIN "
+    "INSERT INTO core_searchentry_fts(core_searchentry_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO core_searchentry_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+
+SQLITE_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS core_searchentry_au",
+    "DROP TRIGGER IF EXISTS core_searchentry_ad",
+    "DROP TRIGGER IF EXISTS core_searchentry_ai",
+    "DROP TABLE IF EXISTS core_searchentry_fts",
+]
+
+POSTGRES_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS core_searchentry_trgm ON core_searchentry USING gin (content gin_trgm_ops)",
+]
+
+POSTGRES_TRGM_DROP = [
+    "DROP INDEX IF EXISTS core_searchentry_trgm",
+]
+
+
+def create_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        # trigram-токенизатор есть в SQLite >= 3.34; на старых версиях
+        # core.search работает через LIKE по core_searchentry
+        if schema_editor.connection.Database.sqlite_version_info < (3, 34, 0):
+            return
+        statements = SQLITE_FTS
+    elif vendor == 'postgresql':
+        statements = POSTGRES_TRGM
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_backend(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_FTS_DROP, 'postgresql': POSTGRES_TRGM_DROP}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50, verbose_name='Модель')),
+                ('object_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('content', models.TextField(verbose_name='Текст')),
+            ],
+            options={
+                'verbose_name': 'Поисковая запись',
+                'verbose_name_plural': 'Поисковый индекс',
+                'unique_together': {('model', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_backend, drop_search_backend),
+    ]
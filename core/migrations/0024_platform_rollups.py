@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_searchentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('shard', models.PositiveSmallIntegerField(default=0, verbose_name='Шард')),
+                ('registrations', models.PositiveIntegerField(default=0, verbose_name='Регистрации')),
+                ('deposits_count', models.PositiveIntegerField(default=0, verbose_name='Пополнений')),
+                ('deposits_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма пополнений')),
+                ('earnings_count', models.PositiveIntegerField(default=0, verbose_name='Начислений')),
+                ('earnings_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма начислений')),
+                ('referral_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Реферальные бонусы')),
+                ('purchases_count', models.PositiveIntegerField(default=0, verbose_name='Покупок уровней')),
+                ('purchases_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма покупок')),
+                ('withdrawals_paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выплачено')),
+                ('withdrawal_requests_count', models.PositiveIntegerField(default=0, verbose_name='Заявок на вывод')),
+                ('withdrawal_requests_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма заявок на вывод')),
+                ('buy_requests_count', models.PositiveIntegerField(default=0, verbose_name='Заявок на покупку')),
+            ],
+            options={
+                'verbose_name': 'Сводка платформы за день',
+                'verbose_name_plural': 'Сводки платформы по дням',
+                'ordering': ['-date', 'shard'],
+                'unique_together': {('date', 'shard')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PlatformCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, verbose_name='Ключ')),
+                ('shard', models.PositiveSmallIntegerField(default=0, verbose_name='Шард')),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Счётчик платформы',
+                'verbose_name_plural': 'Счётчики платформы',
+                'unique_together': {('key', 'shard')},
+            },
+        ),
+    ]
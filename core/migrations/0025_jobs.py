@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:26
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_platform_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название')),
+                ('task', models.CharField(max_length=100, verbose_name='Задача')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Параметры')),
+                ('cron', models.CharField(help_text='Например: */15 * * * * или 0 3 * * *', max_length=100, verbose_name='Cron')),
+                ('enabled', models.BooleanField(default=True, verbose_name='Включено')),
+                ('next_run_at', models.DateTimeField(blank=True, null=True, verbose_name='Следующий запуск')),
+                ('last_run_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний запуск')),
+            ],
+            options={
+                'verbose_name': 'Расписание задачи',
+                'verbose_name_plural': 'Расписания задач',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=100, verbose_name='Задача')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Параметры')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='queued', max_length=10, verbose_name='Статус')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Приоритет')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Запуск не раньше')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='Макс. попыток')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='Выполнено')),
+                ('progress_total', models.PositiveIntegerField(default=0, verbose_name='Всего')),
+                ('result', models.TextField(blank=True, verbose_name='Результат')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('locked_by', models.CharField(blank=True, max_length=100, verbose_name='Воркер')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Взята в работу')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_at'], name='core_job_status_run_at')],
+            },
+        ),
+    ]
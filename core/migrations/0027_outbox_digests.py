@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Сумма'),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='category',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Категория'),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='digest',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='merged', to='core.outboxmessage', verbose_name='Сводка'),
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='priority',
+            field=models.SmallIntegerField(default=0, verbose_name='Приоритет'),
+        ),
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка'), ('held', 'Ждёт сводки'), ('merged', 'В сводке')], default='pending', max_length=10, verbose_name='Статус'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0027_outbox_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Название')),
+                ('text', models.TextField(verbose_name='Текст (HTML)')),
+                ('audience', models.CharField(choices=[('all', 'Все, кто подключил бота'), ('investors', 'Владельцы самокатов')], default='all', max_length=20, verbose_name='Аудитория')),
+                ('status', models.CharField(choices=[('draft', 'Черновик'), ('running', 'Отправляется'), ('paused', 'На паузе'), ('done', 'Завершена')], default='draft', max_length=10, verbose_name='Статус')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Получателей')),
+                ('sent', models.PositiveIntegerField(default=0, verbose_name='Отправлено')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Ошибок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'verbose_name': 'Рассылка',
+                'verbose_name_plural': 'Рассылки',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='chat_id',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Чат получателя'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='telegram_chat_id',
+            field=models.BigIntegerField(blank=True, db_index=True, null=True, verbose_name='Telegram chat id'),
+        ),
+        migrations.CreateModel(
+            name='BroadcastRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка'), ('blocked', 'Бот заблокирован')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='core.broadcastcampaign')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Получатель рассылки',
+                'verbose_name_plural': 'Получатели рассылки',
+                'indexes': [models.Index(fields=['campaign', 'status', 'id'], name='core_bcast_rcpt_status')],
+                'unique_together': {('campaign', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0028_broadcast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_at', models.DateTimeField(verbose_name='Когда напомнить')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('sent', 'Отправлено'), ('cancelled', 'Отменено')], default='pending', max_length=10, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Отправлено')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claim_reminders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Напоминание о доходе',
+                'verbose_name_plural': 'Напоминания о доходе',
+                'indexes': [models.Index(fields=['status', 'id'], name='core_claimrem_status_id'), models.Index(fields=['user', 'status'], name='core_claimrem_user_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.db.models import F
+from django.utils import timezone
+import django.utils.timezone
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Старые заявки: «изменены» в момент создания, иначе все они попали бы
+    # в ленту изменений как новые
+    WithdrawalRequest = apps.get_model('core', 'WithdrawalRequest')
+    WithdrawalRequest.objects.update(updated_at=F('created_at'))
+    # У отчёта нет времени создания — начало дня отчёта
+    DailyReport = apps.get_model('core', 'DailyReport')
+    for day in DailyReport.objects.order_by().values_list('report_date', flat=True).distinct():
+        DailyReport.objects.filter(report_date=day).update(
+            updated_at=timezone.make_aware(datetime.combine(day, time.min)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_cache_table'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='withdrawalrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата обновления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='dailyreport',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата обновления'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='core_tx_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='buyrequest',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='core_buyreq_user_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawalrequest',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='core_withdraw_user_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyreport',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='core_report_user_updated'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_change_feed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='buyrequest',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='core_buyreq_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawalrequest',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='core_withdraw_user_created'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_timeline_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='buyrequest',
+            index=models.Index(fields=['status', 'created_at'], name='core_buyreq_status_created'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'type', 'created_at'], name='core_tx_user_type_created'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:04
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(django.db.models.functions.text.Upper('telegram_username'), name='core_profile_tg_username'),
+        ),
+        migrations.AddIndex(
+            model_name='withdrawalrequest',
+            index=models.Index(fields=['status', 'created_at'], name='core_withdraw_status_created'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_check_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='buyrequest',
+            name='core_buyreq_status_created',
+        ),
+        migrations.AddIndex(
+            model_name='buyrequest',
+            index=models.Index(fields=['status', 'id'], name='core_buyreq_status_id'),
+        ),
+    ]
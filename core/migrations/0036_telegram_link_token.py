@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-19 19:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0035_buyreq_status_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TelegramLinkToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token_hash', models.CharField(max_length=64, unique=True, verbose_name='Хэш токена')),
+                ('replace', models.BooleanField(default=False, verbose_name='Замена чата')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('expires_at', models.DateTimeField(verbose_name='Действует до')),
+                ('used_at', models.DateTimeField(blank=True, null=True, verbose_name='Использован')),
+                ('chat_id', models.BigIntegerField(blank=True, null=True, verbose_name='Telegram chat id')),
+            ],
+            options={
+                'verbose_name': 'Ссылка привязки Telegram',
+                'verbose_name_plural': 'Ссылки привязки Telegram',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='profile',
+            name='core_profile_tg_username',
+        ),
+        migrations.AddField(
+            model_name='telegramlinktoken',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telegram_link_tokens', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+    ]
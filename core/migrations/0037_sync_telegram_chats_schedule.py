@@ -0,0 +1,27 @@
+from django.db import migrations
+
+SCHEDULE_NAME = 'sync_telegram_chats'
+
+
+def create_schedule(apps, schema_editor):
+    # Без регулярного getUpdates ссылки привязки чата (15 минут) истекают
+    # неразобранными — разбираем раз в минуту воркером zeepy-worker
+    JobSchedule = apps.get_model('core', 'JobSchedule')
+    JobSchedule.objects.get_or_create(
+        name=SCHEDULE_NAME, defaults={'task': 'core.sync_telegram_chats', 'cron': '* * * * *'},
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    apps.get_model('core', 'JobSchedule').objects.filter(name=SCHEDULE_NAME).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_telegram_link_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
@@ -1,4 +1,5 @@
 
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -6,6 +7,24 @@ import uuid
 from decimal import Decimal
 from django.conf import settings
 
+def related_label(obj, field, attr):
+    """
+    Атрибут связанного объекта для __str__ — только если объект уже загружен
+    (select_related), иначе '#<id>': строка списка не должна стоить запроса.
+    """
+    relation = obj._meta.get_field(field)
+    if relation.is_cached(obj):
+        return getattr(getattr(obj, field), attr)
+    return f'#{getattr(obj, relation.attname)}'
+
+
+def level_label(level_id):
+    """Подпись уровня из каталога в памяти (core/catalog.py) — без запроса."""
+    from .catalog import get_level
+    level = get_level(level_id)
+    return str(level) if level else f'Level #{level_id}'
+
+
 # Профиль пользователя
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -18,6 +37,8 @@ class Profile(models.Model):
     wallet = models.CharField(max_length=255, blank=True, null=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
     telegram_username = models.CharField(max_length=100, blank=True, null=True, verbose_name="Telegram Username")
+    # Заполняется `manage.py sync_telegram_chats`, когда пользователь пишет боту /start
+    telegram_chat_id = models.BigIntegerField(null=True, blank=True, db_index=True, verbose_name="Telegram chat id")
 
 
     def save(self, *args, **kwargs):
@@ -26,7 +47,7 @@ class Profile(models.Model):
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.user.username} Profile"
+        return f"{related_label(self, 'user', 'username')} Profile"
 
 
 # Транзакции
@@ -41,14 +62,20 @@ class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     comment = models.CharField(max_length=255, blank=True, null=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Лента изменений (core/feeds.py)
+            models.Index(fields=['user', 'created_at', 'id'], name='core_tx_user_created'),
+            # Кулдаун claim и суммы начислений (core/queries.py)
+            models.Index(fields=['user', 'type', 'created_at'], name='core_tx_user_type_created'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.type} - {self.amount}"
+        return f"{related_label(self, 'user', 'username')} - {self.type} - {self.amount}"
 
 
 
@@ -135,16 +162,23 @@ class BuyRequest(models.Model):
         default='pending',
         verbose_name="Статус"
     )
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     def __str__(self):
-        return f"Запрос от {self.user.username} на Level {self.level.number} ({self.get_status_display()})"
+        return f"Запрос от {related_label(self, 'user', 'username')} на {level_label(self.level_id)} ({self.get_status_display()})"
 
     class Meta:
         verbose_name = "Запрос на покупку"
         verbose_name_plural = "Запросы на покупку"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='core_buyreq_user_updated'),
+            # Лента активности (core/timeline.py)
+            models.Index(fields=['user', 'created_at', 'id'], name='core_buyreq_user_created'),
+            # Очередь заявок в админке: фильтр по статусу, порядок -pk
+            models.Index(fields=['status', 'id'], name='core_buyreq_status_id'),
+        ]
 
 
 class UserScooter(models.Model):
@@ -155,11 +189,11 @@ class UserScooter(models.Model):
     level = models.ForeignKey(ScooterLevel, on_delete=models.CASCADE, verbose_name="Уровень самоката")
     # ✅ ДОБАВЛЕНО: Поле для хранения количества самокатов
     quantity = models.PositiveIntegerField(default=1, verbose_name="Количество")
-    purchase_date = models.DateTimeField(auto_now_add=True, verbose_name="Дата покупки")
+    purchase_date = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата покупки")
 
     def __str__(self):
         # ✅ ИЗМЕНЕНО: Теперь в названии отображается количество
-        return f"{self.user.username} - {self.level} (x{self.quantity})"
+        return f"{related_label(self, 'user', 'username')} - {level_label(self.level_id)} (x{self.quantity})"
 
     class Meta:
         verbose_name = "Самокат пользователя"
@@ -186,15 +220,22 @@ class WithdrawalRequest(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Сумма")
     wallet_address = models.CharField(max_length=255, verbose_name="Адрес кошелька (USDT TRC-20)")
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     def __str__(self):
-        return f"Запрос на вывод от {self.user.username} на сумму ${self.amount}"
+        return f"Запрос на вывод от {related_label(self, 'user', 'username')} на сумму ${self.amount}"
 
     class Meta:
         verbose_name = "Запрос на вывод"
         verbose_name_plural = "Запросы на вывод"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='core_withdraw_user_updated'),
+            models.Index(fields=['user', 'created_at', 'id'], name='core_withdraw_user_created'),
+            # Ожидающие выводы: админка и сводка платформы (core/rollups.py)
+            models.Index(fields=['status', 'created_at'], name='core_withdraw_status_created'),
+        ]
 
 
 
@@ -203,20 +244,25 @@ class DailyReport(models.Model):
     Модель для хранения ежедневных отчетов о прокате.
     """
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Пользователь")
-    report_date = models.DateField(auto_now_add=True, verbose_name="Дата отчета")
+    report_date = models.DateField(auto_now_add=True, db_index=True, verbose_name="Дата отчета")
     total_distance = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Общий пробег (км)")
     profit_percentage = models.DecimalField(max_digits=5, decimal_places=2, verbose_name="Процент прибыли (%)")
     profit_amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Сумма прибыли (€)")
     number_of_trips = models.IntegerField(verbose_name="Количество поездок")
+    # Отчёт за день пересчитывается (update_or_create) — лента изменений идёт по этому полю
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
     def __str__(self):
-        return f"Отчет для {self.user.username} за {self.report_date.strftime('%Y-%m-%d')}"
+        return f"Отчет для {related_label(self, 'user', 'username')} за {self.report_date.strftime('%Y-%m-%d')}"
 
     class Meta:
         verbose_name = "Дневной отчет"
         verbose_name_plural = "Дневные отчеты"
         ordering = ['-report_date'] 
         unique_together = ('user', 'report_date')
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='core_report_user_updated'),
+        ]
 
 
 from decimal import Decimal
@@ -229,6 +275,7 @@ class ScooterStats(models.Model):
     )
     report_date = models.DateField(
         default=timezone.now, # Use default instead of auto_now_add
+        db_index=True,
         verbose_name="Дата отчета"
     )
     # Changed from PositiveIntegerField to CharField
@@ -263,5 +310,305 @@ class ScooterStats(models.Model):
         ordering = ["-report_date", "scooter_number"]
 
     def __str__(self):
-        return f"{self.user.username} | Скутер {self.scooter_number} | {self.report_date.strftime('%Y-%m-%d')}"
+        return f"{related_label(self, 'user', 'username')} | Скутер {self.scooter_number} | {self.report_date.strftime('%Y-%m-%d')}"
+
+
+
+class SearchEntry(models.Model):
+    """
+    Поисковый индекс для админки: одна строка на индексируемый объект.
+    На SQLite поверх таблицы построен FTS5 (trigram), на PostgreSQL —
+    GIN-индекс pg_trgm по content. Заполняется сигналами (core/signals.py).
+    """
+    model = models.CharField(max_length=50, verbose_name="Модель")
+    object_id = models.BigIntegerField(verbose_name="ID объекта")
+    content = models.TextField(verbose_name="Текст")
+
+    class Meta:
+        verbose_name = "Поисковая запись"
+        verbose_name_plural = "Поисковый индекс"
+        unique_together = ('model', 'object_id')
+
+
+class PlatformDailyStats(models.Model):
+    """
+    Дневная сводка по платформе для главной страницы админки.
+    Обновляется инкрементально (core/rollups.py); чтобы параллельные
+    начисления не упирались в блокировку одной строки, день разбит на
+    несколько шардов, которые суммируются при чтении.
+    """
+    date = models.DateField(verbose_name="Дата")
+    shard = models.PositiveSmallIntegerField(default=0, verbose_name="Шард")
+    registrations = models.PositiveIntegerField(default=0, verbose_name="Регистрации")
+    deposits_count = models.PositiveIntegerField(default=0, verbose_name="Пополнений")
+    deposits_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Сумма пополнений")
+    earnings_count = models.PositiveIntegerField(default=0, verbose_name="Начислений")
+    earnings_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Сумма начислений")
+    referral_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Реферальные бонусы")
+    purchases_count = models.PositiveIntegerField(default=0, verbose_name="Покупок уровней")
+    purchases_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Сумма покупок")
+    withdrawals_paid_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Выплачено")
+    withdrawal_requests_count = models.PositiveIntegerField(default=0, verbose_name="Заявок на вывод")
+    withdrawal_requests_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Сумма заявок на вывод")
+    buy_requests_count = models.PositiveIntegerField(default=0, verbose_name="Заявок на покупку")
+
+    class Meta:
+        verbose_name = "Сводка платформы за день"
+        verbose_name_plural = "Сводки платформы по дням"
+        unique_together = ('date', 'shard')
+        ordering = ['-date', 'shard']
+
+    def __str__(self):
+        return f"Сводка за {self.date.strftime('%Y-%m-%d')} (шард {self.shard})"
+
+
+class PlatformCounter(models.Model):
+    """
+    Текущие значения (gauge) для админки: сумма ожидающих выводов,
+    активные самокаты по уровням и т.п. Ключи — см. core/rollups.py.
+    """
+    key = models.CharField(max_length=64, verbose_name="Ключ")
+    shard = models.PositiveSmallIntegerField(default=0, verbose_name="Шард")
+    value = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Значение")
+
+    class Meta:
+        verbose_name = "Счётчик платформы"
+        verbose_name_plural = "Счётчики платформы"
+        unique_together = ('key', 'shard')
+
+    def __str__(self):
+        return f"{self.key}[{self.shard}] = {self.value}"
+
+
+class Job(models.Model):
+    """
+    Фоновая задача (очередь в БД, см. core/jobs.py и manage.py run_workers).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    task = models.CharField(max_length=100, verbose_name="Задача")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', verbose_name="Статус")
+    priority = models.SmallIntegerField(default=0, verbose_name="Приоритет")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="Запуск не раньше")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveSmallIntegerField(default=5, verbose_name="Макс. попыток")
+    progress = models.PositiveIntegerField(default=0, verbose_name="Выполнено")
+    progress_total = models.PositiveIntegerField(default=0, verbose_name="Всего")
+    result = models.TextField(blank=True, verbose_name="Результат")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Воркер")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята в работу")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='core_job_status_run_at'),
+        ]
 
+    def __str__(self):
+        return f"#{self.pk} {self.task} ({self.get_status_display()})"
+
+
+class JobSchedule(models.Model):
+    """
+    Периодический запуск задачи по cron-выражению (минута час день месяц день_недели).
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Название")
+    task = models.CharField(max_length=100, verbose_name="Задача")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Параметры")
+    cron = models.CharField(max_length=100, verbose_name="Cron", help_text="Например: */15 * * * * или 0 3 * * *")
+    enabled = models.BooleanField(default=True, verbose_name="Включено")
+    next_run_at = models.DateTimeField(null=True, blank=True, verbose_name="Следующий запуск")
+    last_run_at = models.DateTimeField(null=True, blank=True, verbose_name="Последний запуск")
+
+    class Meta:
+        verbose_name = "Расписание задачи"
+        verbose_name_plural = "Расписания задач"
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} ({self.cron})"
+
+    def clean(self):
+        from .jobs import REGISTRY, CronExpression
+        if self.task not in REGISTRY:
+            raise ValidationError({'task': f"Неизвестная задача. Доступны: {', '.join(sorted(REGISTRY))}"})
+        try:
+            CronExpression(self.cron)
+        except ValueError as e:
+            raise ValidationError({'cron': str(e)})
+
+
+class OutboxMessage(models.Model):
+    """
+    Исходящее Telegram-уведомление (outbox). Пишется в той же транзакции,
+    что и бизнес-изменение; отправляет `manage.py dispatch_outbox`.
+    Массовые события (category) не отправляются по одному, а ждут в
+    статусе held и сводятся в периодическую сводку (см. outbox.flush_digests).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+        ('held', 'Ждёт сводки'),
+        ('merged', 'В сводке'),
+    ]
+
+    text = models.TextField(verbose_name="Текст")
+    # Пусто — в админские чаты (settings.TELEGRAM_CHAT_IDS), иначе — только в этот чат
+    chat_id = models.CharField(max_length=32, blank=True, verbose_name="Чат получателя")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    category = models.CharField(max_length=20, blank=True, verbose_name="Категория")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Сумма")
+    priority = models.SmallIntegerField(default=0, verbose_name="Приоритет")
+    digest = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='merged',
+        verbose_name="Сводка",
+    )
+    delivered_to = models.JSONField(default=list, blank=True, verbose_name="Доставлено в чаты")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взято в отправку")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+
+    class Meta:
+        verbose_name = "Исходящее уведомление"
+        verbose_name_plural = "Исходящие уведомления"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='core_outbox_status_next'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_status_display()}: {self.text[:40]}"
+
+
+class TelegramLinkToken(models.Model):
+    """
+    Одноразовая ссылка t.me/<бот>?start=<токен> для привязки чата к профилю
+    (см. core/broadcast.py). Хранится только sha256 токена.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='telegram_link_tokens', verbose_name="Пользователь")
+    token_hash = models.CharField(max_length=64, unique=True, verbose_name="Хэш токена")
+    # Разрешает заменить уже привязанный чат — выдаётся после ввода пароля
+    replace = models.BooleanField(default=False, verbose_name="Замена чата")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    expires_at = models.DateTimeField(verbose_name="Действует до")
+    used_at = models.DateTimeField(null=True, blank=True, verbose_name="Использован")
+    chat_id = models.BigIntegerField(null=True, blank=True, verbose_name="Telegram chat id")
+
+    class Meta:
+        verbose_name = "Ссылка привязки Telegram"
+        verbose_name_plural = "Ссылки привязки Telegram"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.created_at:%Y-%m-%d %H:%M}"
+
+
+class BroadcastCampaign(models.Model):
+    """
+    Рассылка пользователям в Telegram (см. core/broadcast.py). Получатели
+    материализуются в BroadcastRecipient при запуске; счётчики sent/failed
+    обновляются по ходу отправки.
+    """
+    STATUS_CHOICES = [
+        ('draft', 'Черновик'),
+        ('running', 'Отправляется'),
+        ('paused', 'На паузе'),
+        ('done', 'Завершена'),
+    ]
+    AUDIENCE_CHOICES = [
+        ('all', 'Все, кто подключил бота'),
+        ('investors', 'Владельцы самокатов'),
+    ]
+
+    name = models.CharField(max_length=200, verbose_name="Название")
+    text = models.TextField(verbose_name="Текст (HTML)")
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default='all', verbose_name="Аудитория")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft', verbose_name="Статус")
+    total = models.PositiveIntegerField(default=0, verbose_name="Получателей")
+    sent = models.PositiveIntegerField(default=0, verbose_name="Отправлено")
+    failed = models.PositiveIntegerField(default=0, verbose_name="Ошибок")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начата")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    class Meta:
+        verbose_name = "Рассылка"
+        verbose_name_plural = "Рассылки"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return self.name
+
+
+class BroadcastRecipient(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+        ('blocked', 'Бот заблокирован'),
+    ]
+
+    campaign = models.ForeignKey(BroadcastCampaign, on_delete=models.CASCADE, related_name='recipients')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    chat_id = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    locked_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+
+    class Meta:
+        verbose_name = "Получатель рассылки"
+        verbose_name_plural = "Получатели рассылки"
+        unique_together = ('campaign', 'user')
+        indexes = [
+            models.Index(fields=['campaign', 'status', 'id'], name='core_bcast_rcpt_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign_id}: {self.user_id} ({self.get_status_display()})"
+
+
+class ClaimReminder(models.Model):
+    """
+    Напоминание «доход готов к получению». Создаётся при claim, отправляется
+    `manage.py run_reminders` (колесо таймеров, см. core/reminders.py).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('sent', 'Отправлено'),
+        ('cancelled', 'Отменено'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='claim_reminders')
+    due_at = models.DateTimeField(verbose_name="Когда напомнить")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', verbose_name="Статус")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+
+    class Meta:
+        verbose_name = "Напоминание о доходе"
+        verbose_name_plural = "Напоминания о доходе"
+        indexes = [
+            models.Index(fields=['status', 'id'], name='core_claimrem_status_id'),
+            models.Index(fields=['user', 'status'], name='core_claimrem_user_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.due_at:%d.%m.%Y %H:%M} ({self.get_status_display()})"
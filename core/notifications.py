@@ -1,46 +1,42 @@
-import requests
-from django.conf import settings
 from django.utils.html import escape
 
-def send_telegram_message(text: str):
+from . import outbox
+
+def send_telegram_message(text: str, category='', amount=None, priority=0):
+    """
+    Ставит сообщение для админских чатов (settings.TELEGRAM_CHAT_IDS) в outbox.
+    Сеть здесь не трогается: строка пишется в текущей транзакции, а
+    отправляет её `manage.py dispatch_outbox` (см. core/outbox.py).
+    category — массовое событие, которое уйдёт в периодической сводке.
+    """
+    outbox.enqueue(text, category=category, amount=amount, priority=priority)
+
+
+def send_user_message(user, text: str, priority=0):
     """
-    Отправляет текстовое сообщение во все чаты из settings.TELEGRAM_CHAT_IDS.
+    Личное сообщение пользователю через outbox — если он подключил бота
+    (Profile.telegram_chat_id). Возвращает False, если писать некуда.
     """
-    url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-
-    # Если в settings остался единичный TELEGRAM_CHAT_ID, приведём его к списку:
-    chat_ids = getattr(settings, 'TELEGRAM_CHAT_IDS', None)
-    if chat_ids is None:
-        # fallback на старое поле
-        chat_ids = [settings.TELEGRAM_CHAT_ID]
-    # Если переменная - строка, а не список, преобразуем ее
-    elif isinstance(chat_ids, str):
-        chat_ids = [chat_id.strip() for chat_id in chat_ids.split(',')]
-
-
-    for chat_id in chat_ids:
-        # --- НАЧАЛО ИЗМЕНЕНИЙ ---
-        payload = {
-            'chat_id': str(chat_id),
-            'text': text,  # Убрано двойное экранирование escape(text)
-            'parse_mode': 'HTML' # Явно указываем режим разметки
-        }
-        # --- КОНЕЦ ИЗМЕНЕНИЙ ---
-
-        print(f"[TG DEBUG] URL:     {url}")
-        print(f"[TG DEBUG] payload: {payload}")
-        try:
-            r = requests.post(url, data=payload, timeout=5)
-            r.raise_for_status()
-            print(f"[TG DEBUG] Ответ API (chat {chat_id}): {r.text}")
-        except requests.RequestException as e:
-            print(f"[TG ERROR] Chat {chat_id}: {e}")
+    chat_id = getattr(getattr(user, 'profile', None), 'telegram_chat_id', None)
+    if not chat_id:
+        return False
+    outbox.enqueue(text, priority=priority, chat_id=chat_id)
+    return True
+
+
+# Источник начисления -> категория сводки; остальные (ручные из админки) — сразу
+CREDIT_DIGEST_CATEGORIES = {
+    'daily_profit': 'earning',
+    'referral': 'referral',
+}
+
 
 # === Регистрация ===
 def notify_registration(user):
     send_telegram_message(
         f"<b>🆕 Новая регистрация!</b>\n"
-        f"👤 Email: {escape(user.email)}"
+        f"👤 Email: {escape(user.email)}",
+        category='registration',
     )
 # Алиас
 notify_new_user = notify_registration
@@ -51,7 +47,8 @@ def notify_referral_signup(invited_user, inviter):
     send_telegram_message(
         f"<b>👥 Реферальная регистрация</b>\n"
         f"👤 Новый: {escape(invited_user.email)}\n"
-        f"🤝 Пригласил: {escape(inviter.email)}"
+        f"🤝 Пригласил: {escape(inviter.email)}",
+        category='referral_signup',
     )
 
 
@@ -64,7 +61,7 @@ def notify_balance_credit(user, amount, source=None):
     )
     if source:
         msg += f"\n🏷 Источник: {escape(source)}"
-    send_telegram_message(msg)
+    send_telegram_message(msg, category=CREDIT_DIGEST_CATEGORIES.get(source, ''), amount=amount)
 
 
 # === Запрос на вывод (views) ===
@@ -79,7 +76,7 @@ def notify_withdraw_request(user, amount, method=None, wallet=None):
     if wallet:
         # Кошелек оборачиваем в <pre> и <code>, чтобы сохранить форматирование и символы
         msg += f"\n\n👛 Кошелёк:\n<pre><code>{escape(wallet)}</code></pre>"
-    send_telegram_message(msg)
+    send_telegram_message(msg, priority=outbox.PRIORITY_HIGH)
 
 
 # === Запрос на вывод (admin) ===
@@ -94,7 +91,7 @@ def notify_withdrawal_request_admin(req):
         f"🕓 Дата: {date}\n\n"
         f"👛 Кошелёк:\n<pre><code>{escape(req.wallet_address)}</code></pre>"
     )
-    send_telegram_message(msg)
+    send_telegram_message(msg, priority=outbox.PRIORITY_HIGH)
 # Алиас для admin.py
 notify_withdrawal_request = notify_withdrawal_request_admin
 
@@ -104,7 +101,18 @@ def notify_withdrawal_confirmed(req):
     send_telegram_message(
         f"<b>✅ Вывод подтверждён</b>\n"
         f"👤 {escape(req.user.email)}\n"
-        f"💵 {req.amount} $"
+        f"💵 {req.amount} $",
+        priority=outbox.PRIORITY_HIGH,
+    )
+
+
+def notify_user_withdrawal_confirmed(req):
+    send_user_message(
+        req.user,
+        f"<b>✅ Выплата отправлена</b>\n"
+        f"💵 {req.amount} $\n"
+        f"👛 <code>{escape(req.wallet_address)}</code>",
+        priority=outbox.PRIORITY_HIGH,
     )
 
 
@@ -174,5 +182,6 @@ def notify_referral_bonus(user, amount, level_from):
         f"<b>💸 Реферальный бонус</b>\n"
         f"👤 {escape(user.email)}\n"
         f"🔗 Уровень: {level_from}\n"
-        f"💰 Сумма: {amount} $"
+        f"💰 Сумма: {amount} $",
+        category='referral', amount=amount,
     )
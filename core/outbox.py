@@ -0,0 +1,204 @@
+"""
+Outbox для Telegram-уведомлений.
+
+notify_* (core/notifications.py) только пишут строку OutboxMessage —
+в той же транзакции, что и начисление/заявка. Если транзакция
+откатилась, уведомления не будет; если закоммитилась — оно гарантированно
+уйдёт, даже когда Telegram недоступен. Сетью занимается только
+`manage.py dispatch_outbox` (через core.telegram.TelegramTransport).
+
+Сводки: события массовых категорий (начисления, регистрации, реф. бонусы)
+пишутся со статусом held и раз в окно из settings.TELEGRAM_DIGEST_WINDOWS
+сворачиваются в одно сообщение с количеством и суммой. Выводы и прочие
+важные события идут сразу и с повышенным приоритетом.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Sum
+from django.utils import timezone
+
+from .jobs import backoff_delay
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 10
+LOCK_TIMEOUT = timedelta(minutes=5)
+
+PRIORITY_HIGH = 10
+
+# Категория -> (заголовок строки в сводке, окно по умолчанию в секундах)
+DIGEST_CATEGORIES = {
+    'earning': ('💰 Начисления дохода', 900),
+    'registration': ('🆕 Регистрации', 900),
+    'referral_signup': ('👥 Из них по реф. ссылке', 900),
+    'referral': ('💸 Реферальные бонусы', 900),
+}
+
+
+def admin_chat_ids():
+    """Чаты админов из settings.TELEGRAM_CHAT_IDS (или устаревшего TELEGRAM_CHAT_ID)."""
+    chat_ids = getattr(settings, 'TELEGRAM_CHAT_IDS', None)
+    if chat_ids is None:
+        chat_ids = [getattr(settings, 'TELEGRAM_CHAT_ID', None)]
+    elif isinstance(chat_ids, str):
+        chat_ids = chat_ids.split(',')
+    return [str(c).strip() for c in chat_ids if c and str(c).strip()]
+
+
+def digest_windows():
+    """Окна сводок, сек: settings.TELEGRAM_DIGEST_WINDOWS поверх значений по умолчанию; 0 — слать сразу."""
+    windows = {category: window for category, (_, window) in DIGEST_CATEGORIES.items()}
+    windows.update(getattr(settings, 'TELEGRAM_DIGEST_WINDOWS', None) or {})
+    return windows
+
+
+def enqueue(text, category='', amount=None, priority=0, chat_id=''):
+    """chat_id — личное сообщение пользователю; без него — в админские чаты."""
+    held = bool(category and digest_windows().get(category))
+    return OutboxMessage.objects.create(
+        text=text, category=category, amount=amount, priority=priority,
+        chat_id=str(chat_id or ''), status='held' if held else 'pending',
+    )
+
+
+def flush_digests(force=False):
+    """
+    Сворачивает накопленные события в одно сообщение-сводку. Категория
+    попадает в сводку, когда её самому старому событию исполнилось окно
+    (force — все сразу). Возвращает созданное сообщение или None.
+    """
+    now = timezone.now()
+    windows = digest_windows()
+    due = [
+        row['category']
+        for row in OutboxMessage.objects.filter(status='held').values('category').annotate(oldest=Min('created_at'))
+        if force or now - row['oldest'] >= timedelta(seconds=windows.get(row['category']) or 0)
+    ]
+    if not due:
+        return None
+
+    with transaction.atomic():
+        digest = OutboxMessage.objects.create(text='', status='pending', category='digest')
+        # Условный UPDATE: при двух одновременных диспетчерах каждое
+        # событие попадёт ровно в одну сводку
+        OutboxMessage.objects.filter(status='held', category__in=due, created_at__lte=now).update(
+            status='merged', digest=digest,
+        )
+        rows = list(
+            OutboxMessage.objects.filter(digest=digest).values('category')
+            .annotate(count=Count('id'), total=Sum('amount'), oldest=Min('created_at'))
+            .order_by()
+        )
+        if not rows:
+            digest.delete()
+            return None
+        digest.text = render_digest(rows, now)
+        digest.save(update_fields=['text'])
+    return digest
+
+
+def render_digest(rows, now):
+    oldest = timezone.localtime(min(row['oldest'] for row in rows))
+    lines = [
+        "<b>🧾 Сводка уведомлений</b>",
+        f"🕓 {oldest:%d.%m %H:%M} – {timezone.localtime(now):%H:%M}",
+    ]
+    order = list(DIGEST_CATEGORIES)
+    rows = sorted(rows, key=lambda row: order.index(row['category']) if row['category'] in order else len(order))
+    for row in rows:
+        title = DIGEST_CATEGORIES.get(row['category'], (row['category'], None))[0]
+        line = f"{title}: {row['count']}"
+        if row['total'] is not None:
+            line += f" на {row['total']:.2f} $"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def claim_batch(limit=50):
+    """Забирает до limit готовых к отправке сообщений (статус sending)."""
+    now = timezone.now()
+    ready = (
+        OutboxMessage.objects.filter(status='pending', next_attempt_at__lte=now)
+        .order_by('-priority', 'next_attempt_at')
+    )
+    claim = {'status': 'sending', 'locked_at': now, 'attempts': F('attempts') + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(ready.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limit])
+            OutboxMessage.objects.filter(pk__in=ids).update(**claim)
+    else:
+        ids = [
+            pk for pk in ready.values_list('pk', flat=True)[:limit]
+            if OutboxMessage.objects.filter(pk=pk, status='pending').update(**claim)
+        ]
+    return list(OutboxMessage.objects.filter(pk__in=ids).order_by('-priority', 'created_at'))
+
+
+def deliver_batch(messages, transport):
+    """
+    Отправляет пачку сообщений во все чаты получателей (личный chat_id или
+    админские), которым они ещё не доставлены. Чаты обслуживаются параллельно (см. TelegramTransport.send_many),
+    порядок сообщений внутри чата сохраняется. Возвращает число отправленных.
+    """
+    admins = admin_chat_ids()
+    plan = [(message, chat_id) for message in messages for chat_id in ([message.chat_id] if message.chat_id else admins)
+            if chat_id not in message.delivered_to]
+    results = transport.send_many([(chat_id, message.text) for message, chat_id in plan])
+
+    delivered = {message.pk: list(message.delivered_to) for message in messages}
+    errors = defaultdict(list)
+    for (message, chat_id), error in zip(plan, results):
+        if error is None:
+            delivered[message.pk].append(chat_id)
+        else:
+            errors[message.pk].append(f"{chat_id}: {error}")
+    return sum(_finish(message, delivered[message.pk], errors[message.pk]) for message in messages)
+
+
+def _finish(message, delivered, errors):
+    now = timezone.now()
+    if not errors:
+        OutboxMessage.objects.filter(pk=message.pk).update(
+            status='sent', delivered_to=delivered, sent_at=now, last_error='', locked_at=None,
+        )
+        return True
+    error = '\n'.join(errors)
+    logger.warning("Outbox #%s: не доставлено (попытка %s): %s", message.pk, message.attempts, error)
+    if message.attempts >= MAX_ATTEMPTS:
+        update = {'status': 'failed'}
+    else:
+        update = {'status': 'pending', 'next_attempt_at': now + backoff_delay(message.attempts)}
+    OutboxMessage.objects.filter(pk=message.pk).update(
+        delivered_to=delivered, last_error=error, locked_at=None, **update,
+    )
+    return False
+
+
+def recover_stale():
+    """Возвращает в очередь сообщения, диспетчер которых упал посреди отправки."""
+    return OutboxMessage.objects.filter(status='sending', locked_at__lt=timezone.now() - LOCK_TIMEOUT).update(
+        status='pending', locked_at=None,
+    )
+
+
+def stats():
+    """Глубина очереди и задержка: для админки и мониторинга."""
+    now = timezone.now()
+    rows = (
+        OutboxMessage.objects.filter(status__in=['pending', 'sending', 'failed', 'held'])
+        .values('status').annotate(count=Count('id'), oldest=Min('created_at'))
+    )
+    by_status = {row['status']: row for row in rows}
+    waiting = [by_status[s] for s in ('pending', 'sending') if s in by_status]
+    oldest = min((row['oldest'] for row in waiting), default=None)
+    return {
+        'depth': sum(row['count'] for row in waiting),
+        'failed': by_status.get('failed', {}).get('count', 0),
+        'lag_seconds': int((now - oldest).total_seconds()) if oldest else 0,
+        'held': by_status.get('held', {}).get('count', 0),
+    }
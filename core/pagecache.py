@@ -0,0 +1,125 @@
+"""
+Кэш целых страниц для анонимных посетителей.
+
+    @cache_anonymous_page(vary_on=('level_id',))
+    def payment_view(request): ...
+
+- Ключ: view + версия каталога уровней + только перечисленные в vary_on
+  GET-параметры (utm_*, fbclid и прочий мусор рекламных ссылок не плодит
+  копии). Изменение ScooterLevel меняет версию каталога — страницы
+  перестраиваются сами.
+- remember={'ref': 'ref_code'}: параметр не входит в ключ, а сохраняется
+  в cookie — страница для ?ref=... та же, что и без него.
+- Ответ получает ETag и Cache-Control; If-None-Match даёт 304 без тела.
+- Хранение и защита от «стаи» — core.cache.TieredCache: страница лежит в
+  памяти процесса и в общем кэше; после истечения её перестраивает один
+  запрос, остальные ещё GRACE секунд получают предыдущую версию.
+- Залогиненные пользователи и не-GET запросы идут мимо кэша.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+
+from .cache import TieredCache
+from .catalog import get_catalog
+
+DEFAULT_TIMEOUT = 300
+GRACE = 60          # сколько после истечения отдаём старую версию, пока её пересчитывают, сек
+REMEMBER_MAX_AGE = 30 * 24 * 3600
+
+# Страница зависит только от ключа, поэтому в памяти процесса её можно
+# держать дольше, чем записи общего назначения
+pages = TieredCache(prefix='page', max_entries=200, local_ttl=30)
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def _is_anonymous(request):
+    # Без cookie сессии пользователь точно аноним — сессию из БД не читаем
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return True
+    return not request.user.is_authenticated
+
+
+def _page_key(view_name, request, vary_on):
+    params = urlencode(sorted((name, request.GET.get(name, '')) for name in vary_on))
+    digest = hashlib.md5(params.encode()).hexdigest()
+    return f'{view_name}:{get_catalog().version}:{digest}'
+
+
+def _cacheable(response):
+    return (
+        response.status_code == 200
+        and not getattr(response, 'streaming', False)
+        and not response.cookies
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def _render(view, request, args, kwargs):
+    response = view(request, *args, **kwargs)
+    if not _cacheable(response):
+        raise _Uncacheable(response)
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'etag': '"%s"' % hashlib.md5(response.content).hexdigest(),
+    }
+
+
+def _respond(request, entry, max_age):
+    if entry['etag'] in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+    response['ETag'] = entry['etag']
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def _remember(request, response, remember):
+    stored = False
+    for param, cookie in (remember or {}).items():
+        value = request.GET.get(param)
+        if value and request.COOKIES.get(cookie) != value:
+            response.set_cookie(cookie, value, max_age=REMEMBER_MAX_AGE, samesite='Lax', httponly=True)
+            stored = True
+    if stored:
+        # Ответ с Set-Cookie не должен попасть в общие кэши (CDN, прокси)
+        if 'public' in response.get('Cache-Control', ''):
+            del response['Cache-Control']
+        patch_cache_control(response, private=True)
+    return response
+
+
+def cache_anonymous_page(vary_on=(), timeout=None, remember=None):
+    def decorator(view):
+        view_name = f'{view.__module__}.{view.__name__}'
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not _is_anonymous(request):
+                return _remember(request, view(request, *args, **kwargs), remember)
+            page_timeout = timeout or getattr(settings, 'PAGE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+            max_age = getattr(settings, 'PAGE_CACHE_MAX_AGE', 60)
+
+            try:
+                entry = pages.get_or_compute(
+                    _page_key(view_name, request, vary_on),
+                    lambda: _render(view, request, args, kwargs),
+                    page_timeout, GRACE,
+                )
+            except _Uncacheable as uncacheable:
+                return _remember(request, uncacheable.response, remember)
+            return _remember(request, _respond(request, entry, max_age), remember)
+        return wrapper
+    return decorator
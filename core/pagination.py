@@ -0,0 +1,157 @@
+"""
+Пагинация для больших таблиц (админка, история операций).
+
+Обычный Paginator делает точный COUNT(*) и OFFSET-запрос для каждой
+страницы. На таблицах с миллионами строк оба запроса читают всю таблицу,
+поэтому здесь:
+  - количество считается не дальше COUNT_LIMIT строк, а для таблицы
+    без фильтров берётся оценка из статистики СУБД;
+  - соседние страницы выбираются keyset-запросом по первичному ключу:
+    ссылка «дальше» несёт pk последней строки (?after=), «назад» — pk
+    первой (?before=), и страница — это WHERE pk < after без OFFSET.
+"""
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+
+def estimate_row_count(model, using='default'):
+    """
+    Быстрая оценка числа строк в таблице модели без COUNT(*).
+    PostgreSQL: pg_class.reltuples. Иначе (или если ANALYZE ещё не
+    запускался) — MAX(pk), который читается из индекса за O(log n).
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    return model._default_manager.using(using).aggregate(m=Max('pk'))['m'] or 0
+
+
+AFTER_VAR = 'after'
+BEFORE_VAR = 'before'
+
+
+class KeysetPage(Page):
+    """
+    Страница с курсорами соседних страниц. more — есть ли строки дальше,
+    если это известно из самой выборки (keyset-страницы читают на строку
+    больше), иначе has_next() считается по count, как обычно.
+    """
+
+    def __init__(self, object_list, number, paginator, more=None):
+        super().__init__(object_list, number, paginator)
+        self.more = more
+
+    def has_next(self):
+        return super().has_next() if self.more is None else self.more
+
+    def next_page_number(self):
+        return self.number + 1 if self.more else super().next_page_number()
+
+    @property
+    def next_after(self):
+        """pk последней строки — курсор следующей страницы (или None)."""
+        if self.paginator._pk_direction() is None or not self.has_next() or not len(self):
+            return None
+        return self[-1].pk
+
+    @property
+    def previous_before(self):
+        """pk первой строки — курсор предыдущей страницы (или None)."""
+        if self.paginator._pk_direction() is None or not self.has_previous() or not len(self):
+            return None
+        return self[0].pk
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator без точного COUNT(*) и без глубокого OFFSET.
+
+    count: точное значение, если строк не больше COUNT_LIMIT; иначе оценка
+    по таблице (без фильтров) или COUNT_LIMIT (с фильтрами — оператору
+    в любом случае стоит сузить выборку).
+
+    page(): с курсором after/before (pk соседней строки из ссылки
+    предыдущей страницы) — keyset-запрос WHERE pk < after, без OFFSET и
+    без сдвига страниц, когда добавляются новые строки. Работает, когда
+    выборка упорядочена по pk (ordering = ('-pk',) в ModelAdmin). Без
+    курсора (первая страница, переход по номеру) или при другом порядке —
+    обычный OFFSET.
+    """
+    COUNT_LIMIT = 10000
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, after=None, before=None):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.after = self._cursor(after)
+        self.before = None if self.after is not None else self._cursor(before)
+        # Последняя выданная страница — по ней changelist строит ссылки с курсорами
+        self.last_page = None
+
+    def _cursor(self, value):
+        if value in (None, ''):
+            return None
+        try:
+            return self.object_list.model._meta.pk.to_python(value)
+        except ValidationError:
+            return None
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        capped = qs.order_by().values('pk')[:self.COUNT_LIMIT + 1].count()
+        if capped <= self.COUNT_LIMIT:
+            return capped
+        if not qs.query.where:
+            return max(estimate_row_count(qs.model, qs.db), self.COUNT_LIMIT)
+        return self.COUNT_LIMIT
+
+    def _pk_direction(self):
+        """'-' / '' если выборка упорядочена по pk, иначе None."""
+        ordering = list(self.object_list.query.order_by)
+        if not ordering:
+            ordering = list(self.object_list.model._meta.ordering)
+        if not ordering:
+            return None
+        first = ordering[0]
+        if not isinstance(first, str):
+            return None
+        desc = first.startswith('-')
+        name = first.lstrip('-')
+        if name not in ('pk', self.object_list.model._meta.pk.attname):
+            return None
+        return '-' if desc else ''
+
+    def _get_page(self, *args, **kwargs):
+        page = self.last_page = KeysetPage(*args, **kwargs)
+        return page
+
+    def page(self, number):
+        direction = self._pk_direction()
+        keyset = direction is not None and (self.after is not None or self.before is not None)
+        try:
+            number = self.validate_number(number)
+        except EmptyPage:
+            # count с фильтрами ограничен COUNT_LIMIT — по курсору можно уйти дальше
+            if not keyset or int(number) < 1:
+                raise
+            number = int(number)
+        if not keyset or number == 1:
+            return super().page(number)
+
+        desc = direction == '-'
+        if self.after is not None:
+            rows = list(self.object_list.filter(**{'pk__lt' if desc else 'pk__gt': self.after})[:self.per_page + 1])
+            return self._get_page(rows[:self.per_page], number, self, more=len(rows) > self.per_page)
+        # Назад: строки перед первой строкой текущей страницы, в обратном порядке
+        rows = list(self.object_list.filter(**{'pk__gt' if desc else 'pk__lt': self.before}).reverse()[:self.per_page])
+        rows.reverse()
+        return self._get_page(rows, number, self, more=True)
@@ -0,0 +1,46 @@
+"""
+Горячие запросы сайта в одном месте.
+
+Представления строят эти выборки через функции ниже, а QueryPlanTests
+(core/tests.py) проверяет через EXPLAIN, что каждая из HOT_QUERIES идёт
+по индексу. Новый частый запрос — новая функция и строка в HOT_QUERIES,
+тогда индекс под него проверяется автоматически.
+"""
+from .models import BuyRequest, DailyReport, ScooterStats, Transaction, WithdrawalRequest
+
+
+def earnings(user):
+    """Начисления пользователя: последний claim (кулдаун) и сумма дохода."""
+    return Transaction.objects.filter(user=user, type='earning')
+
+
+def recent_withdrawals(user, since):
+    """Заявки на вывод за период — проверка «раз в 12 часов»."""
+    return WithdrawalRequest.objects.filter(user=user, created_at__gte=since)
+
+
+def pending_buy_requests():
+    """
+    Очередь заявок на покупку в админке: changelist BuyRequestAdmin
+    с фильтром «в ожидании» и порядком -pk из LargeTableAdminMixin.
+    """
+    return BuyRequest.objects.filter(status='pending').order_by('-pk')
+
+
+def user_reports(user):
+    return DailyReport.objects.filter(user=user).order_by('-report_date')
+
+
+def day_stats(user, report_date):
+    return ScooterStats.objects.filter(user=user, report_date=report_date)
+
+
+# имя -> функция (user, now) -> queryset, который должен идти по индексу
+HOT_QUERIES = {
+    'last_earning': lambda user, now: earnings(user).order_by('-created_at')[:1],
+    'earnings_since': lambda user, now: earnings(user).filter(created_at__gte=now),
+    'recent_withdrawals': lambda user, now: recent_withdrawals(user, now),
+    'pending_buy_requests': lambda user, now: pending_buy_requests()[:100],
+    'user_reports': lambda user, now: user_reports(user),
+    'day_stats': lambda user, now: day_stats(user, now.date()),
+}
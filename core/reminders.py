@@ -0,0 +1,164 @@
+"""
+Напоминания «доход готов к получению».
+
+claim_profit_view регистрирует ClaimReminder на момент, когда снова можно
+сделать claim (settings.CLAIM_REMINDER_DELAY после начисления). Строки
+в БД — постоянное хранилище: после перезапуска `manage.py run_reminders`
+заново раскладывает ожидающие напоминания по колесу.
+
+Сам отсчёт — иерархическое колесо таймеров (Varghese & Lauck): добавление
+и удаление O(1), тик — O(1) плюс число сработавших или перенесённых на
+нижний уровень таймеров. Сотни тысяч ожидающих напоминаний не означают
+ни сканирования всех пользователей, ни запроса по всей таблице на каждом тике.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ClaimReminder, OutboxMessage
+
+DEFAULT_DELAY = timedelta(hours=24)
+FIRE_BATCH = 500
+
+REMINDER_TEXT = (
+    "<b>🛴 Самокаты вернулись из проката</b>\n"
+    "Доход готов — зайдите в «Мои самокаты» и заберите его."
+)
+
+
+class TimingWheel:
+    """
+    Иерархическое колесо таймеров. slots — число слотов на уровнях снизу
+    вверх; слот уровня k покрывает tick * slots[0] * ... * slots[k-1] секунд.
+    По умолчанию: секунды, минуты, часы, дни — горизонт 64 дня; более
+    дальние таймеры ждут в overflow и раскладываются при обороте верхнего уровня.
+    """
+
+    def __init__(self, tick=1.0, slots=(60, 60, 24, 64), start=0.0):
+        self.tick = tick
+        self.slots = slots
+        self.spans = [math.prod(slots[:level]) for level in range(len(slots))]
+        self.current = int(start // tick)
+        self.wheels = [[{} for _ in range(n)] for n in slots]
+        self.overflow = {}
+        self.where = {}
+        self.ready = []
+
+    def __len__(self):
+        return len(self.where)
+
+    def add(self, key, deadline):
+        """Ставит (или переставляет) таймер key на момент deadline (секунды)."""
+        self.remove(key)
+        self._place(key, math.ceil(deadline / self.tick))
+
+    def _place(self, key, target):
+        if target <= self.current:
+            self.ready.append(key)
+            return
+        for level, (span, size) in enumerate(zip(self.spans, self.slots)):
+            bucket = target // span
+            if bucket - self.current // span < size:
+                slot = bucket % size
+                self.wheels[level][slot][key] = target
+                self.where[key] = (level, slot)
+                return
+        self.overflow[key] = target
+        self.where[key] = (None, None)
+
+    def remove(self, key):
+        level, slot = self.where.pop(key, (None, None))
+        if level is not None:
+            self.wheels[level][slot].pop(key, None)
+        else:
+            self.overflow.pop(key, None)
+
+    def advance(self, now):
+        """Сдвигает время до now и возвращает ключи сработавших таймеров."""
+        target = int(now // self.tick)
+        while self.current < target:
+            self.current += 1
+            top = len(self.slots) - 1
+            if self.current % (self.spans[top] * self.slots[top]) == 0 and self.overflow:
+                pending, self.overflow = self.overflow, {}
+                for key, when in pending.items():
+                    del self.where[key]
+                    self._place(key, when)
+            # Каскад: слот верхнего уровня, в который вошло время, раскладывается по нижним
+            for level in range(top, 0, -1):
+                span = self.spans[level]
+                if self.current % span == 0:
+                    bucket = self.wheels[level][(self.current // span) % self.slots[level]]
+                    moved = list(bucket.items())
+                    bucket.clear()
+                    for key, when in moved:
+                        del self.where[key]
+                        self._place(key, when)
+            due = self.wheels[0][self.current % self.slots[0]]
+            for key in due:
+                del self.where[key]
+            self.ready.extend(due)
+            due.clear()
+        fired, self.ready = self.ready, []
+        return fired
+
+
+def claim_delay():
+    return getattr(settings, 'CLAIM_REMINDER_DELAY', DEFAULT_DELAY)
+
+
+def schedule_claim_reminder(profile, claimed_at=None):
+    """
+    Регистрирует напоминание после claim (предыдущее ожидающее отменяется).
+    Вызывается в транзакции claim; напоминаем только тем, кто подключил бота.
+    """
+    if not profile.telegram_chat_id:
+        return None
+    ClaimReminder.objects.filter(user_id=profile.user_id, status='pending').update(status='cancelled')
+    return ClaimReminder.objects.create(user_id=profile.user_id, due_at=(claimed_at or timezone.now()) + claim_delay())
+
+
+def fire(reminder_ids):
+    """
+    Отправляет напоминания пачками: одно сообщение в outbox на пользователя.
+    Отменённые после постановки в колесо пропускаются. Возвращает число отправленных.
+    """
+    sent = 0
+    reminder_ids = list(reminder_ids)
+    for start in range(0, len(reminder_ids), FIRE_BATCH):
+        chunk = reminder_ids[start:start + FIRE_BATCH]
+        with transaction.atomic():
+            rows = list(
+                ClaimReminder.objects.filter(pk__in=chunk, status='pending')
+                .select_for_update(of=('self',)).values_list('pk', 'user__profile__telegram_chat_id')
+            )
+            OutboxMessage.objects.bulk_create([
+                OutboxMessage(text=REMINDER_TEXT, chat_id=str(chat_id)) for _, chat_id in rows if chat_id
+            ])
+            ClaimReminder.objects.filter(pk__in=[pk for pk, _ in rows]).update(status='sent', sent_at=timezone.now())
+        sent += len(rows)
+    return sent
+
+
+def load_pending(wheel, after_id=0):
+    """
+    Раскладывает по колесу ожидающие напоминания с id > after_id (уже
+    лежащие в колесе не трогает); возвращает последний увиденный id.
+    """
+    last_id = after_id
+    rows = ClaimReminder.objects.filter(status='pending', pk__gt=after_id).order_by('pk').values_list('pk', 'due_at')
+    for pk, due_at in rows.iterator(chunk_size=5000):
+        if pk not in wheel.where:
+            wheel.add(pk, due_at.timestamp())
+        last_id = pk
+    return last_id
+
+
+def prune(older_than=timedelta(days=7)):
+    """Удаляет отправленные и отменённые напоминания старше older_than."""
+    return ClaimReminder.objects.filter(
+        status__in=['sent', 'cancelled'], created_at__lt=timezone.now() - older_than,
+    ).delete()[0]
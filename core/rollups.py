@@ -0,0 +1,275 @@
+"""
+Инкрементальные сводки по платформе (PlatformDailyStats / PlatformCounter).
+
+Каждая запись в большие таблицы (Transaction, WithdrawalRequest,
+BuyRequest, UserScooter, auth_user) через сигналы добавляет дельту к
+сводке в той же транзакции, поэтому главная страница админки читает
+несколько маленьких строк вместо агрегатов по миллионам записей.
+
+Строки разбиты на SHARDS шардов: параллельные записи попадают в разные
+строки и не ждут друг друга на блокировке. Правки и удаления вычитают
+прежний вклад (unbump_daily). Расхождения (queryset.update, ручные правки
+в БД) исправляет `manage.py rebuild_platform_stats`.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from . import catalog
+from .models import (
+    BuyRequest, PlatformCounter, PlatformDailyStats,
+    Transaction, UserScooter, WithdrawalRequest,
+)
+
+SHARDS = 8
+
+# Ключи PlatformCounter
+PENDING_WITHDRAWALS_TOTAL = 'withdrawals_pending_total'
+PENDING_WITHDRAWALS_COUNT = 'withdrawals_pending_count'
+PENDING_BUY_REQUESTS = 'buy_requests_pending'
+LEVEL_UNITS_PREFIX = 'level_units:'
+
+# Тип транзакции -> (поле количества, поле суммы, знак суммы)
+TRANSACTION_FIELDS = {
+    'deposit': ('deposits_count', 'deposits_total', 1),
+    'earning': ('earnings_count', 'earnings_total', 1),
+    'referral': (None, 'referral_total', 1),
+    'buy': ('purchases_count', 'purchases_total', -1),
+    'withdraw': (None, 'withdrawals_paid_total', -1),
+}
+
+
+def level_units_key(level_id):
+    return f'{LEVEL_UNITS_PREFIX}{level_id}'
+
+
+def _increment(model, lookup, deltas):
+    """UPDATE ... SET f = f + delta, а если строки ещё нет — INSERT."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    lookup = dict(lookup, shard=random.randrange(SHARDS))
+    expressions = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**expressions):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**expressions)
+
+
+def bump_daily(day, **deltas):
+    _increment(PlatformDailyStats, {'date': day}, deltas)
+
+
+def unbump_daily(day, **deltas):
+    """
+    Вычитает дельты из сводки за день. Количества в шардах неотрицательные,
+    поэтому берём шард, где каждого хватает; если такого нет (сводка
+    разошлась или строки уже удалены) — пересчитываем день целиком.
+    """
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    enough = {
+        f'{field}__gte': value for field, value in deltas.items()
+        if PlatformDailyStats._meta.get_field(field).get_internal_type() == 'PositiveIntegerField'
+    }
+    shard = PlatformDailyStats.objects.filter(date=day, **enough).values_list('pk', flat=True).first()
+    updated = shard is not None and PlatformDailyStats.objects.filter(pk=shard, **enough).update(
+        **{field: F(field) - delta for field, delta in deltas.items()}
+    )
+    if not updated:
+        rebuild_day(day)
+
+
+def bump_counter(key, delta):
+    _increment(PlatformCounter, {'key': key}, {'value': delta})
+
+
+# === Обработчики событий (вызываются из core/signals.py) ===
+
+def on_user_created(user):
+    bump_daily(timezone.localdate(user.date_joined), registrations=1)
+
+
+def _transaction_deltas(tx_type, amount):
+    fields = TRANSACTION_FIELDS.get(tx_type)
+    if not fields:
+        return {}
+    count_field, total_field, sign = fields
+    deltas = {total_field: Decimal(amount) * sign}
+    if count_field:
+        deltas[count_field] = 1
+    return deltas
+
+
+def on_transaction_created(tx):
+    bump_daily(timezone.localdate(tx.created_at), **_transaction_deltas(tx.type, tx.amount))
+
+
+def on_transaction_changed(tx, old_type, old_amount, old_created_at):
+    """Правка проводки в админке: снимаем старый вклад и добавляем новый."""
+    if old_amount is None or old_created_at is None:
+        # Загружена через .only/.defer — прежний вклад неизвестен
+        rebuild_day(timezone.localdate(tx.created_at))
+        return
+    if (old_type, Decimal(old_amount), old_created_at) == (tx.type, Decimal(tx.amount), tx.created_at):
+        return
+    unbump_daily(timezone.localdate(old_created_at), **_transaction_deltas(old_type, old_amount))
+    on_transaction_created(tx)
+
+
+def on_transaction_deleted(tx):
+    unbump_daily(timezone.localdate(tx.created_at), **_transaction_deltas(tx.type, tx.amount))
+
+
+def on_withdrawal_saved(req, created, old_status, old_amount):
+    if old_amount is None:
+        old_amount = req.amount  # исходное значение неизвестно — считаем, что не менялось
+    if created:
+        bump_daily(
+            timezone.localdate(req.created_at),
+            withdrawal_requests_count=1,
+            withdrawal_requests_total=req.amount,
+        )
+    elif old_amount is not None and Decimal(old_amount) != Decimal(req.amount):
+        bump_daily(timezone.localdate(req.created_at), withdrawal_requests_total=Decimal(req.amount) - Decimal(old_amount))
+    was_pending = not created and old_status == 'pending'
+    is_pending = req.status == 'pending'
+    if was_pending:
+        bump_counter(PENDING_WITHDRAWALS_TOTAL, -Decimal(old_amount))
+        bump_counter(PENDING_WITHDRAWALS_COUNT, -1)
+    if is_pending:
+        bump_counter(PENDING_WITHDRAWALS_TOTAL, Decimal(req.amount))
+        bump_counter(PENDING_WITHDRAWALS_COUNT, 1)
+
+
+def on_withdrawal_deleted(req):
+    unbump_daily(timezone.localdate(req.created_at), withdrawal_requests_count=1, withdrawal_requests_total=req.amount)
+    if req.status == 'pending':
+        bump_counter(PENDING_WITHDRAWALS_TOTAL, -Decimal(req.amount))
+        bump_counter(PENDING_WITHDRAWALS_COUNT, -1)
+
+
+def on_buy_request_saved(req, created, old_status):
+    if created:
+        bump_daily(timezone.localdate(req.created_at), buy_requests_count=1)
+    was_pending = not created and old_status == 'pending'
+    is_pending = req.status == 'pending'
+    if was_pending != is_pending:
+        bump_counter(PENDING_BUY_REQUESTS, 1 if is_pending else -1)
+
+
+def on_buy_request_deleted(req):
+    unbump_daily(timezone.localdate(req.created_at), buy_requests_count=1)
+    if req.status == 'pending':
+        bump_counter(PENDING_BUY_REQUESTS, -1)
+
+
+def on_user_scooter_saved(us, created, old_level_id, old_quantity):
+    if not created and old_level_id is not None:
+        bump_counter(level_units_key(old_level_id), -(old_quantity or 0))
+    bump_counter(level_units_key(us.level_id), us.quantity)
+
+
+def on_user_scooter_deleted(us):
+    bump_counter(level_units_key(us.level_id), -us.quantity)
+
+
+# === Чтение ===
+
+def _counters():
+    rows = PlatformCounter.objects.values('key').annotate(total=Sum('value'))
+    return {row['key']: row['total'] or Decimal('0') for row in rows}
+
+
+def _daily(day):
+    fields = [f.name for f in PlatformDailyStats._meta.concrete_fields if f.name not in ('id', 'date', 'shard')]
+    totals = PlatformDailyStats.objects.filter(date=day).aggregate(**{f: Sum(f) for f in fields})
+    return {f: totals[f] or 0 for f in fields}
+
+
+def platform_kpis(day=None):
+    """
+    Данные для главной страницы админки. Читает только сводные таблицы
+    и каталог уровней из памяти — время не зависит от объёма истории.
+    """
+    day = day or timezone.localdate()
+    counters = _counters()
+    levels = []
+    daily_liability = Decimal('0')
+    for level in catalog.get_catalog().levels:
+        units = int(counters.get(level_units_key(level.pk), 0))
+        avg_profit = (level.min_daily_profit + level.max_daily_profit) / 2
+        liability = avg_profit * units
+        daily_liability += liability
+        levels.append({'level': level, 'units': units, 'daily_liability': liability.quantize(Decimal('0.01'))})
+    return {
+        'day': day,
+        'today': _daily(day),
+        'pending_withdrawals_total': counters.get(PENDING_WITHDRAWALS_TOTAL, Decimal('0')),
+        'pending_withdrawals_count': int(counters.get(PENDING_WITHDRAWALS_COUNT, 0)),
+        'pending_buy_requests': int(counters.get(PENDING_BUY_REQUESTS, 0)),
+        'levels': levels,
+        'active_scooters': sum(row['units'] for row in levels),
+        'daily_liability': daily_liability.quantize(Decimal('0.01')),
+    }
+
+
+# === Полный пересчёт (manage.py rebuild_platform_stats) ===
+
+def _set_counter(key, value):
+    PlatformCounter.objects.filter(key=key).delete()
+    PlatformCounter.objects.create(key=key, shard=0, value=value or 0)
+
+
+@transaction.atomic
+def rebuild_counters():
+    pending = WithdrawalRequest.objects.filter(status='pending').aggregate(
+        total=Sum('amount'), count=Count('id')
+    )
+    _set_counter(PENDING_WITHDRAWALS_TOTAL, pending['total'])
+    _set_counter(PENDING_WITHDRAWALS_COUNT, pending['count'])
+    _set_counter(PENDING_BUY_REQUESTS, BuyRequest.objects.filter(status='pending').count())
+    PlatformCounter.objects.filter(key__startswith=LEVEL_UNITS_PREFIX).delete()
+    units = UserScooter.objects.values('level_id').annotate(total=Sum('quantity'))
+    PlatformCounter.objects.bulk_create([
+        PlatformCounter(key=level_units_key(row['level_id']), shard=0, value=row['total'] or 0)
+        for row in units
+    ])
+
+
+@transaction.atomic
+def rebuild_day(day):
+    """Пересчитывает сводку за день по диапазону created_at (индексы из 0022)."""
+    from django.contrib.auth.models import User
+
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    end = start + timedelta(days=1)
+
+    values = {'registrations': User.objects.filter(date_joined__gte=start, date_joined__lt=end).count()}
+    tx_totals = Transaction.objects.filter(created_at__gte=start, created_at__lt=end).aggregate(**{
+        f'{tx_type}_count': Count('id', filter=Q(type=tx_type)) for tx_type in TRANSACTION_FIELDS
+    }, **{
+        f'{tx_type}_total': Sum('amount', filter=Q(type=tx_type)) for tx_type in TRANSACTION_FIELDS
+    })
+    for tx_type, (count_field, total_field, sign) in TRANSACTION_FIELDS.items():
+        values[total_field] = (tx_totals[f'{tx_type}_total'] or 0) * sign
+        if count_field:
+            values[count_field] = tx_totals[f'{tx_type}_count']
+    withdrawals = WithdrawalRequest.objects.filter(created_at__gte=start, created_at__lt=end).aggregate(
+        total=Sum('amount'), count=Count('id')
+    )
+    values['withdrawal_requests_count'] = withdrawals['count']
+    values['withdrawal_requests_total'] = withdrawals['total'] or 0
+    values['buy_requests_count'] = BuyRequest.objects.filter(created_at__gte=start, created_at__lt=end).count()
+
+    PlatformDailyStats.objects.filter(date=day).delete()
+    PlatformDailyStats.objects.create(date=day, shard=0, **values)
@@ -0,0 +1,148 @@
+"""
+Поисковый индекс для админки.
+
+Вместо icontains-сканов по auth_user / кошелькам / комментариям
+текст индексируемых полей складывается в SearchEntry:
+  - SQLite: FTS5 с trigram-токенизатором (подстроки от 3 символов);
+  - PostgreSQL: GIN-индекс pg_trgm, который обслуживает ILIKE '%...%'.
+
+Индекс обновляется сигналами (core/signals.py), полная перестройка —
+`manage.py rebuild_search_index`.
+"""
+from django.db import connections
+from django.db.models import Q
+
+from .models import SearchEntry
+
+# Какие поля каких моделей попадают в индекс
+INDEXED_FIELDS = {
+    'auth.user': ('username', 'email'),
+    'core.profile': ('wallet', 'telegram_username'),
+    'core.transaction': ('comment',),
+    'core.withdrawalrequest': ('wallet_address',),
+}
+
+# Больше совпадений в админке всё равно никто не просматривает
+RESULT_LIMIT = 1000
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def is_indexed(model):
+    return model_label(model) in INDEXED_FIELDS
+
+
+def build_content(instance):
+    fields = INDEXED_FIELDS[model_label(type(instance))]
+    parts = []
+    for name in fields:
+        value = str(getattr(instance, name) or '').strip().lower()
+        # username и email обычно совпадают — не дублируем текст
+        if value and value not in parts:
+            parts.append(value)
+    return ' '.join(parts)
+
+
+def index_instance(instance, created=False, update_fields=None):
+    """
+    Добавляет/обновляет запись индекса для объекта. Индекс пишется на
+    каждое сохранение (в том числе каждой проводки Transaction), поэтому:
+    новый объект — один INSERT без поиска прежней записи, а save() с
+    update_fields без индексируемых полей (balance и т.п.) индекс не трогает.
+    """
+    label = model_label(type(instance))
+    if update_fields is not None and not set(update_fields) & set(INDEXED_FIELDS[label]):
+        return
+    content = build_content(instance)
+    if created:
+        if content:
+            SearchEntry.objects.create(model=label, object_id=instance.pk, content=content)
+        return
+    if not content:
+        SearchEntry.objects.filter(model=label, object_id=instance.pk).delete()
+        return
+    SearchEntry.objects.update_or_create(
+        model=label, object_id=instance.pk, defaults={'content': content}
+    )
+
+
+def unindex_instance(instance):
+    SearchEntry.objects.filter(model=model_label(type(instance)), object_id=instance.pk).delete()
+
+
+def index_objects(model, objects, batch_size=1000):
+    """
+    Пакетная запись в индекс (для импорта и перестройки): старые записи
+    этих объектов удаляются, новые вставляются bulk_create'ом.
+    """
+    label = model_label(model)
+    entries = []
+    pks = []
+    for obj in objects:
+        pks.append(obj.pk)
+        content = build_content(obj)
+        if content:
+            entries.append(SearchEntry(model=label, object_id=obj.pk, content=content))
+    for i in range(0, len(pks), batch_size):
+        SearchEntry.objects.filter(model=label, object_id__in=pks[i:i + batch_size]).delete()
+    SearchEntry.objects.bulk_create(entries, batch_size=batch_size)
+    return len(entries)
+
+
+def _has_fts(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    if not hasattr(connection, '_zeepy_has_fts'):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'core_searchentry_fts'"
+            )
+            connection._zeepy_has_fts = cursor.fetchone() is not None
+    return connection._zeepy_has_fts
+
+
+def search_ids(model, term, limit=RESULT_LIMIT):
+    """Возвращает pk объектов модели, в индексированных полях которых есть term."""
+    term = term.strip().lower()
+    label = model_label(model)
+    if not term:
+        return []
+    connection = connections[SearchEntry.objects.db]
+    if _has_fts(connection):
+        if len(term) >= 3:
+            # trigram: фраза в кавычках ищется как подстрока
+            condition = "core_searchentry_fts MATCH %s"
+            param = '"' + term.replace('"', '""') + '"'
+        else:
+            condition = "core_searchentry_fts.content LIKE %s"
+            param = '%' + term + '%'
+        sql = (
+            "SELECT e.object_id FROM core_searchentry_fts "
+            "JOIN core_searchentry e ON e.id = core_searchentry_fts.rowid "
+            f"WHERE {condition} AND e.model = %s LIMIT %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [param, label, limit])
+            return [row[0] for row in cursor.fetchall()]
+    return list(
+        SearchEntry.objects
+        .filter(model=label, content__contains=term)
+        .values_list('object_id', flat=True)[:limit]
+    )
+
+
+def search_queryset(queryset, term, user_field=None):
+    """
+    Фильтрует queryset по индексу: совпадение в собственных полях модели
+    или (если задан user_field) в username/email связанного пользователя.
+    """
+    from django.contrib.auth.models import User
+
+    condition = Q(pk__in=[])
+    if is_indexed(queryset.model):
+        condition |= Q(pk__in=search_ids(queryset.model, term))
+    if user_field:
+        condition |= Q(**{f'{user_field}__in': search_ids(User, term)})
+    return queryset.filter(condition)
@@ -0,0 +1,167 @@
+"""
+Обработчики сигналов приложения core. Подключаются в CoreConfig.ready().
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import catalog, models, rollups, search, versioning
+
+
+# === Поисковый индекс админки ===
+SEARCH_INDEXED_MODELS = (User, models.Profile, models.Transaction, models.WithdrawalRequest)
+
+
+def update_search_index(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    search.index_instance(instance, created=created, update_fields=update_fields)
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    search.unindex_instance(instance)
+
+
+for _model in SEARCH_INDEXED_MODELS:
+    post_save.connect(update_search_index, sender=_model, dispatch_uid=f'search_index_{_model._meta.label_lower}')
+    post_delete.connect(remove_from_search_index, sender=_model, dispatch_uid=f'search_unindex_{_model._meta.label_lower}')
+
+
+# === Сводки для главной страницы админки (core/rollups.py) ===
+# post_init запоминает исходные значения, чтобы post_save видел переход
+# статуса/количества. Берём значения из __dict__, чтобы не подгружать
+# отложенные (.only/.defer) поля лишними запросами; их pre_save дочитывает
+# только при сохранении.
+ROLLUP_TRACKED_FIELDS = {
+    models.Transaction: ('type', 'amount', 'created_at'),
+    models.WithdrawalRequest: ('status', 'amount'),
+    models.BuyRequest: ('status',),
+    models.UserScooter: ('level_id', 'quantity'),
+}
+
+
+def remember_rollup_fields(sender, instance, **kwargs):
+    instance._rollup_initial = {
+        name: instance.__dict__.get(name) for name in ROLLUP_TRACKED_FIELDS[sender]
+    }
+    instance._rollup_loaded = {name for name in ROLLUP_TRACKED_FIELDS[sender] if name in instance.__dict__}
+
+
+def load_deferred_rollup_fields(sender, instance, raw=False, **kwargs):
+    """
+    Объект загружен через .only/.defer — исходных значений отложенных полей
+    post_init не видел. Дочитываем их из БД перед сохранением (один запрос,
+    только в этом случае), иначе дельта сводки считалась бы от None.
+    """
+    initial = getattr(instance, '_rollup_initial', None)
+    if raw or initial is None or instance._state.adding:
+        return
+    deferred = [name for name in ROLLUP_TRACKED_FIELDS[sender] if name not in instance._rollup_loaded]
+    if deferred:
+        initial.update(sender._base_manager.filter(pk=instance.pk).values(*deferred).first() or {})
+
+
+for _model in ROLLUP_TRACKED_FIELDS:
+    post_init.connect(remember_rollup_fields, sender=_model, dispatch_uid=f'rollup_init_{_model._meta.label_lower}')
+    pre_save.connect(
+        load_deferred_rollup_fields, sender=_model, dispatch_uid=f'rollup_deferred_{_model._meta.label_lower}',
+    )
+
+
+def _initial(instance, name):
+    return getattr(instance, '_rollup_initial', {}).get(name)
+
+
+def _reset_initial(instance):
+    remember_rollup_fields(type(instance), instance)
+
+
+@receiver(post_save, sender=User, dispatch_uid='rollup_user')
+def rollup_user(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.on_user_created(instance)
+
+
+@receiver(post_save, sender=models.Transaction, dispatch_uid='rollup_transaction')
+def rollup_transaction(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        rollups.on_transaction_created(instance)
+    else:
+        rollups.on_transaction_changed(
+            instance, _initial(instance, 'type'), _initial(instance, 'amount'), _initial(instance, 'created_at')
+        )
+    _reset_initial(instance)
+
+
+@receiver(post_delete, sender=models.Transaction, dispatch_uid='rollup_transaction_delete')
+def rollup_transaction_delete(sender, instance, **kwargs):
+    rollups.on_transaction_deleted(instance)
+
+
+@receiver(post_save, sender=models.WithdrawalRequest, dispatch_uid='rollup_withdrawal')
+def rollup_withdrawal(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.on_withdrawal_saved(instance, created, _initial(instance, 'status'), _initial(instance, 'amount'))
+    _reset_initial(instance)
+
+
+@receiver(post_delete, sender=models.WithdrawalRequest, dispatch_uid='rollup_withdrawal_delete')
+def rollup_withdrawal_delete(sender, instance, **kwargs):
+    rollups.on_withdrawal_deleted(instance)
+
+
+@receiver(post_save, sender=models.BuyRequest, dispatch_uid='rollup_buy_request')
+def rollup_buy_request(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.on_buy_request_saved(instance, created, _initial(instance, 'status'))
+    _reset_initial(instance)
+
+
+@receiver(post_delete, sender=models.BuyRequest, dispatch_uid='rollup_buy_request_delete')
+def rollup_buy_request_delete(sender, instance, **kwargs):
+    rollups.on_buy_request_deleted(instance)
+
+
+@receiver(post_save, sender=models.UserScooter, dispatch_uid='rollup_user_scooter')
+def rollup_user_scooter(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.on_user_scooter_saved(
+        instance, created, _initial(instance, 'level_id'), _initial(instance, 'quantity')
+    )
+    _reset_initial(instance)
+
+
+@receiver(post_delete, sender=models.UserScooter, dispatch_uid='rollup_user_scooter_delete')
+def rollup_user_scooter_delete(sender, instance, **kwargs):
+    rollups.on_user_scooter_deleted(instance)
+
+
+# === Каталог уровней (core/catalog.py) ===
+@receiver(post_save, sender=models.ScooterLevel, dispatch_uid='catalog_level_saved')
+@receiver(post_delete, sender=models.ScooterLevel, dispatch_uid='catalog_level_deleted')
+def invalidate_catalog(sender, **kwargs):
+    # После коммита: иначе другой процесс успеет загрузить старые данные под новой версией
+    transaction.on_commit(catalog.invalidate)
+
+
+# === Версия данных пользователя (core/versioning.py) ===
+USER_VERSIONED_MODELS = (
+    models.Profile, models.Transaction, models.UserScooter, models.DailyReport, models.WithdrawalRequest,
+)
+
+
+def bump_user_data_version(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    versioning.bump_on_commit(instance.pk if sender is User else instance.user_id)
+
+
+for _model in (User,) + USER_VERSIONED_MODELS:
+    post_save.connect(bump_user_data_version, sender=_model, dispatch_uid=f'user_version_{_model._meta.label_lower}')
+    post_delete.connect(bump_user_data_version, sender=_model, dispatch_uid=f'user_version_delete_{_model._meta.label_lower}')
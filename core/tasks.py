@@ -0,0 +1,131 @@
+"""
+Фоновые задачи (выполняются `manage.py run_workers`, см. core/jobs.py).
+"""
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import transaction
+
+from . import broadcast, jobs, models
+from .notifications import notify_buy_request_status_change, notify_referral_bonus
+from .telegram import get_transport
+
+
+def distribute_referral_bonuses(user, deposit_amount):
+    """
+    Начисляет реферальные бонусы 3‑х уровней и шлёт notify_referral_bonus.
+    Профиль пригласившего блокируется (как lock_profile во view): его
+    параллельное начисление или вывод иначе был бы затёрт.
+    """
+    try:
+        ref = models.Profile.objects.select_related('invited_by').get(user=user).invited_by
+        for lvl, pct in enumerate([Decimal('0.09'), Decimal('0.03'), Decimal('0.01')], start=1):
+            if not ref:
+                break
+            bonus = deposit_amount * pct
+            with transaction.atomic():
+                ref_profile = models.Profile.objects.select_for_update(of=('self',)).select_related('invited_by').get(
+                    user=ref,
+                )
+                ref_profile.balance += bonus
+                ref_profile.save(update_fields=['balance'])
+                models.Transaction.objects.create(
+                    user=ref,
+                    type='referral',
+                    amount=bonus,
+                    comment=f'Бонус {pct*100:.0f}% за Level {lvl} (от {user.username})'
+                )
+                notify_referral_bonus(ref, bonus, lvl)
+            ref = ref_profile.invited_by
+    except models.Profile.DoesNotExist:
+        pass
+
+
+def approve_buy_request(pk):
+    """
+    Одобряет заявку на покупку: самокат, списание, реферальные бонусы, статус.
+    Заявка блокируется и статус проверяется внутри транзакции — повторная
+    задача (двойной клик, возврат зависшей задачи) её пропустит. -> True,
+    если заявка одобрена этим вызовом.
+    """
+    with transaction.atomic():
+        try:
+            req = models.BuyRequest.objects.select_for_update(of=('self',)).select_related('user', 'level').get(
+                pk=pk, status='pending',
+            )
+        except models.BuyRequest.DoesNotExist:
+            return False
+        user = req.user
+        lvl = req.level
+        # 1) создаём/обновляем самокат. Строка блокируется: две заявки одного
+        # пользователя не потеряют прибавку. Через save(), а не update(F(...)) —
+        # на сохранение завязаны сводки (rollups) и версия данных пользователя
+        us, created = models.UserScooter.objects.select_for_update().get_or_create(
+            user=user, level=lvl, defaults={'quantity': 1}
+        )
+        if not created:
+            us.quantity += 1
+            us.save()
+        # 2) списываем за покупку
+        models.Transaction.objects.create(
+            user=user,
+            type='buy',
+            amount=-lvl.price,
+            comment=f"Покупка Level {lvl.number}"
+        )
+        # 3) реферальные бонусы
+        distribute_referral_bonuses(user, lvl.price)
+        # 4) меняем статус и уведомляем
+        req.status = 'approved'
+        req.save()
+        notify_buy_request_status_change(user, f"Level {lvl.number}", 'approved')
+    return True
+
+
+@jobs.task('core.approve_buy_requests')
+def approve_buy_requests(job, request_ids):
+    """Пакетное одобрение заявок из админки. Каждая заявка — отдельная транзакция."""
+    total = len(request_ids)
+    jobs.set_progress(job, 0, total)
+    approved = 0
+    errors = []
+    for done, pk in enumerate(request_ids, start=1):
+        try:
+            approved += approve_buy_request(pk)
+        except Exception as e:
+            errors.append(f"#{pk}: {e}")
+        jobs.set_progress(job, done)
+    summary = f"Одобрено {approved} из {total}"
+    if errors:
+        summary += "\nОшибки:\n" + "\n".join(errors)
+    return summary
+
+
+@jobs.task('core.rebuild_platform_stats', max_attempts=3)
+def rebuild_platform_stats(job, days=2):
+    call_command('rebuild_platform_stats', days=days)
+
+
+@jobs.task('core.rebuild_search_index', max_attempts=3)
+def rebuild_search_index(job, models=None):
+    call_command('rebuild_search_index', models=models)
+
+
+@jobs.task('core.run_broadcast', max_attempts=10)
+def run_broadcast(job, campaign_id):
+    campaign = models.BroadcastCampaign.objects.get(pk=campaign_id)
+    result = broadcast.run_campaign(
+        campaign, get_transport(), progress=lambda done, total: jobs.set_progress(job, done, total),
+    )
+    if result['status'] == 'running':
+        # Часть пачки зависла у упавшего отправителя — повторим, когда истечёт блокировка
+        raise RuntimeError(f"Рассылка #{campaign_id} не завершена: {result['by_status']}")
+    return (
+        f"{result['sent']} из {result['total']} отправлено, ошибок {result['failed']}, "
+        f"{result['throughput']} msg/s"
+    )
+
+
+@jobs.task('core.sync_telegram_chats', max_attempts=3)
+def sync_telegram_chats(job):
+    return f"Привязано чатов: {broadcast.sync_chat_ids(get_transport())}"
@@ -1,37 +1,202 @@
+"""
+Транспорт Telegram Bot API.
 
-import telegram
+Один TelegramTransport на процесс (get_transport()):
+  - requests.Session с пулом keep-alive соединений — без TLS-рукопожатия
+    на каждое сообщение;
+  - параллельная отправка по разным чатам (ThreadPoolExecutor), при этом
+    сообщения в один чат уходят строго по порядку;
+  - token bucket на глобальный лимит (~30 сообщений/с на бота) и на
+    лимит одного чата (~1 сообщение/с);
+  - на 429 ждём parameters.retry_after и повторяем, на 5xx и сетевые
+    ошибки — экспоненциальная задержка.
+
+Адрес API и лимиты настраиваются в settings: TELEGRAM_API_URL,
+TELEGRAM_GLOBAL_RATE, TELEGRAM_PER_CHAT_RATE (для тестов и бенчмарка —
+см. core/telegram_fake.py).
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from django.conf import settings
-import asyncio
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = 'https://api.telegram.org'
+
+
+class TelegramError(Exception):
+    def __init__(self, description, error_code=None, retry_after=None):
+        super().__init__(description)
+        self.description = description
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self):
+        return self.error_code is None or self.error_code == 429 or self.error_code >= 500
+
+
+class TokenBucket:
+    """Потокобезопасный token bucket: rate токенов в секунду, запас capacity."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Ждёт токен; возвращает, сколько секунд пришлось ждать."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class TelegramTransport:
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(self, token=None, api_url=None, global_rate=None, per_chat_rate=None,
+                 pool_size=16, timeout=5, max_retries=3):
+        self.token = token if token is not None else getattr(settings, 'TELEGRAM_BOT_TOKEN', '')
+        self.api_url = (api_url or getattr(settings, 'TELEGRAM_API_URL', None) or DEFAULT_API_URL).rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.per_chat_rate = per_chat_rate or getattr(settings, 'TELEGRAM_PER_CHAT_RATE', 1)
+        self.global_bucket = TokenBucket(global_rate or getattr(settings, 'TELEGRAM_GLOBAL_RATE', 30))
+        self.chat_buckets = OrderedDict()
+        self.chat_lock = threading.Lock()
+        self.paused_until = 0.0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='telegram')
+
+    def _chat_bucket(self, chat_id):
+        with self.chat_lock:
+            bucket = self.chat_buckets.pop(chat_id, None) or TokenBucket(self.per_chat_rate, 1)
+            self.chat_buckets[chat_id] = bucket
+            while len(self.chat_buckets) > self.MAX_CHAT_BUCKETS:
+                self.chat_buckets.popitem(last=False)
+        return bucket
+
+    def _wait_pause(self):
+        delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def call(self, method, **params):
+        """Вызов метода Bot API с повторами; возвращает result или бросает TelegramError."""
+        url = f"{self.api_url}/bot{self.token}/{method}"
+        attempt = 0
+        while True:
+            attempt += 1
+            self._wait_pause()
+            try:
+                response = self.session.post(url, json=params, timeout=self.timeout)
+                try:
+                    data = response.json()
+                except ValueError:
+                    data = {'ok': False, 'error_code': response.status_code, 'description': response.text[:200]}
+                if data.get('ok'):
+                    return data.get('result')
+                error = TelegramError(
+                    data.get('description', 'Unknown error'),
+                    error_code=data.get('error_code', response.status_code),
+                    retry_after=(data.get('parameters') or {}).get('retry_after'),
+                )
+            except requests.RequestException as e:
+                error = TelegramError(str(e))
+
+            if not error.retryable or attempt > self.max_retries:
+                raise error
+            if error.retry_after:
+                # Flood control действует на весь бот — притормаживаем все потоки
+                self.paused_until = max(self.paused_until, time.monotonic() + error.retry_after)
+            else:
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 10))
+
+    def send_message(self, chat_id, text, parse_mode='HTML'):
+        self._chat_bucket(str(chat_id)).acquire()
+        self.global_bucket.acquire()
+        return self.call('sendMessage', chat_id=str(chat_id), text=text, parse_mode=parse_mode)
+
+    def send_many(self, messages):
+        """
+        messages: список (chat_id, text). Чаты обрабатываются параллельно,
+        внутри чата — по порядку. Возвращает список той же длины: None при
+        успехе или исключение.
+        """
+        results = [None] * len(messages)
+        by_chat = defaultdict(list)
+        for index, (chat_id, text) in enumerate(messages):
+            by_chat[str(chat_id)].append((index, text))
+
+        def send_chat(chat_id, items):
+            for index, text in items:
+                try:
+                    self.send_message(chat_id, text)
+                except Exception as e:
+                    results[index] = e
+
+        futures = [self.executor.submit(send_chat, chat_id, items) for chat_id, items in by_chat.items()]
+        for future in futures:
+            future.result()
+        return results
+
+    def broadcast(self, text, chat_ids):
+        """Одно сообщение в несколько чатов: {chat_id: None | исключение}."""
+        chat_ids = [str(c) for c in chat_ids]
+        return dict(zip(chat_ids, self.send_many([(c, text) for c in chat_ids])))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Общий транспорт процесса (создаётся при первом обращении)."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = TelegramTransport()
+        return _transport
+
+
+def reset_transport():
+    """Закрывает общий транспорт (после смены настроек, в тестах)."""
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = None
+
 
 def send_telegram_notification(message: str):
     """
-    Отправляет сообщение в Telegram, корректно работая с асинхронной библиотекой
-    и проверяя наличие токена.
+    Устаревшая точка входа: сообщение для админов ставится в outbox,
+    как и все notify_* из core/notifications.py.
     """
-    # ✅ ДОБАВЛЕНА ПРОВЕРКА: Убеждаемся, что токен и ID чата есть в настройках
-    if not all([settings.TELEGRAM_BOT_TOKEN, settings.TELEGRAM_CHAT_ID]):
-        print("ОШИБКА: Токен или ID чата для Telegram не указаны в settings.py")
-        return
-
-    async def send_async():
-        """Вспомогательная асинхронная функция для отправки."""
-        try:
-            bot = telegram.Bot(token=settings.TELEGRAM_BOT_TOKEN)
-            await bot.send_message(
-                chat_id=settings.TELEGRAM_CHAT_ID,
-                text=message,
-                parse_mode='HTML'
-            )
-            print("Уведомление в Telegram успешно отправлено.")
-        except Exception as e:
-            print(f"Ошибка при отправке Telegram-уведомления: {e}")
-
-    # Запускаем асинхронную функцию из нашего синхронного кода
-    try:
-        # Этот способ работает для большинства случаев
-        asyncio.run(send_async())
-    except RuntimeError:
-        # Этот способ нужен, если цикл событий уже запущен (например, в Jupyter или некоторых версиях Django)
-        loop = asyncio.get_running_loop()
-        loop.create_task(send_async())
-
+    from .notifications import send_telegram_message
+    send_telegram_message(message)
@@ -0,0 +1,116 @@
+"""
+Локальная заглушка Telegram Bot API для тестов и бенчмарка.
+
+    with FakeBotAPI(latency=0.05) as api:
+        transport = TelegramTransport(token='test', api_url=api.url)
+        transport.send_message(1, 'hi')
+        api.messages  # [{'chat_id': '1', 'text': 'hi', ...}]
+
+Умеет: sendMessage, getUpdates (из api.updates); искусственную задержку
+ответа, 429 с retry_after на каждый flood_every-й запрос и 403 для
+чатов из blocked_chats. Считает TCP-соединения — видно, работает ли keep-alive.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+
+class FakeBotAPI:
+    def __init__(self, latency=0.0, flood_every=0, retry_after=1, blocked_chats=()):
+        self.latency = latency
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.blocked_chats = {str(c) for c in blocked_chats}
+        self.messages = []
+        self.updates = []
+        self.requests = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with api.lock:
+                    api.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    params = json.loads(body or '{}')
+                else:
+                    params = dict(parse_qsl(body))
+                status, payload = api.handle(self.path, params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def handle(self, path, params):
+        if self.latency:
+            time.sleep(self.latency)
+        method = path.rstrip('/').rsplit('/', 1)[-1]
+        with self.lock:
+            self.requests += 1
+            number = self.requests
+        if method == 'sendMessage':
+            chat_id = str(params.get('chat_id'))
+            if self.flood_every and number % self.flood_every == 0:
+                return 429, {
+                    'ok': False, 'error_code': 429,
+                    'description': f'Too Many Requests: retry after {self.retry_after}',
+                    'parameters': {'retry_after': self.retry_after},
+                }
+            if chat_id in self.blocked_chats:
+                return 403, {'ok': False, 'error_code': 403, 'description': 'Forbidden: bot was blocked by the user'}
+            with self.lock:
+                self.messages.append({
+                    'chat_id': chat_id, 'text': params.get('text'), 'parse_mode': params.get('parse_mode'),
+                })
+                message_id = len(self.messages)
+            return 200, {'ok': True, 'result': {
+                'message_id': message_id, 'chat': {'id': chat_id}, 'date': int(time.time()),
+                'text': params.get('text'),
+            }}
+        if method == 'getUpdates':
+            offset = int(params.get('offset') or 0)
+            with self.lock:
+                updates = [u for u in self.updates if u['update_id'] >= offset]
+            return 200, {'ok': True, 'result': updates}
+        return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found'}
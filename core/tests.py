@@ -1,3 +1,1321 @@
-from django.test import TestCase
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import wraps
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch
+from django.utils import timezone
+
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+
+from . import (
+    api_async, broadcast, catalog, checks, db_router, feeds, jobs, outbox, pagecache, queries, reminders, rollups, search,
+    tasks, timeline, versioning, views,
+)
+from .models import (
+    BroadcastCampaign, BroadcastRecipient, BuyRequest, DailyReport, Job, JobSchedule, OutboxMessage, PlatformCounter,
+    PlatformDailyStats, Profile, ScooterLevel, SearchEntry, TelegramLinkToken, Transaction, UserScooter,
+    WithdrawalRequest,
+)
+from .cache import TieredCache, cached
+from .db import metrics as db_metrics
+from .db.backends.sqlite3.base import DatabaseWrapper as SQLiteWrapper
+from .db.pool import ConnectionPool, PoolTimeout
+from .pagination import EstimatedCountPaginator
+from .db_router import ReplicaRouter, ReplicaRoutingMiddleware, primary_reads, replica_reads
+from .reminders import TimingWheel, schedule_claim_reminder
+from .telegram import TelegramError, TelegramTransport
+from .telegram_fake import FakeBotAPI
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='p@example.com')
+        self.add(35)
+        self.qs = Transaction.objects.order_by('-pk')
+
+    def add(self, n):
+        Transaction.objects.bulk_create(
+            Transaction(user=self.user, type='earning', amount=Decimal('1')) for _ in range(n)
+        )
+
+    def pks(self, page):
+        return [tx.pk for tx in page]
+
+    def test_cursor_pages_are_stable_and_skip_offset(self):
+        expected = list(self.qs.values_list('pk', flat=True))
+        first = EstimatedCountPaginator(self.qs, 10).page(1)
+        self.assertEqual(self.pks(first), expected[:10])
+        self.assertIsNone(first.previous_before)
+
+        self.add(3)  # новые строки не сдвигают следующую страницу
+        with CaptureQueriesContext(connection) as captured:
+            second = EstimatedCountPaginator(self.qs, 10, after=first.next_after).page(2)
+            self.assertEqual(self.pks(second), expected[10:20])
+        self.assertFalse(any('OFFSET' in q['sql'] for q in captured))
+
+        third = EstimatedCountPaginator(self.qs, 10, after=second.next_after).page(3)
+        back = EstimatedCountPaginator(self.qs, 10, before=third.previous_before).page(2)
+        self.assertEqual(self.pks(back), expected[10:20])
+        self.assertTrue(back.has_next())
+
+        last = EstimatedCountPaginator(self.qs, 10, after=third.next_after).page(4)
+        self.assertEqual(self.pks(last), expected[30:])
+        self.assertFalse(last.has_next())
+        self.assertIsNone(last.next_after)
+
+    def test_without_cursor_or_pk_order_falls_back_to_offset(self):
+        expected = list(self.qs.values_list('pk', flat=True))
+        self.assertEqual(self.pks(EstimatedCountPaginator(self.qs, 10, after='x').page(2)), expected[10:20])
+        by_date = Transaction.objects.order_by('-created_at', '-pk')
+        page = EstimatedCountPaginator(by_date, 10, after=expected[0]).page(2)
+        self.assertEqual(len(page), 10)
+        self.assertIsNone(page.next_after)
+
+    def test_count_is_capped_but_cursor_goes_past_it(self):
+        class Small(EstimatedCountPaginator):
+            COUNT_LIMIT = 20
+
+        filtered = self.qs.filter(user=self.user)
+        paginator = Small(filtered, 10, after=self.qs.values_list('pk', flat=True)[29])
+        self.assertEqual(paginator.count, 20)
+        self.assertEqual(len(paginator.page(4)), 5)
+
+    def test_admin_changelist_links_carry_cursor(self):
+        self.add(200)
+        self.client.force_login(User.objects.create(username='admin@example.com', is_staff=True, is_superuser=True))
+        first = self.client.get('/admin/core/transaction/')
+        self.assertEqual(first.status_code, 200)
+        next_url = first.context['cl'].next_url
+        self.assertIn('after=', next_url)
+
+        second = self.client.get(f'/admin/core/transaction/{next_url}')
+        self.assertEqual(second.status_code, 200)
+        cl = second.context['cl']
+        self.assertEqual(
+            [tx.pk for tx in cl.result_list],
+            list(self.qs.values_list('pk', flat=True)[cl.list_per_page:2 * cl.list_per_page]),
+        )
+        self.assertIn('before=', cl.previous_url)
+        self.assertNotIn('after=', cl.get_query_string({'p': 1}))
+
+
+@jobs.task('tests.echo', max_attempts=2)
+def echo_task(job, value=None, fail=False):
+    if fail:
+        raise RuntimeError('boom')
+    return value
+
+
+class CronExpressionTests(SimpleTestCase):
+    def test_fields(self):
+        cron = jobs.CronExpression('*/15 9-17/4 1,15 * 1-5')
+        self.assertEqual(cron.minutes, {0, 15, 30, 45})
+        self.assertEqual(cron.hours, {9, 13, 17})
+        self.assertEqual(cron.days, {1, 15})
+        self.assertEqual(cron.months, set(range(1, 13)))
+        self.assertEqual(cron.weekdays, {1, 2, 3, 4, 5})
+        for bad in ('* * * *', '60 * * * *', '* 24 * * *', '*/0 * * * *', '0 0 0 * *', '0 0 * * 7'):
+            with self.subTest(bad), self.assertRaises(ValueError):
+                jobs.CronExpression(bad)
+
+    def test_next_after(self):
+        cases = [
+            ('*/15 * * * *', datetime(2024, 1, 1, 10, 7, 30), datetime(2024, 1, 1, 10, 15)),
+            # строго после: в саму минуту срабатывания — следующий раз
+            ('0 3 * * *', datetime(2024, 1, 1, 3, 0), datetime(2024, 1, 2, 3, 0)),
+            ('30 23 31 12 *', datetime(2024, 1, 1), datetime(2024, 12, 31, 23, 30)),
+            # 2024-01-05 — пятница; день месяца ИЛИ день недели, как в cron
+            ('0 0 13 * 5', datetime(2024, 1, 1), datetime(2024, 1, 5)),
+            ('0 0 13 * 5', datetime(2024, 1, 12, 1), datetime(2024, 1, 13)),
+            ('0 12 29 2 *', datetime(2024, 3, 1), datetime(2028, 2, 29, 12)),
+        ]
+        for expression, after, expected in cases:
+            with self.subTest(expression, after=after):
+                self.assertEqual(jobs.CronExpression(expression).next_after(after), expected)
+        with self.assertRaises(ValueError):
+            jobs.CronExpression('0 0 31 2 *').next_after(datetime(2024, 1, 1))
+
+
+class JobQueueTests(TestCase):
+    def test_schedule_enqueues_once_per_due_time(self):
+        schedule = JobSchedule.objects.create(name='echo', task='tests.echo', cron='0 * * * *')
+        self.assertEqual(jobs.run_due_schedules(), 0)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.next_run_at, jobs.next_run(schedule))
+        self.assertEqual(timezone.localtime(schedule.next_run_at).minute, 0)
+
+        JobSchedule.objects.filter(pk=schedule.pk).update(next_run_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(jobs.run_due_schedules(), 1)
+        self.assertEqual(jobs.run_due_schedules(), 0)
+        self.assertEqual(Job.objects.filter(task='tests.echo').count(), 1)
+        schedule.refresh_from_db()
+        self.assertGreater(schedule.next_run_at, timezone.now())
+
+    def test_job_is_claimed_once(self):
+        job = jobs.enqueue('tests.echo', {'value': 'ok'})
+        later = jobs.enqueue('tests.echo', run_at=timezone.now() + timedelta(hours=1))
+        claimed = jobs.claim_job('w1')
+        self.assertEqual((claimed.pk, claimed.status, claimed.locked_by, claimed.attempts), (job.pk, 'running', 'w1', 1))
+        self.assertIsNone(jobs.claim_job('w2'))
+
+        # Второй воркер прочитал список готовых до того, как первый её взял:
+        # условный UPDATE ... WHERE status='queued' не даст взять её ещё раз
+        with mock.patch.object(connection.features, 'has_select_for_update_skip_locked', False), \
+                mock.patch.object(jobs, '_ready_jobs', lambda now: Job.objects.filter(pk=job.pk)):
+            self.assertIsNone(jobs.claim_job('w2'))
+        self.assertEqual(Job.objects.get(pk=job.pk).locked_by, 'w1')
+        self.assertEqual(Job.objects.get(pk=later.pk).status, 'queued')
+
+        self.assertTrue(jobs.run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), ('done', 'ok'))
+
+    def test_failed_job_backs_off_then_fails(self):
+        for attempts, low, high in ((1, 8, 12), (3, 32, 48), (20, 2880, 4320)):
+            delay = jobs.backoff_delay(attempts).total_seconds()
+            self.assertTrue(low <= delay <= high, (attempts, delay))
+
+        job = jobs.enqueue('tests.echo', {'fail': True})
+        self.assertEqual(job.max_attempts, 2)
+        before = timezone.now()
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(jobs.run_job(jobs.claim_job('w1')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=8))
+        self.assertIsNone(jobs.claim_job('w1'))  # ещё рано
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(jobs.run_job(jobs.claim_job('w1')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_stale_jobs_are_recovered(self):
+        stale = jobs.enqueue('tests.echo')
+        fresh = jobs.enqueue('tests.echo')
+        jobs.claim_job('w1')
+        jobs.claim_job('w2')
+        Job.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - jobs.LOCK_TIMEOUT - timedelta(seconds=1))
+        self.assertEqual(jobs.recover_stale_jobs(), 1)
+        self.assertEqual(
+            dict(Job.objects.values_list('pk', 'status')), {stale.pk: 'queued', fresh.pk: 'running'},
+        )
+        self.assertEqual(jobs.claim_job('w3').pk, stale.pk)
+
+    def test_result_of_a_recovered_job_is_not_recorded(self):
+        job = jobs.enqueue('tests.echo', {'value': 1})
+        first = jobs.claim_job('w1')
+        # Воркер w1 завис: задачу вернули в очередь и взял w2
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - jobs.LOCK_TIMEOUT - timedelta(minutes=1))
+        self.assertEqual(jobs.recover_stale_jobs(), 1)
+        second = jobs.claim_job('w2')
+        self.assertEqual(second.pk, job.pk)
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertFalse(jobs.run_job(first))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('running', 'w2'))
+        self.assertTrue(jobs.run_job(second))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+
+
+class ApproveBuyRequestTests(TestCase):
+    def setUp(self):
+        self.inviter = User.objects.create(username='inviter@example.com')
+        Profile.objects.create(user=self.inviter)
+        self.user = User.objects.create(username='buyer@example.com')
+        Profile.objects.create(user=self.user, invited_by=self.inviter)
+        self.level = ScooterLevel.objects.create(number=1, price=Decimal('100'))
+
+    def run_jobs(self):
+        while (job := jobs.claim_job('test')) is not None:
+            jobs.run_job(job)
+
+    def test_repeated_job_approves_once(self):
+        req = BuyRequest.objects.create(user=self.user, level=self.level)
+        # Двойной клик в админке — две задачи на одну заявку
+        jobs.enqueue('core.approve_buy_requests', {'request_ids': [req.pk]})
+        jobs.enqueue('core.approve_buy_requests', {'request_ids': [req.pk]})
+        self.run_jobs()
+
+        self.assertEqual(UserScooter.objects.get(user=self.user).quantity, 1)
+        self.assertEqual(Transaction.objects.filter(user=self.user, type='buy').count(), 1)
+        self.assertEqual(Profile.objects.get(user=self.inviter).balance, Decimal('9.00'))
+        self.assertEqual(
+            sorted(Job.objects.values_list('result', flat=True)),
+            ['Одобрено 0 из 1', 'Одобрено 1 из 1'],
+        )
+
+    def test_second_request_adds_quantity(self):
+        first = BuyRequest.objects.create(user=self.user, level=self.level)
+        second = BuyRequest.objects.create(user=self.user, level=self.level)
+        self.assertTrue(tasks.approve_buy_request(first.pk))
+        self.assertTrue(tasks.approve_buy_request(second.pk))
+        self.assertFalse(tasks.approve_buy_request(second.pk))
+        self.assertEqual(UserScooter.objects.get(user=self.user).quantity, 2)
+        self.assertEqual(set(BuyRequest.objects.values_list('status', flat=True)), {'approved'})
+
+
+class ImportUsersTests(TestCase):
+    def write(self, records):
+        with open(self.path, 'w', encoding='utf-8') as fh:
+            fh.write(''.join(json.dumps({'password_hash': '!', **r}) + '\n' for r in records))
+
+    def import_users(self, **options):
+        out = StringIO()
+        call_command('import_users', self.path, workers=1, stdout=out, **options)
+        return out.getvalue()
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'users.jsonl')
+
+    def inviter_of(self, email):
+        return Profile.objects.get(user__username=email).invited_by
+
+    def test_forward_refs_are_linked_after_all_chunks(self):
+        self.write([
+            {'email': 'a@example.com', 'ref': 'B-CODE'},
+            {'email': 'self@example.com', 'referral_code': 'SELF', 'ref': 'SELF'},
+            {'email': 'lost@example.com', 'ref': 'NOWHERE'},
+            {'email': 'b@example.com', 'referral_code': 'B-CODE'},
+        ])
+        out = self.import_users(chunk_size=1)
+
+        self.assertEqual(self.inviter_of('a@example.com').username, 'b@example.com')
+        self.assertIsNone(self.inviter_of('self@example.com'))
+        self.assertIsNone(self.inviter_of('lost@example.com'))
+        self.assertIn('lost@example.com: пригласивший с кодом NOWHERE не найден', out)
+        self.assertIn('без пригласившего 1', out)
+
+    def test_taken_referral_codes_are_regenerated(self):
+        owner = User.objects.create(username='owner@example.com')
+        Profile.objects.create(user=owner, referral_code='TAKEN')
+        self.write([
+            {'email': 'x@example.com', 'referral_code': 'TAKEN'},
+            {'email': 'y@example.com', 'referral_code': 'DUP'},
+            {'email': 'z@example.com', 'referral_code': 'DUP', 'ref': 'TAKEN'},
+        ])
+        out = self.import_users()
+
+        codes = dict(Profile.objects.values_list('user__username', 'referral_code'))
+        self.assertEqual(len(set(codes.values())), 4)
+        self.assertEqual(codes['y@example.com'], 'DUP')
+        self.assertNotIn(codes['x@example.com'], ('TAKEN', 'DUP'))
+        self.assertNotIn(codes['z@example.com'], ('TAKEN', 'DUP'))
+        # ref на занятый код — это его прежний владелец
+        self.assertEqual(self.inviter_of('z@example.com'), owner)
+        self.assertIn(f"x@example.com: код TAKEN уже занят, выдан {codes['x@example.com']}", out)
+        self.assertIn('кодов заменено 2', out)
+
+    def test_interrupted_import_resumes_with_pending_refs(self):
+        records = [
+            {'email': 'a@example.com', 'ref': 'D-CODE'},
+            {'email': 'b@example.com'},
+            {'email': 'c@example.com', 'scooters': '9:1'},
+            {'email': 'd@example.com', 'referral_code': 'D-CODE'},
+        ]
+        self.write(records)
+        with self.assertRaisesMessage(CommandError, 'c@example.com: неизвестный уровень 9'):
+            self.import_users(chunk_size=2)
+        with open(f'{self.path}.progress') as fh:
+            progress = json.load(fh)
+        a = User.objects.get(username='a@example.com')
+        self.assertEqual(progress, {'records': 2, 'pending_refs': {str(a.pk): 'D-CODE'}})
+
+        records[2]['scooters'] = ''
+        self.write(records)
+        out = self.import_users(chunk_size=2)
+
+        self.assertIn('Продолжаем с записи 2', out)
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(self.inviter_of('a@example.com').username, 'd@example.com')
+        self.assertFalse(os.path.exists(f'{self.path}.progress'))
+
+
+def fast_transport(api, **kwargs):
+    return TelegramTransport(token='test', api_url=api.url, global_rate=1000, per_chat_rate=1000, **kwargs)
+
+
+class TelegramTransportTests(SimpleTestCase):
+    def test_fan_out_reuses_connections_and_keeps_chat_order(self):
+        with FakeBotAPI(latency=0.01) as api:
+            transport = fast_transport(api, pool_size=4)
+            messages = [(i % 5, f'msg {i}') for i in range(40)]
+            self.assertEqual(transport.send_many(messages), [None] * 40)
+            transport.close()
+
+        self.assertEqual(len(api.messages), 40)
+        self.assertLessEqual(api.connections, 4)
+        for chat_id in range(5):
+            texts = [m['text'] for m in api.messages if m['chat_id'] == str(chat_id)]
+            self.assertEqual(texts, [f'msg {i}' for i in range(chat_id, 40, 5)])
+
+    def test_retries_after_flood_control(self):
+        with FakeBotAPI(flood_every=2, retry_after=0.2) as api:
+            transport = fast_transport(api)
+            transport.send_message(1, 'first')
+            transport.send_message(1, 'second')
+            transport.close()
+        self.assertEqual([m['text'] for m in api.messages], ['first', 'second'])
+        self.assertEqual(api.requests, 3)
+
+    def test_client_errors_are_not_retried(self):
+        with FakeBotAPI(blocked_chats=[7]) as api:
+            transport = fast_transport(api)
+            with self.assertRaises(TelegramError) as ctx:
+                transport.send_message(7, 'hi')
+            transport.close()
+        self.assertEqual(ctx.exception.error_code, 403)
+        self.assertEqual(api.requests, 1)
+
+    def test_per_chat_bucket_paces_messages(self):
+        with FakeBotAPI() as api:
+            transport = TelegramTransport(token='test', api_url=api.url, global_rate=1000, per_chat_rate=10)
+            started = time.monotonic()
+            transport.send_many([(1, str(i)) for i in range(4)])
+            elapsed = time.monotonic() - started
+            transport.close()
+        self.assertEqual(len(api.messages), 4)
+        self.assertGreaterEqual(elapsed, 0.3)
+
+
+@override_settings(TELEGRAM_CHAT_IDS=['1', '2'])
+class OutboxDeliveryTests(TestCase):
+    def test_partial_failure_is_retried_only_for_failed_chats(self):
+        outbox.enqueue('hello')
+        with FakeBotAPI(blocked_chats=['2']) as api:
+            transport = fast_transport(api)
+            self.assertEqual(outbox.deliver_batch(outbox.claim_batch(), transport), 0)
+            message = OutboxMessage.objects.get()
+            self.assertEqual((message.status, message.delivered_to), ('pending', ['1']))
+
+            api.blocked_chats.clear()
+            OutboxMessage.objects.update(next_attempt_at=message.created_at)
+            self.assertEqual(outbox.deliver_batch(outbox.claim_batch(), transport), 1)
+            transport.close()
+
+        self.assertEqual(OutboxMessage.objects.get().status, 'sent')
+        self.assertEqual([m['chat_id'] for m in api.messages], ['1', '2'])
+
+
+@override_settings(TELEGRAM_CHAT_IDS=['1'], TELEGRAM_DIGEST_WINDOWS={'earning': 600, 'registration': 0})
+class OutboxDigestTests(TestCase):
+    def test_high_volume_events_are_coalesced(self):
+        for i in range(50):
+            outbox.enqueue(f'earning {i}', category='earning', amount=Decimal('1.50'))
+        outbox.enqueue('registration', category='registration')
+        outbox.enqueue('withdrawal', priority=outbox.PRIORITY_HIGH)
+
+        self.assertEqual(OutboxMessage.objects.filter(status='held').count(), 50)
+        self.assertIsNone(outbox.flush_digests())
+        self.assertEqual([m.text for m in outbox.claim_batch()], ['withdrawal', 'registration'])
+
+        digest = outbox.flush_digests(force=True)
+        self.assertIn('50 на 75.00 $', digest.text)
+        self.assertEqual(digest.merged.count(), 50)
+        self.assertFalse(OutboxMessage.objects.filter(status='held').exists())
+        self.assertIsNone(outbox.flush_digests(force=True))
+
+
+class BroadcastTests(TestCase):
+    def setUp(self):
+        for i in range(1, 31):
+            user = User.objects.create(username=f'user{i}@example.com', email=f'user{i}@example.com')
+            Profile.objects.create(user=user, telegram_chat_id=1000 + i)
+        Profile.objects.create(user=User.objects.create(username='nochat@example.com'))
+        self.campaign = BroadcastCampaign.objects.create(name='Новости', text='Привет!')
+
+    def test_campaign_resumes_and_reports_metrics(self):
+        broadcast.populate(self.campaign)
+        # Прерванный запуск: часть строк уже отправлена, часть зависла в sending
+        first = list(self.campaign.recipients.order_by('id')[:5])
+        BroadcastRecipient.objects.filter(pk__in=[r.pk for r in first[:3]]).update(status='sent')
+        BroadcastCampaign.objects.filter(pk=self.campaign.pk).update(sent=3)
+        BroadcastRecipient.objects.filter(pk__in=[r.pk for r in first[3:]]).update(
+            status='sending', attempts=1, locked_at=timezone.now() - timedelta(hours=1),
+        )
+
+        with FakeBotAPI(blocked_chats=[1030]) as api:
+            transport = fast_transport(api)
+            result = broadcast.run_campaign(self.campaign, transport, batch_size=7)
+            transport.close()
+
+        self.assertEqual(len(api.messages), 26)
+        self.assertEqual(len({m['chat_id'] for m in api.messages}), 26)
+        self.assertEqual(result['status'], 'done')
+        self.assertEqual((result['total'], result['sent'], result['failed']), (30, 29, 1))
+        self.assertEqual(result['by_status'], {'sent': 29, 'blocked': 1})
+        self.assertIsNone(Profile.objects.get(user__username='user30@example.com').telegram_chat_id)
+
+    def test_pause_before_run_is_not_overridden(self):
+        broadcast.start(self.campaign)
+        broadcast.pause(self.campaign)
+        with FakeBotAPI() as api:
+            transport = fast_transport(api)
+            result = broadcast.run_campaign(self.campaign, transport)
+            transport.close()
+        self.assertEqual(api.messages, [])
+        self.assertEqual(result['status'], 'paused')
+        self.assertIsNone(BroadcastCampaign.objects.get(pk=self.campaign.pk).started_at)
+
+    def sync(self, *messages, sent_at=None):
+        date = int((sent_at or timezone.now()).timestamp())
+        with FakeBotAPI() as api:
+            api.updates = [
+                {'update_id': i, 'message': {'chat': {'id': chat_id, 'type': 'private'}, 'date': date, 'text': text}}
+                for i, (chat_id, text) in enumerate(messages, start=1)
+            ]
+            transport = fast_transport(api)
+            linked = broadcast.sync_chat_ids(transport)
+            transport.close()
+        return linked
+
+    def test_chat_is_linked_only_by_a_fresh_single_use_token(self):
+        profile = Profile.objects.get(user__username='user1@example.com')
+        Profile.objects.filter(pk=profile.pk).update(telegram_chat_id=None, telegram_username='@attacker')
+        stale = broadcast.issue_link_token(profile.user)
+        token = broadcast.issue_link_token(profile.user)
+        expired_user = Profile.objects.get(user__username='nochat@example.com').user
+        expired = broadcast.issue_link_token(expired_user)
+        TelegramLinkToken.objects.filter(user=expired_user).update(expires_at=timezone.now() - timedelta(seconds=5))
+
+        self.assertEqual(self.sync(
+            (666, f'/start {profile.referral_code}'),  # публичный реферальный код
+            (666, f'/start {stale}'),  # выдан новый — старый не действует
+            (666, f'/start {expired}'),
+            (555, f'/start {token}'),
+            (666, f'/start {token}'),  # повторно тот же
+        ), 1)
+        self.assertEqual(Profile.objects.get(pk=profile.pk).telegram_chat_id, 555)
+        self.assertIsNone(Profile.objects.get(user=expired_user).telegram_chat_id)
+        self.assertFalse(Profile.objects.filter(telegram_chat_id=666).exists())
+        self.assertFalse(TelegramLinkToken.objects.filter(token_hash=token).exists())  # хранится только хэш
+
+    def test_token_expiry_is_checked_against_message_time(self):
+        user = User.objects.get(username='nochat@example.com')
+        token = broadcast.issue_link_token(user)
+        issued = TelegramLinkToken.objects.get(user=user)
+        # Разобрали уже после срока, но /start пришёл вовремя
+        TelegramLinkToken.objects.filter(pk=issued.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.sync((777, f'/start {token}'), sent_at=timezone.now() - timedelta(minutes=2)), 1)
+        self.assertEqual(Profile.objects.get(user=user).telegram_chat_id, 777)
+
+        late = broadcast.issue_link_token(user, replace=True)
+        TelegramLinkToken.objects.filter(used_at__isnull=True).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.sync((888, f'/start {late}')), 0)
+
+    def test_chats_are_synced_by_schedule(self):
+        schedule = JobSchedule.objects.get(name='sync_telegram_chats')
+        self.assertEqual((schedule.task, schedule.cron, schedule.enabled), ('core.sync_telegram_chats', '* * * * *', True))
+
+    def test_linked_chat_is_replaced_only_after_password(self):
+        profile = Profile.objects.get(user__username='user1@example.com')
+        user = profile.user
+        user.set_password('secret-pass')
+        user.save()
+        self.assertEqual(self.sync((555, f'/start {broadcast.issue_link_token(user)}')), 0)
+        self.assertEqual(Profile.objects.get(pk=profile.pk).telegram_chat_id, 1001)
+
+        self.client.force_login(user)
+        with override_settings(TELEGRAM_BOT_USERNAME='zeepy_bot'):
+            refused = self.client.post('/settings/telegram/', {'password': 'wrong'})
+            self.assertEqual(refused['Location'], '/settings/')
+            response = self.client.post('/settings/telegram/', {'password': 'secret-pass'})
+        prefix = 'https://t.me/zeepy_bot?start='
+        self.assertTrue(response['Location'].startswith(prefix))
+        # Чат 1002 был у другого профиля — остаётся привязан только к одному
+        self.assertEqual(self.sync((1002, f"/start {response['Location'][len(prefix):]}")), 1)
+        self.assertEqual(Profile.objects.get(pk=profile.pk).telegram_chat_id, 1002)
+        self.assertEqual(Profile.objects.filter(telegram_chat_id=1002).count(), 1)
+
+
+class TimingWheelTests(SimpleTestCase):
+    def test_timers_fire_on_their_tick_across_levels(self):
+        wheel = TimingWheel(tick=1, slots=(4, 4, 4), start=0)
+        deadlines = {key: deadline for key, deadline in enumerate([1, 3, 4, 5, 15, 16, 17, 63, 64, 65, 200])}
+        for key, deadline in deadlines.items():
+            wheel.add(key, deadline)
+        wheel.remove(4)
+        wheel.add(5, 20)
+        deadlines.pop(4)
+        deadlines[5] = 20
+
+        fired = {}
+        for now in range(1, 250):
+            for key in wheel.advance(now):
+                fired[key] = now
+        self.assertEqual(fired, deadlines)
+        self.assertEqual(len(wheel), 0)
+
+    def test_overdue_timer_fires_on_next_advance(self):
+        wheel = TimingWheel(start=1000)
+        wheel.add('late', 900)
+        self.assertEqual(wheel.advance(1000), ['late'])
+
+
+@override_settings(CLAIM_REMINDER_DELAY=timedelta(hours=24))
+class ClaimReminderTests(TestCase):
+    def test_reschedule_cancels_previous_and_fire_enqueues_once(self):
+        user = User.objects.create(username='rider@example.com')
+        profile = Profile.objects.create(user=user, telegram_chat_id=42)
+        first = schedule_claim_reminder(profile)
+        second = schedule_claim_reminder(profile)
+
+        wheel = TimingWheel(start=time.time())
+        reminders.load_pending(wheel)
+        self.assertEqual(len(wheel), 1)
+        self.assertEqual(reminders.fire([first.pk, second.pk]), 1)
+        self.assertEqual(reminders.fire([second.pk]), 0)
+        self.assertEqual(list(OutboxMessage.objects.values_list('chat_id', flat=True)), ['42'])
+
+
+class CatalogTests(TestCase):
+    def test_snapshot_is_served_from_memory_and_refreshed_on_save(self):
+        level = ScooterLevel.objects.create(number=1, price=Decimal('100'))
+        ScooterLevel.objects.create(number=2, price=Decimal('200'))
+        catalog.invalidate()
+
+        # Версия из общего кэша (таблица в БД) и сами уровни
+        with self.assertNumQueries(2):
+            snapshot = catalog.get_catalog()
+        with self.assertNumQueries(0):
+            self.assertIs(catalog.get_catalog(), snapshot)
+            self.assertEqual(snapshot.get(level.pk).number, 1)
+            self.assertEqual(snapshot.by_number('2').price, Decimal('200'))
+            self.assertIsNone(snapshot.get('abc'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            level.price = Decimal('150')
+            level.save()
+        self.assertEqual(catalog.get_catalog().get(level.pk).price, Decimal('150'))
+        self.assertNotEqual(catalog.get_catalog().version, snapshot.version)
+
+
+
+class RollupsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='rollups@example.com')
+        self.level = ScooterLevel.objects.create(number=1, price=Decimal('100'))
+        self.other_level = ScooterLevel.objects.create(number=2, price=Decimal('200'))
+        self.day = timezone.localdate()
+
+    def snapshot(self):
+        counters = {key: Decimal(value) for key, value in rollups._counters().items() if value}
+        return counters, rollups._daily(self.day)
+
+    def assertMatchesRebuild(self):
+        """Инкрементальные сводки совпадают с пересчётом с нуля"""
+        incremental = self.snapshot()
+        rollups.rebuild_counters()
+        rollups.rebuild_day(self.day)
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_transactions(self):
+        deposit = Transaction.objects.create(user=self.user, type='deposit', amount=Decimal('100'))
+        earning = Transaction.objects.create(user=self.user, type='earning', amount=Decimal('5'))
+        buy = Transaction.objects.create(user=self.user, type='buy', amount=Decimal('30'))
+        Transaction.objects.create(user=self.user, type='withdraw', amount=Decimal('10'))
+        self.assertMatchesRebuild()
+
+        deposit.amount = Decimal('150')
+        deposit.save()
+        earning.type = 'referral'
+        earning.save()
+        buy.delete()
+        self.assertEqual(rollups._daily(self.day)['deposits_total'], Decimal('150'))
+        self.assertMatchesRebuild()
+
+        # Перенос на другой день пересчитывает оба дня
+        deposit.created_at -= timedelta(days=1)
+        deposit.save()
+        self.assertEqual(rollups._daily(self.day)['deposits_count'], 0)
+        self.assertEqual(rollups._daily(self.day - timedelta(days=1))['deposits_total'], Decimal('150'))
+        self.assertMatchesRebuild()
+
+    def test_buy_requests(self):
+        approved = BuyRequest.objects.create(user=self.user, level=self.level)
+        deleted = BuyRequest.objects.create(user=self.user, level=self.level)
+        BuyRequest.objects.create(user=self.user, level=self.level)
+        approved.status = 'approved'
+        approved.save()
+        deleted.delete()
+        self.assertEqual(rollups.platform_kpis()['pending_buy_requests'], 1)
+        self.assertMatchesRebuild()
+
+    def test_withdrawal_requests(self):
+        edited = WithdrawalRequest.objects.create(user=self.user, amount=Decimal('10'), wallet_address='T1')
+        paid = WithdrawalRequest.objects.create(user=self.user, amount=Decimal('20'), wallet_address='T1')
+        WithdrawalRequest.objects.create(user=self.user, amount=Decimal('40'), wallet_address='T1')
+        edited.amount = Decimal('15')
+        edited.save()
+        paid.status = 'approved'
+        paid.save()
+        self.assertMatchesRebuild()
+
+        edited.delete()
+        kpis = rollups.platform_kpis()
+        self.assertEqual(kpis['pending_withdrawals_total'], Decimal('40'))
+        self.assertEqual(kpis['pending_withdrawals_count'], 1)
+        self.assertMatchesRebuild()
+
+    def test_saving_deferred_objects(self):
+        req = WithdrawalRequest.objects.create(user=self.user, amount=Decimal('10'), wallet_address='T1')
+        deferred = WithdrawalRequest.objects.only('id', 'status').get(pk=req.pk)
+        deferred.status = 'approved'
+        deferred.save()
+        self.assertEqual(rollups.platform_kpis()['pending_withdrawals_total'], Decimal('0'))
+
+        us = UserScooter.objects.create(user=self.user, level=self.level, quantity=2)
+        deferred = UserScooter.objects.only('id', 'quantity').get(pk=us.pk)
+        deferred.quantity = 5
+        deferred.save()
+        # Отложенное поле, которому присвоили новое значение: прежнее берётся из БД
+        deferred = UserScooter.objects.only('id').get(pk=us.pk)
+        deferred.level = self.other_level
+        deferred.save()
+        catalog.invalidate()
+        self.assertEqual([row['units'] for row in rollups.platform_kpis()['levels']], [0, 5])
+        self.assertMatchesRebuild()
+
+    def test_user_scooters(self):
+        moved = UserScooter.objects.create(user=self.user, level=self.level, quantity=2)
+        other = User.objects.create(username='other@example.com')
+        deleted = UserScooter.objects.create(user=other, level=self.level, quantity=1)
+        moved.quantity = 3
+        moved.save()
+        moved.level = self.other_level
+        moved.save()
+        deleted.delete()
+        catalog.invalidate()
+        self.assertEqual([row['units'] for row in rollups.platform_kpis()['levels']], [0, 3])
+        self.assertMatchesRebuild()
+
+    def test_rebuild_fixes_drift_and_increments_continue(self):
+        UserScooter.objects.create(user=self.user, level=self.level, quantity=2)
+        Transaction.objects.create(user=self.user, type='deposit', amount=Decimal('100'))
+        expected = self.snapshot()
+        # queryset.update и ручные правки мимо сигналов
+        PlatformCounter.objects.update(value=0)
+        PlatformDailyStats.objects.update(deposits_total=0)
+        rollups.rebuild_counters()
+        rollups.rebuild_day(self.day)
+        self.assertEqual(self.snapshot(), expected)
+
+        UserScooter.objects.create(user=self.user, level=self.other_level, quantity=1)
+        Transaction.objects.create(user=self.user, type='deposit', amount=Decimal('50'))
+        self.assertMatchesRebuild()
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class SearchTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create(username='alice@example.com', email='alice@example.com')
+        self.bob = User.objects.create(username='bob@example.com', email='bob@example.com')
+        Profile.objects.create(user=self.alice, wallet='TXaliceWallet')
+
+    def entries(self, model):
+        return dict(SearchEntry.objects.filter(model=search.model_label(model)).values_list('object_id', 'content'))
+
+    def search_sql(self, captured):
+        return [q['sql'] for q in captured if 'core_searchentry' in q['sql']]
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(self.entries(User)[self.alice.pk], 'alice@example.com')
+        self.assertEqual(search.search_ids(User, 'LICE@'), [self.alice.pk])
+        self.assertEqual(search.search_ids(User, 'al'), [self.alice.pk])  # короче триграммы — LIKE
+        self.assertEqual(search.search_ids(Profile, 'xalicew'), [self.alice.profile.pk])
+
+        self.alice.username = self.alice.email = 'carol@example.com'
+        self.alice.save()
+        self.assertEqual(search.search_ids(User, 'alice'), [])
+        self.assertEqual(search.search_ids(User, 'carol'), [self.alice.pk])
+
+        self.bob.delete()
+        self.assertNotIn(self.bob.pk, self.entries(User))
+        self.assertEqual(search.search_ids(User, 'example'), [self.alice.pk])
+
+    def test_sqlite_uses_fts_index(self):
+        if not search._has_fts(connection):
+            self.skipTest('SQLite без trigram-токенизатора FTS5')
+        with CaptureQueriesContext(connection) as captured:
+            search.search_ids(User, 'alice')
+        self.assertIn('MATCH', self.search_sql(captured)[0])
+
+    def test_ledger_writes_are_cheap(self):
+        with CaptureQueriesContext(connection) as captured:
+            tx = Transaction.objects.create(user=self.bob, type='deposit', amount=Decimal('5'), comment='Coffee refund')
+        self.assertEqual(len(self.search_sql(captured)), 1)
+        self.assertTrue(self.search_sql(captured)[0].startswith('INSERT'))
+        self.assertEqual(self.entries(Transaction), {tx.pk: 'coffee refund'})
+
+        with CaptureQueriesContext(connection) as captured:
+            Transaction.objects.create(user=self.bob, type='deposit', amount=Decimal('5'))
+            profile = self.alice.profile
+            profile.balance = Decimal('10')
+            profile.save(update_fields=['balance'])
+        self.assertEqual(self.search_sql(captured), [])
+
+        tx.comment = ''
+        tx.save()
+        self.assertEqual(self.entries(Transaction), {})
+
+    def test_admin_search_matches_own_fields_and_user(self):
+        coffee = Transaction.objects.create(user=self.bob, type='deposit', amount=Decimal('5'), comment='Coffee')
+        alices = Transaction.objects.create(user=self.alice, type='deposit', amount=Decimal('5'), comment='Tea')
+        self.client.force_login(User.objects.create(username='admin@example.com', is_staff=True, is_superuser=True))
+
+        def found(term):
+            response = self.client.get('/admin/core/transaction/', {'q': term})
+            self.assertEqual(response.status_code, 200)
+            return {tx.pk for tx in response.context['cl'].result_list}
+
+        self.assertEqual(found('offe'), {coffee.pk})
+        self.assertEqual(found('alice@'), {alices.pk})
+        self.assertEqual(found('nothing'), set())
+        self.assertEqual(found(''), {coffee.pk, alices.pk})
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='c@example.com')
+        Profile.objects.create(user=self.user)
+        self.level = ScooterLevel.objects.create(number=1, price=Decimal('100'))
+        self.client.force_login(self.user)
+
+    def test_batches_and_cursor_follow_all_streams(self):
+        past = timezone.now() - timedelta(minutes=5)
+        for i in range(3):
+            Transaction.objects.create(user=self.user, type='deposit', amount=Decimal(i + 1))
+        request = BuyRequest.objects.create(user=self.user, level=self.level)
+        Transaction.objects.filter(user=self.user).update(created_at=past)
+        BuyRequest.objects.filter(pk=request.pk).update(updated_at=past + timedelta(seconds=1))
+
+        first = feeds.changes(self.user, limit=3)
+        self.assertEqual([e['type'] for e in first['events']], ['transaction'] * 3)
+        self.assertTrue(first['has_more'])
+        second = feeds.changes(self.user, first['cursor'], limit=3)
+        self.assertEqual([(e['type'], e['data']['status']) for e in second['events']], [('buy_request', 'pending')])
+        self.assertFalse(second['has_more'])
+
+        # Изменение статуса — новое событие после курсора; свежие строки ждут SETTLE
+        request.status = 'approved'
+        request.save()
+        self.assertEqual(feeds.changes(self.user, second['cursor'])['events'], [])
+        BuyRequest.objects.filter(pk=request.pk).update(updated_at=timezone.now() - feeds.SETTLE * 2)
+        third = feeds.changes(self.user, second['cursor'])
+        self.assertEqual([e['data']['status'] for e in third['events']], ['approved'])
+
+    def test_timeline_merges_sources_with_one_query_each(self):
+        base = timezone.now() - timedelta(days=1)
+        Transaction.objects.bulk_create([
+            Transaction(user=self.user, type='earning', amount=Decimal('1')) for _ in range(120)
+        ])
+        for i, pk in enumerate(Transaction.objects.filter(user=self.user).values_list('pk', flat=True)):
+            Transaction.objects.filter(pk=pk).update(created_at=base + timedelta(minutes=i))
+        request = BuyRequest.objects.create(user=self.user, level=self.level, status='rejected')
+        BuyRequest.objects.filter(pk=request.pk).update(created_at=base + timedelta(minutes=100, seconds=30))
+        withdrawal = WithdrawalRequest.objects.create(user=self.user, amount=Decimal('20'), wallet_address='T')
+        WithdrawalRequest.objects.filter(pk=withdrawal.pk).update(created_at=base + timedelta(minutes=119, seconds=30))
+
+        with self.assertNumQueries(4):
+            page = timeline.timeline(self.user, limit=50)
+        self.assertEqual([e['type'] for e in page['events'][:2]], ['withdrawal', 'transaction'])
+        self.assertEqual(page['events'][20]['data']['status'], 'rejected')
+
+        events = page['events']
+        while page['has_more']:
+            page = timeline.timeline(self.user, page['cursor'], limit=50)
+            events += page['events']
+        self.assertEqual(len(events), 122)
+        self.assertEqual(len({(e['type'], e['id']) for e in events}), 122)
+        self.assertEqual([e['at'] for e in events], sorted((e['at'] for e in events), reverse=True))
+
+    def test_api_rejects_foreign_or_tampered_cursor(self):
+        other = User.objects.create(username='o@example.com')
+        foreign = feeds.changes(other)['cursor']
+        self.assertEqual(self.client.get('/api/me/changes/', {'cursor': foreign}).status_code, 400)
+        self.assertEqual(self.client.get('/api/me/changes/', {'cursor': 'garbage'}).status_code, 400)
+        response = self.client.get('/api/me/changes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['events'], [])
+
+
+# Признаки деградации плана: полный просмотр таблицы или сортировка в памяти
+DEGRADED_PLAN = {
+    'sqlite': re.compile(r'\bSCAN\b|USE TEMP B-TREE'),
+    'postgresql': re.compile(r'Seq Scan|^\s*(->\s*)?Sort\b', re.MULTILINE),
+}
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN каждого запроса из core.queries.HOT_QUERIES (PostgreSQL — если тесты идут на нём)."""
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # На пустых таблицах PostgreSQL и так выберет Seq Scan — проверяем,
+            # что индексный план вообще существует
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                return queryset.explain()
+        return queryset.explain()
+
+    def test_hot_queries_use_indexes(self):
+        if connection.vendor not in DEGRADED_PLAN:
+            self.skipTest(f'Нет шаблона плана для {connection.vendor}')
+        user = User.objects.create(username='plan@example.com')
+        for name, build in queries.HOT_QUERIES.items():
+            with self.subTest(name):
+                plan = self.plan(build(user, timezone.now()))
+                self.assertNotRegex(plan, DEGRADED_PLAN[connection.vendor], f'{name}:\n{plan}')
+
+    def test_admin_pending_queue_uses_index(self):
+        if connection.vendor not in DEGRADED_PLAN:
+            self.skipTest(f'Нет шаблона плана для {connection.vendor}')
+        request = RequestFactory().get('/admin/core/buyrequest/', {'status__exact': 'pending'})
+        request.user = User.objects.create(username='admin@example.com', is_staff=True, is_superuser=True)
+        changelist = admin.site._registry[BuyRequest].get_changelist_instance(request)
+        queryset = changelist.get_queryset(request)
+        self.assertEqual(str(queryset.query), str(queries.pending_buy_requests().select_related('user', 'level').query))
+        plan = self.plan(queryset[:100])
+        self.assertNotRegex(plan, DEGRADED_PLAN[connection.vendor], plan)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+def fake_pool(**kwargs):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    def check(conn):
+        if not conn.healthy:
+            raise OSError('connection lost')
+
+    pool = ConnectionPool(
+        connect=connect, check=check, reset=lambda conn: not conn.closed, close=FakeConnection.close, **kwargs,
+    )
+    return pool, opened
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        db_metrics.reset()
+
+    def test_connections_are_reused_and_bounded(self):
+        pool, opened = fake_pool(max_size=2, timeout=0.2)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        second = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(len(opened), 2)
+
+        # Ожидающий получает соединение, как только его вернут
+        with ThreadPoolExecutor(1) as executor:
+            waiting = executor.submit(ConnectionPool.acquire, pool)
+            time.sleep(0.05)
+            pool.release(second)
+            self.assertIs(waiting.result(timeout=1), second)
+        stats = db_metrics.snapshot()
+        self.assertEqual((stats['connects'], stats['reuses'], stats['waits'], stats['timeouts']), (2, 2, 2, 1))
+        self.assertEqual(pool.stats(), {'size': 2, 'idle': 0, 'max_size': 2})
+
+    def test_broken_and_old_connections_are_replaced(self):
+        pool, opened = fake_pool(max_size=1, check_after=0, max_lifetime=60)
+        conn = pool.acquire()
+        pool.release(conn)
+        conn.healthy = False
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, conn)
+        self.assertTrue(conn.closed)
+
+        replacement.closed = True  # не прошёл reset — в пул не возвращается
+        pool.release(replacement)
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertEqual(db_metrics.snapshot()['health_check_failures'], 1)
+        self.assertEqual(db_metrics.snapshot()['closes'], 2)
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    def test_wal_and_immediate_write_transactions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            params = {**connection.settings_dict, 'NAME': f'{tmp}/db.sqlite3', 'PRAGMAS': {'busy_timeout': 50}}
+            writer, other = SQLiteWrapper(params, 'writer'), SQLiteWrapper(dict(params), 'other')
+            with writer.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA synchronous')
+                self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                cursor.execute('CREATE TABLE t (x)')
+
+            # Право на запись берётся в начале транзакции, а не на первой записи
+            writer._start_transaction_under_autocommit()
+            with other.cursor() as cursor:
+                cursor.execute('SELECT count(*) FROM t')  # читатель не ждёт писателя
+                with self.assertRaisesRegex(DatabaseError, 'locked'):
+                    other._start_transaction_under_autocommit()
+            writer.cursor().execute('ROLLBACK')
+            writer.close()
+            other.close()
+
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = TieredCache(prefix='test', local_ttl=60)
+        self.cache.shared.clear()
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 42
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: self.cache.get_or_compute('k', compute, timeout=60), range(8)))
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache.metrics()['computes'], 1)
+
+    def test_metrics_are_exact_across_threads(self):
+        self.cache.set('k', 1, timeout=60)
+        self.cache.reset_metrics()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: [self.cache.get('k') for _ in range(5000)], range(8)))
+        self.assertEqual(self.cache.metrics()['local_hits'], 40000)
+
+    def test_stale_value_is_served_while_another_worker_recomputes(self):
+        self.cache.set('k', 'old', timeout=0, stale=60)
+        # Блокировку держит другой процесс — отдаём старое значение, не считая
+        self.cache.shared.add('test:k:lock', 1)
+        self.assertEqual(self.cache.get_or_compute('k', lambda: 'new', timeout=60), 'old')
+        self.cache.shared.delete('test:k:lock')
+        self.assertEqual(self.cache.get_or_compute('k', lambda: 'new', timeout=60), 'new')
+        metrics = self.cache.metrics()
+        self.assertEqual((metrics['stale_hits'], metrics['computes']), (1, 1))
+
+    def test_local_tier_is_bounded_and_decorator_caches_by_arguments(self):
+        small = TieredCache(prefix='small', max_entries=2)
+        for key in 'abc':
+            small.set(key, key, timeout=60)
+        self.assertEqual(len(small.local), 2)
+        self.assertEqual(small.get('a'), 'a')
+        self.assertEqual(small.metrics()['shared_hits'], 1)
+
+        calls = []
+
+        @cached(timeout=60, cache=self.cache)
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        self.assertEqual([square(3), square(3), square(4)], [9, 9, 16])
+        self.assertEqual(calls, [3, 4])
+        square.invalidate(3)
+        square(3)
+        self.assertEqual(calls, [3, 4, 3])
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        pagecache.pages.local.clear()
+        self.level = ScooterLevel.objects.create(number=1, price=Decimal('100'))
+        catalog.invalidate()
+
+    def test_anonymous_page_is_cached_revalidated_and_invalidated(self):
+        url = f'/payment/?level_id={self.level.pk}'
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('public', first['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url + '&utm_source=ads')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.level.price = Decimal('150')
+            self.level.save()
+        self.assertNotEqual(self.client.get(url)["ETag"], first["ETag"])
+
+    def test_ref_is_remembered_in_cookie_without_public_caching(self):
+        self.client.get('/')
+        response = self.client.get('/?ref=ABC123')
+        self.assertEqual(response.cookies['ref_code'].value, 'ABC123')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+        self.assertContains(self.client.get('/register/'), 'ABC123')
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.force_login(User.objects.create(username='u@example.com'))
+        response = self.client.get(f'/payment/?level_id={self.level.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class CabinetCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='f@example.com', email='f@example.com')
+        Profile.objects.create(user=self.user, balance=Decimal('10'))
+        level = ScooterLevel.objects.create(number=1, price=Decimal('100'))
+        UserScooter.objects.create(user=self.user, level=level, quantity=1)
+        DailyReport.objects.create(
+            user=self.user, total_distance=Decimal('12'), profit_percentage=Decimal('3.5'),
+            profit_amount=Decimal('3.50'), number_of_trips=4,
+        )
+        self.client.force_login(self.user)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(captured)
+
+    def test_sections_are_cached_until_user_data_changes(self):
+        first, cold = self.queries('/my-scooters/')
+        second, warm = self.queries('/my-scooters/')
+        self.assertLess(warm, cold)
+        self.assertEqual(second.content, first.content)
+        self.assertContains(second, '€0,00')
+
+        version = versioning.user_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(user=self.user, type='earning', amount=Decimal('7.25'))
+        self.assertNotEqual(versioning.user_version(self.user.pk), version)
+        self.assertContains(self.client.get('/my-scooters/'), '€7,25')
+
+        _, cold = self.queries('/dashboard/')
+        _, warm = self.queries('/dashboard/')
+        self.assertLess(warm, cold)
+
+
+    def test_user_profile_and_session_load_without_extra_queries(self):
+        for url in ('/settings/', '/profile/'):
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            tables = [q['sql'].split(' FROM ')[1].split()[0] for q in captured if q['sql'].startswith('SELECT')]
+            self.assertEqual(tables[:2], ['"django_session"', '"auth_user"'])
+            self.assertNotIn('"core_profile"', tables)
+            self.assertEqual(tables.count('"auth_user"'), 1)
+            self.assertEqual(tables.count('"django_session"'), 1)
+
+    def test_summary_api_revalidates_by_user_version(self):
+        first = self.client.get('/api/me/summary/')
+        self.assertEqual(first.status_code, 200)
+        data = first.json()
+        self.assertEqual(data['balance'], 10.0)
+        self.assertEqual(data['scooters'], [{'level': 1, 'quantity': 1}])
+        self.assertEqual(data['report']['trips'], 4)
+        self.assertIsNone(data['next_claim'])
+
+        # Сессия, пользователь с профилем и версия — и больше ничего
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get('/api/me/summary/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tx = Transaction.objects.create(user=self.user, type='earning', amount=Decimal('1.50'))
+        second = self.client.get('/api/me/summary/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.json()['next_claim'], (tx.created_at + reminders.claim_delay()).isoformat())
+
+
+# Реплика — тот же default: проверяется выбор маршрутизатора, а не данные.
+# TransactionTestCase: внутри транзакции TestCase чтения всегда идут в default
+@override_settings(DATABASE_REPLICA_ALIAS='default')
+class ReplicaRoutingTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='r@example.com', email='r@example.com')
+        cache.clear()  # создание пользователя тоже закрепляет его за default
+
+    def route(self, view, method='get', url_name='dashboard'):
+        """Куда маршрутизатор отправил чтение Transaction внутри view."""
+        seen = []
+
+        @wraps(view)  # вместе с пометкой replica_reads / primary_reads
+        def probe(request):
+            view(request)
+            seen.append(ReplicaRouter().db_for_read(Transaction))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/')
+        request.user = self.user
+        request.resolver_match = ResolverMatch(probe, (), {}, url_name=url_name)
+        middleware = ReplicaRoutingMiddleware(lambda r: middleware.process_view(r, probe, (), {}) or probe(r))
+        middleware(request)
+        return seen[0]
+
+    def test_reads_follow_view_config_and_recent_writes(self):
+        self.assertEqual(self.route(lambda r: None), 'default')
+        self.assertIsNone(self.route(lambda r: None, url_name='settings'))
+        self.assertIsNone(self.route(lambda r: None, method='post'))
+        self.assertEqual(self.route(replica_reads(lambda r: None), url_name='settings'), 'default')
+        self.assertIsNone(self.route(primary_reads(lambda r: None)))
+
+        # Запись в запросе: дальше в нём и следующие REPLICA_PIN_SECONDS — основная база
+        self.assertIsNone(self.route(lambda r: ScooterLevel.objects.create(number=9, price=Decimal('1'))))
+        self.assertTrue(db_router.is_pinned(self.user.pk))
+        self.assertIsNone(self.route(lambda r: None))
+
+    def test_changes_by_others_pin_the_user(self):
+        versioning.bump_user_version(self.user.pk)
+        self.assertIsNone(self.route(lambda r: None))
+        cache.delete(f'core:replica_pin:{self.user.pk}')
+        self.assertEqual(self.route(lambda r: None), 'default')
+
+    def test_sessions_and_transactions_stay_on_primary(self):
+        def view(request):
+            self.assertIsNone(ReplicaRouter().db_for_read(Session))
+            with transaction.atomic():
+                self.assertIsNone(ReplicaRouter().db_for_read(Transaction))
+        self.assertEqual(self.route(view), 'default')
+        self.assertEqual(ReplicaRouter().db_for_write(Transaction), 'default')
+
+
+@override_settings(
+    ALLOWED_HOSTS=['testserver'],
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class PerformanceChecksTests(TestCase):
+    def test_project_passes_performance_checks(self):
+        self.assertEqual(run_checks(tags=['performance']), [])
+
+    def test_admin_relation_without_select_related_is_reported(self):
+        class BareProfileAdmin(admin.ModelAdmin):
+            list_display = ('user', 'invited_by')
+            list_select_related = ('user',)
+
+        registry = admin.site._registry
+        admin.site._registry = {Profile: BareProfileAdmin(Profile, admin.site)}
+        try:
+            errors = checks.check_admin_select_related()
+        finally:
+            admin.site._registry = registry
+        self.assertEqual([(e.id, e.obj) for e in errors], [('core.W001', BareProfileAdmin)])
+        self.assertIn("'invited_by'", errors[0].msg)
+
+    def test_str_does_not_query_unloaded_relations(self):
+        user = User.objects.create(username='s@example.com')
+        tx = Transaction.objects.create(user=user, type='earning', amount=Decimal('1'))
+        with self.assertNumQueries(0):
+            self.assertEqual(str(Transaction(pk=tx.pk, user_id=user.pk, type='earning', amount=1)), f'#{user.pk} - earning - 1')
+        self.assertEqual(str(Transaction.objects.select_related('user').get(pk=tx.pk)), 's@example.com - earning - 1.00')
+
+    def test_history_is_paginated(self):
+        user = User.objects.create(username='h@example.com', email='h@example.com')
+        Profile.objects.create(user=user)
+        Transaction.objects.bulk_create(
+            Transaction(user=user, type='earning', amount=Decimal(i)) for i in range(views.HISTORY_PAGE_SIZE + 5)
+        )
+        self.client.force_login(user)
+        first = self.client.get('/history/')
+        self.assertEqual(len(first.context['transactions']), views.HISTORY_PAGE_SIZE)
+        self.assertContains(first, '?page=2')
+        self.assertEqual(len(self.client.get('/history/?page=2').context['transactions']), 5)
+
+
+class AsyncApiTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='a@example.com', email='a@example.com')
+        self.profile = Profile.objects.create(user=self.user, balance=Decimal('50'))
+        self.level = ScooterLevel.objects.create(
+            number=1, price=Decimal('100'), min_daily_profit=Decimal('1'), max_daily_profit=Decimal('3'),
+        )
+        catalog.invalidate()
+
+    def post(self, path, data=None):
+        request = AsyncRequestFactory().post(path, data or {}, content_type='application/json')
+        request.user = self.user
+        return request
+
+    async def test_claim_starts_waits_and_credits(self):
+        await UserScooter.objects.acreate(user=self.user, level=self.level, quantity=2)
+        started = await api_async.claim_profit_view(self.post('/api/claim_profit/'))
+        self.assertEqual(json.loads(started.content)['status'], 'started')
+        self.assertEqual((await api_async.claim_profit_view(self.post('/api/claim_profit/'))).status_code, 400)
+
+        await Transaction.objects.filter(user=self.user).aupdate(created_at=timezone.now() - timedelta(minutes=1))
+        credited = await api_async.claim_profit_view(self.post('/api/claim_profit/'))
+        data = json.loads(credited.content)
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(len(data['report']['scooters']), 2)
+        self.assertGreater(data['new_balance'], 50)
+
+    async def test_withdrawal_and_buy_request(self):
+        response = await api_async.create_withdrawal_request(
+            self.post('/api/create_withdrawal_request/', {'amount': '20', 'wallet_address': 'T123'}),
+        )
+        self.assertEqual(json.loads(response.content), {'status': 'success', 'new_balance': 30.0})
+        withdrawal = await WithdrawalRequest.objects.aget(user=self.user)
+        self.assertEqual(withdrawal.amount, Decimal('15.00'))
+        again = await api_async.create_withdrawal_request(
+            self.post('/api/create_withdrawal_request/', {'amount': '20', 'wallet_address': 'T123'}),
+        )
+        self.assertEqual(again.status_code, 400)
+
+        response = await api_async.create_buy_request(self.post('/api/create_buy_request/', {'level_id': self.level.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(await BuyRequest.objects.filter(user=self.user, level=self.level, status='pending').aexists())
+
+    async def test_anonymous_is_redirected_to_login(self):
+        request = AsyncRequestFactory().post('/api/claim_profit/')
+        request.user = AnonymousUser()
+        response = await api_async.claim_profit_view(request)
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,66 @@
+"""
+Единая лента активности пользователя: операции, заявки на покупку и
+вывод (с их текущим статусом) и дневные отчёты, от новых к старым.
+
+    GET /api/me/timeline/?cursor=<курсор>&limit=50
+
+Каждый источник — ленивый генератор по индексу (user, <время>, id):
+запрос LIMIT limit+1 от позиции курсора, следующий — только если
+источник выбран до конца. heapq.merge сливает их по убыванию времени,
+так что страница стоит по одному короткому запросу на источник
+независимо от длины истории. Курсор — позиции источников (core/feeds.py).
+"""
+import heapq
+from itertools import islice
+
+from django.db.models import Q
+
+from . import feeds
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+SALT = 'core.timeline'
+
+# Время события: создание заявки, а не последнее изменение — лента
+# хронологическая; отчёт за день датируется последним пересчётом
+TIME_FIELDS = {
+    'transaction': 'created_at',
+    'buy_request': 'created_at',
+    'withdrawal': 'created_at',
+    'report': 'updated_at',
+}
+
+
+def _source(user, name, position, chunk):
+    model, _, fields, _ = feeds.STREAMS[name]
+    field = TIME_FIELDS[name]
+    while True:
+        rows = model.objects.filter(user=user)
+        if position:
+            at, pk = position
+            rows = rows.filter(Q(**{f'{field}__lt': at}) | Q(**{field: at, 'pk__lt': pk}))
+        batch = list(rows.order_by(f'-{field}', '-pk').values('pk', field, *fields)[:chunk])
+        for row in batch:
+            yield row[field], name, row['pk'], row
+        if len(batch) < chunk:
+            return
+        position = (batch[-1][field], batch[-1]['pk'])
+
+
+def timeline(user, cursor=None, limit=DEFAULT_LIMIT):
+    """Страница событий (новые сначала), курсор следующей страницы и has_more."""
+    limit = max(1, min(limit, MAX_LIMIT))
+    positions = feeds.decode_cursor(user, cursor, salt=SALT)
+    sources = [_source(user, name, positions.get(name), limit + 1) for name in TIME_FIELDS]
+    page = list(islice(heapq.merge(*sources, key=lambda item: item[:3], reverse=True), limit + 1))
+
+    events = []
+    for at, name, pk, row in page[:limit]:
+        positions[name] = (at, pk)
+        events.append({'type': name, 'id': pk, 'at': at.isoformat(), 'data': feeds.STREAMS[name][3](row)})
+    has_more = len(page) > limit
+    return {
+        'events': events,
+        'cursor': feeds.encode_cursor(user, positions, salt=SALT) if has_more else None,
+        'has_more': has_more,
+    }
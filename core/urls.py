@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
-from core.views import create_buy_request
+from . import api_async, views
+
+# Под ASGI (ASYNC_API=1) API начислений и заявок — корутины из core/api_async.py
+api = api_async if settings.ASYNC_API else views
 
 urlpatterns = [
     path('', views.index, name='index'),
@@ -13,17 +16,20 @@ urlpatterns = [
     path('payment/', views.payment_view, name='payment'),
     path('finance/', views.finance_view, name='finance'),
     path('profile/', views.profile_view, name='profile'),
-    path('api/create_buy_request/', views.create_buy_request, name='create_buy_request'),
+    path('api/create_buy_request/', api.create_buy_request, name='create_buy_request'),
     path('my-scooters/', views.my_scooters_view, name='my_scooters'),
-    path('api/claim_profit/', views.claim_profit_view, name='claim_profit'),
+    path('api/claim_profit/', api.claim_profit_view, name='claim_profit'),
+    path('api/me/summary/', views.me_summary_api, name='me_summary'),
+    path('api/me/changes/', views.changes_api, name='me_changes'),
+    path('api/me/timeline/', views.timeline_api, name='me_timeline'),
     path('referral/', views.referral_view, name='referral'),
     path('settings/', views.settings_view, name='settings'),
+    path('settings/telegram/', views.telegram_link_view, name='telegram_link'),
     path('about/', views.about_view, name='about'),
-    path('api/create_withdrawal_request/', views.create_withdrawal_request, name='create_withdrawal_request'),
+    path('api/create_withdrawal_request/', api.create_withdrawal_request, name='create_withdrawal_request'),
     path('monitoring/', views.monitoring_view, name='monitoring'),
 
 ]
-from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
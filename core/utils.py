@@ -1,8 +1,6 @@
 import random
 from decimal import Decimal, ROUND_UP
 from .models import ScooterStats, DailyReport
-import requests
-from django.conf import settings
 
 
 def generate_scooter_stats(user, total_investment_value, report_date):
@@ -56,30 +54,8 @@ def generate_scooter_stats(user, total_investment_value, report_date):
 
 def send_telegram_message(message_text: str):
     """
-    Отправляет сообщение администратору в Telegram.
+    Отправляет сообщение администраторам в Telegram — через outbox и общий
+    транспорт, как и core/notifications.py.
     """
-    # Получаем токен и ID чата из настроек Django
-    bot_token = getattr(settings, 'TELEGRAM_BOT_TOKEN', None)
-    chat_id = getattr(settings, 'TELEGRAM_ADMIN_CHAT_ID', None)
-
-    if not bot_token or not chat_id:
-        print("Ошибка: TELEGRAM_BOT_TOKEN или TELEGRAM_ADMIN_CHAT_ID не настроены в settings.py")
-        return
-
-    # URL для запроса к Telegram Bot API
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-
-    # Параметры запроса
-    payload = {
-        'chat_id': chat_id,
-        'text': message_text,
-        'parse_mode': 'HTML'  # Включаем поддержку HTML-тегов, как <b>
-    }
-
-    try:
-        # Отправляем запрос
-        response = requests.post(url, data=payload, timeout=5)
-        response.raise_for_status()  # Проверяем, был ли запрос успешным
-        print(f"Сообщение в Telegram отправлено: {message_text[:50]}...")
-    except requests.exceptions.RequestException as e:
-        print(f"Ошибка при отправке сообщения в Telegram: {e}")
+    from .notifications import send_telegram_message as enqueue_message
+    enqueue_message(message_text)
@@ -0,0 +1,48 @@
+"""
+Версия данных пользователя.
+
+Счётчик в общем кэше, который сигналы (core/signals.py) увеличивают после
+коммита любого изменения баланса, операций, самокатов или отчётов
+пользователя. Пока версия не изменилась, всё, что построено из этих
+данных, можно отдавать из кэша:
+
+    {% cache fragment_timeout "my_scooters_reports" user.pk data_version %}
+
+Проверка свежести — одно чтение из кэша вместо запросов к БД.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .db_router import pin_user
+
+
+def _key(user_id):
+    return f'core:user:{user_id}:version'
+
+
+def user_version(user_id):
+    version = cache.get(_key(user_id))
+    if version is None:
+        # Как и у каталога: начальная версия — время, чтобы после вытеснения
+        # ключа не совпасть с версией, под которой уже лежат фрагменты
+        cache.add(_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(_key(user_id))
+    return version
+
+
+def bump_user_version(user_id):
+    # Новую версию нельзя строить по отстающей реплике: фрагмент закэшировался
+    # бы со старыми данными, поэтому пользователь на время уходит в default
+    pin_user(user_id)
+    try:
+        return cache.incr(_key(user_id))
+    except ValueError:
+        cache.add(_key(user_id), time.time_ns(), timeout=None)
+        return cache.get(_key(user_id))
+
+
+def bump_on_commit(user_id):
+    """Новая версия после коммита текущей транзакции (сразу — вне транзакции)."""
+    transaction.on_commit(lambda: bump_user_version(user_id))
@@ -1,11 +1,12 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 from django.contrib import messages
+from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 from django.db.models import Sum, Max, F
@@ -13,7 +14,7 @@ from datetime import timedelta
 import json
 import random
 from decimal import Decimal
-from . import models
+from . import broadcast, feeds, models, queries, timeline
 
 
 # Telegram‑уведомления
@@ -33,16 +34,40 @@ from .notifications import (
 # Ваши модели, формы, утилиты
 from .models import (
     Profile, Transaction, BuyRequest, UserScooter,
-    ScooterLevel, ScooterStats, WithdrawalRequest, DailyReport
+    ScooterStats, WithdrawalRequest, DailyReport
 )
 from .forms import CustomPasswordChangeForm, ProfileUpdateForm
+from .catalog import get_catalog, get_level_or_404
+from .auth import request_profile
+from .cache import tiered
+from .reminders import claim_delay, schedule_claim_reminder
+from .pagecache import cache_anonymous_page
+from .pagination import EstimatedCountPaginator
+from .versioning import user_version
+
+REF_COOKIE = 'ref_code'
+HISTORY_PAGE_SIZE = 50
+# Последние операции ввода/вывода на странице профиля
+PROFILE_TRANSACTIONS = 20
+# Сколько рефералов каждого уровня показывать списком (счётчики — полные)
+REFERRALS_SHOWN = 100
+
+
+def fragment_context(user, catalog_snapshot=None):
+    """Ключи для {% cache %}: фрагменты пользователя живут, пока не изменилась версия его данных."""
+    return {
+        'data_version': user_version(user.pk),
+        'catalog_version': (catalog_snapshot or get_catalog()).version,
+        'fragment_timeout': settings.TEMPLATE_FRAGMENT_TIMEOUT,
+    }
 # generate_scooter_stats определена локально в этом файле (строка 455)
 
 
 
 def register(request):
     """Регистрирует пользователя, создаёт профиль и отправляет оповещения в Telegram."""
-    ref_code = request.GET.get('ref', '')
+    # Код из ссылки или сохранённый при заходе на главную (?ref=...)
+    ref_code = request.GET.get('ref') or request.COOKIES.get(REF_COOKIE, '')
 
     if request.method == 'POST':
         email    = request.POST.get('email', '').strip()
@@ -60,10 +85,7 @@ def register(request):
             messages.error(request, 'Пользователь с таким email уже существует')
             return redirect(f'/register/?ref={ref_form}')
 
-        # 3) Создаём пользователя
-        user = User.objects.create_user(username=email, email=email, password=pwd1)
-
-        # 4) Разруливаем пригласителя
+        # 3) Разруливаем пригласителя
         inviter = None
         if ref_form:
             try:
@@ -71,15 +93,17 @@ def register(request):
             except Profile.DoesNotExist:
                 inviter = None
 
-        # 5) Создаём профиль
-        Profile.objects.create(user=user, invited_by=inviter)
+        with transaction.atomic():
+            # 4) Создаём пользователя и профиль
+            user = User.objects.create_user(username=email, email=email, password=pwd1)
+            Profile.objects.create(user=user, invited_by=inviter)
 
-        # 6) Отправляем в Telegram
-        notify_new_user(user)
-        if inviter:
-            notify_referral_signup(user, inviter)
+            # 5) Уведомления в Telegram уходят через outbox после коммита
+            notify_new_user(user)
+            if inviter:
+                notify_referral_signup(user, inviter)
 
-        # 7) Уведомляем на сайте и переходим в логин
+        # 6) Уведомляем на сайте и переходим в логин
         messages.success(request, 'Регистрация успешно завершена!')
         return redirect('login')
 
@@ -89,11 +113,9 @@ def register(request):
 
 
 
+@cache_anonymous_page(remember={'ref': REF_COOKIE})
 def index(request):
-    """Сохраняет реферальный код и отображает главную страницу."""
-    ref = request.GET.get('ref')
-    if ref:
-        request.session['ref_code'] = ref
+    """Главная страница; реферальный код из ?ref= сохраняет в cookie декоратор."""
     return render(request, 'index.html')
 
 
@@ -120,39 +142,37 @@ def logout_view(request):
 
 @login_required(login_url='login')
 def dashboard(request):
-    profile = get_object_or_404(Profile, user=request.user)
+    profile = request_profile(request)
     scooters = UserScooter.objects.filter(user=request.user)
-    scooters_count = scooters.aggregate(total=Sum('quantity'))['total'] or 0
-    highest_level = scooters.aggregate(max_level=Max('level__number'))['max_level'] or 0
-    total_earnings = Transaction.objects.filter(
-        user=request.user, type='earning'
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    recent_tx = Transaction.objects.filter(user=request.user).order_by('-created_at')[:5]
     referral_link = request.build_absolute_uri(f'/register/?ref={profile.referral_code}')
-    levels = ScooterLevel.objects.all().order_by('number')
+    catalog_snapshot = get_catalog()
 
+    # Агрегаты — функциями: шаблон вызывает их, только если фрагмент не в кэше
     return render(request, 'dashboard.html', {
         'profile': profile,
-        'scooters_count': scooters_count,
-        'total_earnings': total_earnings,
-        'recent_transactions': recent_tx,
+        'scooters_count': lambda: scooters.aggregate(total=Sum('quantity'))['total'] or 0,
+        'total_earnings': lambda: queries.earnings(request.user).aggregate(total=Sum('amount'))['total'] or 0,
+        'recent_transactions': Transaction.objects.filter(user=request.user).order_by('-created_at')[:5],
         'referral_link': referral_link,
-        'levels': levels,
-        'highest_level': highest_level,
+        'levels': catalog_snapshot.levels,
+        'highest_level': lambda: scooters.aggregate(max_level=Max('level__number'))['max_level'] or 0,
+        **fragment_context(request.user, catalog_snapshot),
     })
 
 
 @login_required
 def history(request):
-    tx = Transaction.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'history.html', {'transactions': tx})
+    tx = Transaction.objects.filter(user=request.user).order_by('-created_at', '-pk')
+    page = EstimatedCountPaginator(tx, HISTORY_PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request, 'history.html', {'transactions': page, 'page': page})
 
 
+@cache_anonymous_page()
 def buy_view(request):
     try:
-        levels = ScooterLevel.objects.all().order_by('number')
+        levels = get_catalog().levels
         # Проверяем, что уровни есть
-        if not levels.exists():
+        if not levels:
             print("[WARNING] buy_view: No ScooterLevel objects found in database")
         return render(request, 'buy_level.html', {'levels': levels})
     except Exception as e:
@@ -169,20 +189,22 @@ def buy_view(request):
         return HttpResponse(f"<h1>Ошибка в buy_view</h1><pre>{error_msg}</pre>", status=500)
 
 
+@cache_anonymous_page(vary_on=('level_id',))
 def payment_view(request):
-    level = get_object_or_404(ScooterLevel, id=request.GET.get('level_id'))
+    level = get_level_or_404(request.GET.get('level_id'))
     return render(request, 'payment.html', {'level': level})
 
 
 @login_required
 def finance_view(request):
-    tx = Transaction.objects.filter(user=request.user)
-    return render(request, 'finance.html', {'transactions': tx})
+    tx = Transaction.objects.filter(user=request.user).order_by('-created_at', '-pk')
+    page = EstimatedCountPaginator(tx, HISTORY_PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request, 'finance.html', {'transactions': page, 'page': page})
 
 
 @login_required
 def profile_view(request):
-    profile, _ = Profile.objects.get_or_create(user=request.user)
+    profile = request_profile(request)
     if request.method == 'POST':
         if 'avatar' in request.FILES:
             profile.avatar = request.FILES['avatar']
@@ -193,11 +215,8 @@ def profile_view(request):
 
     tx = Transaction.objects.filter(
         user=request.user, type__in=['withdraw','deposit']
-    ).order_by('-created_at')
-    earnings = Transaction.objects.filter(
-        user=request.user, type='earning',
-        created_at__gte=timezone.now() - timedelta(days=7)
-    )
+    ).order_by('-created_at')[:PROFILE_TRANSACTIONS]
+    earnings = queries.earnings(request.user).filter(created_at__gte=timezone.now() - timedelta(days=7))
     earnings_by_day = {}
     for e in earnings:
         d = e.created_at.strftime('%d.%m')
@@ -222,20 +241,22 @@ def create_buy_request(request):
     if not level_id:
         return JsonResponse({'status': 'error', 'message': 'Level ID не указан'}, status=400)
 
-    level = get_object_or_404(ScooterLevel, id=level_id)
-
-    # 1) создаём BuyRequest
-    BuyRequest.objects.create(user=request.user, level=level, status='pending')
+    level = get_level_or_404(level_id)
+    save_buy_request(request.user, level)
+    return JsonResponse({'status': 'success', 'message': 'Запрос успешно создан'})
 
-    # 2) уведомляем в Telegram
-    notify_buy_request_status_change(
-        request.user,
-        f"Level {level.number}",
-        'pending'
-    )
 
-    # 3) возвращаем ответ
-    return JsonResponse({'status': 'success', 'message': 'Запрос успешно создан'})
+def save_buy_request(user, level):
+    with transaction.atomic():
+        # 1) создаём BuyRequest
+        BuyRequest.objects.create(user=user, level=level, status='pending')
+
+        # 2) уведомляем в Telegram (запись в outbox в той же транзакции)
+        notify_buy_request_status_change(
+            user,
+            f"Level {level.number}",
+            'pending'
+        )
 
 
 
@@ -243,20 +264,20 @@ def create_buy_request(request):
 def my_scooters_view(request):
     try:
         scooters = UserScooter.objects.filter(user=request.user)
-        profile = get_object_or_404(Profile, user=request.user)
-        last = Transaction.objects.filter(user=request.user, type='earning').order_by('-created_at').first()
+        profile = request_profile(request)
+        last = queries.earnings(request.user).order_by('-created_at').first()
         last_ts = last.created_at.isoformat() if last else None
-        past = DailyReport.objects.filter(user=request.user)
-        highest = scooters.aggregate(max_level=Max('level__number'))['max_level'] or 0
-        total_rental = Transaction.objects.filter(user=request.user, type='earning').aggregate(total=Sum('amount'))['total'] or 0
+        past = queries.user_reports(request.user)
 
         return render(request, 'my_scooters.html', {
-            'user_scooters': scooters,
+            # Шаблону нужно только «есть ли самокаты»
+            'user_scooters': scooters.exists(),
             'profile': profile,
             'last_claim_timestamp': last_ts,
             'past_reports': past,
-            'highest_level': highest,
-            'total_rental_earnings': total_rental,
+            'highest_level': lambda: scooters.aggregate(max_level=Max('level__number'))['max_level'] or 0,
+            'total_rental_earnings': lambda: queries.earnings(request.user).aggregate(total=Sum('amount'))['total'] or 0,
+            **fragment_context(request.user),
         })
     except Exception as e:
         # Логируем ошибку для отладки на Render
@@ -268,7 +289,6 @@ def my_scooters_view(request):
         print(f"[ERROR] my_scooters_view failed: {error_msg}")  # Для логов Render
         
         # В режиме DEBUG показываем ошибку, иначе пустую страницу
-        from django.conf import settings
         if settings.DEBUG:
             from django.http import HttpResponse
             return HttpResponse(f"<h1>Ошибка в my_scooters_view</h1><pre>{error_msg}</pre>", status=500)
@@ -280,6 +300,7 @@ def my_scooters_view(request):
             'past_reports': [],
             'highest_level': 0,
             'total_rental_earnings': 0,
+            'fragment_timeout': 0,
         })
 
 
@@ -288,26 +309,63 @@ def claim_profit_view(request):
     if request.method != 'POST':
         return JsonResponse({'status': 'error', 'message': 'Неверный метод запроса'}, status=405)
     user = request.user
-    profile = get_object_or_404(Profile, user=user)
-    scooters = UserScooter.objects.filter(user=user)
-    if not scooters.exists():
+    profile = request_profile(request)
+    if not UserScooter.objects.filter(user=user).exists():
         return JsonResponse({'status': 'error', 'message': 'Нет активных самокатов'}, status=400)
 
-    last_tx = Transaction.objects.filter(user=user, type='earning').order_by('-created_at').first()
+    last_tx = queries.earnings(user).order_by('-created_at').first()
     if not last_tx:
+        return JsonResponse(start_claims(user, profile))
+    error = claim_cooldown_error(last_tx)
+    if error:
+        return JsonResponse(error, status=400)
+    data, status = credit_daily_profit(user, profile)
+    return JsonResponse(data, status=status)
+
+
+def start_claims(user, profile):
+    """Первый claim: точка отсчёта без начисления."""
+    with transaction.atomic():
         tx = Transaction.objects.create(user=user, type='earning', amount=Decimal('0'), comment='Старт')
-        return JsonResponse({'status': 'started', 'new_timestamp': tx.created_at.isoformat()})
+        schedule_claim_reminder(profile, tx.created_at)
+    return {'status': 'started', 'new_timestamp': tx.created_at.isoformat()}
+
+
+def lock_profile(profile):
+    """
+    Блокирует строку профиля до конца транзакции и подтягивает баланс из БД.
+
+    Проверки во view идут до транзакции, и параллельный запрос того же
+    пользователя (другой воркер, поток или корутина под ASGI) мог изменить
+    баланс — без блокировки profile.save() затёр бы его изменение.
+    """
+    locked = Profile.objects.select_for_update().get(pk=profile.pk)
+    profile.balance, profile.total_earned = locked.balance, locked.total_earned
+
+
+def claim_cooldown_error(last_tx):
     elapsed = timezone.now() - last_tx.created_at
     if elapsed < timedelta(seconds=30):
         rem = timedelta(seconds=30) - elapsed
-        return JsonResponse({'status': 'error', 'message': f'Ждите {str(rem).split(".")[0]}'}, status=400)
+        return {'status': 'error', 'message': f'Ждите {str(rem).split(".")[0]}'}
+    return None
 
+
+def credit_daily_profit(user, profile):
+    """Отчёт за день, начисление на баланс и операция. -> (JSON, HTTP-статус)"""
+    scooters = UserScooter.objects.filter(user=user)
     with transaction.atomic():
+        lock_profile(profile)
+        # Кулдаун ещё раз — под блокировкой: параллельный claim мог успеть начислить
+        last_tx = queries.earnings(user).order_by('-created_at').first()
+        error = last_tx and claim_cooldown_error(last_tx)
+        if error:
+            return error, 400
         total_inv = scooters.aggregate(total=Sum(F('level__price') * F('quantity')))['total'] or 0
         generate_scooter_stats(user, total_inv, timezone.now().date())
         report = DailyReport.objects.filter(user=user, report_date=timezone.now().date()).order_by('-id').first()
         if not report:
-            return JsonResponse({'status': 'error', 'message': 'Отчет не найден'}, status=404)
+            return {'status': 'error', 'message': 'Отчет не найден'}, 404
 
         profile.balance += report.profit_amount
         profile.total_earned += report.profit_amount
@@ -317,8 +375,9 @@ def claim_profit_view(request):
             comment=f"Доход за {report.number_of_trips} поездок"
         )
         notify_balance_credit(user, report.profit_amount, source='daily_profit')
+        schedule_claim_reminder(profile, new_tx.created_at)
 
-        stats_qs = ScooterStats.objects.filter(user=user, report_date=report.report_date)
+        stats_qs = queries.day_stats(user, report.report_date)
         scooters_data = [{
             'number': s.scooter_number,
             'distance': float(s.distance),
@@ -327,7 +386,7 @@ def claim_profit_view(request):
             'percentage': float(s.percentage),
         } for s in stats_qs]
 
-    return JsonResponse({
+    return {
         'status': 'success',
         'new_balance': float(profile.balance),
         'new_timestamp': new_tx.created_at.isoformat(),
@@ -339,32 +398,39 @@ def claim_profit_view(request):
             'trips': report.number_of_trips,
             'scooters': scooters_data,
         }
-    })
+    }, 200
 
 
 @login_required
 def referral_view(request):
-    profile = get_object_or_404(Profile, user=request.user)
+    profile = request_profile(request)
     link = request.build_absolute_uri(f'/register/?ref={profile.referral_code}')
+    # Уровни — подзапросами по invited_by, без загрузки профилей предыдущего уровня
     lvl1 = Profile.objects.filter(invited_by=request.user)
-    lvl2 = Profile.objects.filter(invited_by__in=[p.user for p in lvl1])
-    lvl3 = Profile.objects.filter(invited_by__in=[p.user for p in lvl2])
+    lvl2 = Profile.objects.filter(invited_by__in=lvl1.values('user'))
+    lvl3 = Profile.objects.filter(invited_by__in=lvl2.values('user'))
+    counts = [lvl.count() for lvl in (lvl1, lvl2, lvl3)]
+    shown = [lvl.select_related('user').order_by('-pk')[:REFERRALS_SHOWN] for lvl in (lvl1, lvl2, lvl3)]
     ref_earn = Transaction.objects.filter(user=request.user, type='referral').aggregate(total=Sum('amount'))['total'] or 0
 
     return render(request, 'referral.html', {
         'referral_link': link,
-        'level1_referrals': lvl1,
-        'level2_referrals': lvl2,
-        'level3_referrals': lvl3,
+        'level1_referrals': shown[0],
+        'level2_referrals': shown[1],
+        'level3_referrals': shown[2],
+        'level1_count': counts[0],
+        'level2_count': counts[1],
+        'level3_count': counts[2],
         'referral_earnings': ref_earn,
-        'total_referrals': lvl1.count() + lvl2.count() + lvl3.count(),
+        'total_referrals': sum(counts),
     })
 
 
 @login_required
 def settings_view(request):
     pwd_form = CustomPasswordChangeForm(request.user)
-    prof_form = ProfileUpdateForm(instance=request.user.profile)
+    profile = request_profile(request)
+    prof_form = ProfileUpdateForm(instance=profile)
     if request.method == 'POST':
         if 'change_password' in request.POST:
             pwd_form = CustomPasswordChangeForm(request.user, request.POST)
@@ -375,7 +441,7 @@ def settings_view(request):
                 return redirect('settings')
             messages.error(request, 'Ошибки в форме смены пароля')
         elif 'update_profile' in request.POST:
-            prof_form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
+            prof_form = ProfileUpdateForm(request.POST, request.FILES, instance=profile)
             if prof_form.is_valid():
                 prof_form.save()
                 messages.success(request, 'Профиль обновлён')
@@ -385,6 +451,22 @@ def settings_view(request):
     return render(request, 'settings.html', {'password_form': pwd_form, 'profile_form': prof_form})
 
 
+@login_required
+@require_POST
+def telegram_link_view(request):
+    """Одноразовая ссылка на бота для привязки чата; другой чат — только после пароля."""
+    profile = request_profile(request)
+    replace = profile.telegram_chat_id is not None
+    if replace and not request.user.check_password(request.POST.get('password', '')):
+        messages.error(request, 'Чтобы привязать другой чат, введите текущий пароль')
+        return redirect('settings')
+    if not settings.TELEGRAM_BOT_USERNAME:
+        messages.error(request, 'Бот временно недоступен')
+        return redirect('settings')
+    return redirect(broadcast.link_url(broadcast.issue_link_token(request.user, replace=replace)))
+
+
+@cache_anonymous_page()
 def about_view(request):
     return render(request, 'about.html')
 
@@ -394,62 +476,167 @@ def create_withdrawal_request(request):
     if request.method != 'POST':
         return JsonResponse({'status': 'error', 'message': 'Неверный метод'}, status=405)
 
-    data = json.loads(request.body)
+    profile = request_profile(request)
+    amount, wallet, error = parse_withdrawal(request.body, profile)
+    if error:
+        return JsonResponse(error, status=400)
+
+    # Проверяем частоту выводов
+    since = timezone.now() - timedelta(hours=12)
+    if queries.recent_withdrawals(request.user, since).exists():
+        return JsonResponse({'status': 'error', 'message': 'Вывод можно делать раз в 12 часов'}, status=400)
+
+    error = save_withdrawal(request.user, profile, amount, wallet)
+    if error:
+        return JsonResponse(error, status=400)
+    # Возвращаем успешный ответ с новым балансом
+    return JsonResponse({'status': 'success', 'new_balance': float(profile.balance)})
+
+
+WITHDRAWAL_COMMISSION = Decimal('5.00')
+
+
+def parse_withdrawal(body, profile):
+    """Сумма и кошелёк из тела запроса -> (amount, wallet, None) или (None, None, ошибка)."""
+    data = json.loads(body)
     # amount — это полная сумма, которую пользователь хочет списать со своего баланса
     try:
         amount = Decimal(str(data.get('amount')))
-    except (ValueError, TypeError):
-        return JsonResponse({'status': 'error', 'message': 'Неверная сумма'}, status=400)
-        
-    wallet = data.get('wallet_address')
-    profile = get_object_or_404(Profile, user=request.user)
-    commission = Decimal('5.00')
-
-    # --- НАЧАЛО ИЗМЕНЕНИЙ ---
+    except (ValueError, TypeError, ArithmeticError):
+        return None, None, {'status': 'error', 'message': 'Неверная сумма'}
 
-    # 1. Валидация
+    wallet = data.get('wallet_address')
+    commission = WITHDRAWAL_COMMISSION
     if not all([amount, wallet]):
-        return JsonResponse({'status': 'error', 'message': 'Все поля должны быть заполнены'}, status=400)
-
+        return None, None, {'status': 'error', 'message': 'Все поля должны быть заполнены'}
     # Проверяем, что на балансе пользователя достаточно средств для списания
     if profile.balance < amount:
-        return JsonResponse({'status': 'error', 'message': 'Недостаточно средств на балансе'}, status=400)
-
+        return None, None, {'status': 'error', 'message': 'Недостаточно средств на балансе'}
     # Проверяем, что запрашиваемая сумма больше комиссии
     if amount <= commission:
-        return JsonResponse({'status': 'error', 'message': f'Сумма вывода должна быть больше комиссии (${commission})'}, status=400)
-    
+        return None, None, {'status': 'error', 'message': f'Сумма вывода должна быть больше комиссии (${commission})'}
     # Проверяем минимальную сумму для списания
     if amount < Decimal('10'):
-        return JsonResponse({'status': 'error', 'message': 'Минимальная сумма для вывода $10'}, status=400)
-
-    # Проверяем частоту выводов
-    since = timezone.now() - timedelta(hours=12)
-    if WithdrawalRequest.objects.filter(user=request.user, created_at__gte=since).exists():
-        return JsonResponse({'status': 'error', 'message': 'Вывод можно делать раз в 12 часов'}, status=400)
+        return None, None, {'status': 'error', 'message': 'Минимальная сумма для вывода $10'}
+    return amount, wallet, None
 
-    # 2. Расчет чистой суммы к получению
-    net_amount_to_receive = amount - commission
 
-    # 3. Создаём заявку и списываем средства
+def save_withdrawal(user, profile, amount, wallet):
+    """Списывает полную сумму и создаёт заявку на сумму за вычетом комиссии. -> ошибка или None"""
+    net_amount_to_receive = amount - WITHDRAWAL_COMMISSION
     with transaction.atomic():
+        lock_profile(profile)
+        # Баланс и частоту — ещё раз под блокировкой, против двойного списания
+        if profile.balance < amount:
+            return {'status': 'error', 'message': 'Недостаточно средств на балансе'}
+        if queries.recent_withdrawals(user, timezone.now() - timedelta(hours=12)).exists():
+            return {'status': 'error', 'message': 'Вывод можно делать раз в 12 часов'}
+
         # Списываем с баланса полную запрошенную сумму
         profile.balance -= amount
         profile.save()
 
         # В заявке на вывод указываем чистую сумму, которую получит пользователь
-        wr = WithdrawalRequest.objects.create(
-            user=request.user,
+        WithdrawalRequest.objects.create(
+            user=user,
             amount=net_amount_to_receive,
             wallet_address=wallet,
             status='pending'
         )
 
-    # 4. Уведомляем о чистой сумме вывода
-    notify_withdraw_request(request.user, net_amount_to_receive, method='USDT', wallet=wallet)
+        # Уведомляем о чистой сумме вывода (запись в outbox)
+        notify_withdraw_request(user, net_amount_to_receive, method='USDT', wallet=wallet)
+
+
+SUMMARY_CACHE_TIMEOUT = 3600
+
+
+def _summary_etag(request):
+    # Только версии из кэша — 304 отдаётся без единого запроса к данным
+    if not request.user.is_authenticated:
+        return None
+    if not hasattr(request, '_summary_etag'):
+        request._summary_etag = f'{request.user.pk}-{user_version(request.user.pk)}-{get_catalog().version}'
+    return request._summary_etag
+
+
+def _build_summary(user):
+    levels = get_catalog()
+    profile = user.profile
+    holdings = [
+        {'level': levels.get(level_id).number, 'quantity': quantity}
+        for level_id, quantity in UserScooter.objects.filter(user=user).values_list('level_id', 'quantity')
+        if levels.get(level_id)
+    ]
+    recent = list(Transaction.objects.filter(user=user).values('type', 'amount', 'created_at')[:5])
+    last_claim = next((tx['created_at'] for tx in recent if tx['type'] == 'earning'), None)
+    if last_claim is None:
+        last_claim = queries.earnings(user).values_list('created_at', flat=True).first()
+    report = queries.user_reports(user).values(
+        'report_date', 'number_of_trips', 'total_distance', 'profit_amount', 'profit_percentage',
+    ).first()
+    return {
+        'balance': float(profile.balance),
+        'total_earned': float(profile.total_earned),
+        'scooters': holdings,
+        'last_claim': last_claim.isoformat() if last_claim else None,
+        'next_claim': (last_claim + claim_delay()).isoformat() if last_claim else None,
+        'transactions': [
+            {'type': tx['type'], 'amount': float(tx['amount']), 'created_at': tx['created_at'].isoformat()}
+            for tx in recent
+        ],
+        'report': report and {
+            'date': report['report_date'].isoformat(),
+            'trips': report['number_of_trips'],
+            'distance': float(report['total_distance']),
+            'profit': float(report['profit_amount']),
+            'percentage': float(report['profit_percentage']),
+        },
+    }
 
-    # 5. Возвращаем успешный ответ с новым балансом
-    return JsonResponse({'status': 'success', 'new_balance': float(profile.balance)})
+
+@login_required
+@condition(etag_func=_summary_etag)
+def me_summary_api(request):
+    """
+    Состояние кабинета одним JSON: баланс, самокаты, время следующего claim,
+    последние операции и отчёт. ETag — версия данных пользователя: пока она
+    не изменилась, клиент получает 304, а сервер ничего не считает.
+    """
+    etag = _summary_etag(request)
+    # Версия прочитана до данных: данные под ключом не старше его версии
+    data = tiered.get_or_compute(f'me_summary:{etag}', lambda: _build_summary(request.user), SUMMARY_CACHE_TIMEOUT)
+    response = JsonResponse(data)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def changes_api(request):
+    """Новые и изменённые операции, отчёты и заявки после курсора (core/feeds.py)."""
+    try:
+        limit = int(request.GET.get('limit', feeds.DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Неверный limit'}, status=400)
+    try:
+        data = feeds.changes(request.user, request.GET.get('cursor'), limit)
+    except feeds.InvalidCursor as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse(data)
+
+
+@login_required
+def timeline_api(request):
+    """Операции, заявки и отчёты одной лентой, от новых к старым (core/timeline.py)."""
+    try:
+        limit = int(request.GET.get('limit', timeline.DEFAULT_LIMIT))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Неверный limit'}, status=400)
+    try:
+        data = timeline.timeline(request.user, request.GET.get('cursor'), limit)
+    except feeds.InvalidCursor as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse(data)
 
 
 def generate_scooter_stats(user, total_investment, report_date):
@@ -461,16 +648,18 @@ def generate_scooter_stats(user, total_investment, report_date):
     models.ScooterStats.objects.filter(user=user, report_date=report_date).delete()
 
     # Получаем все самокаты пользователя с их уровнями
-    user_scooters_qs = models.UserScooter.objects.select_related('level').filter(user=user)
-    if not user_scooters_qs.exists():
+    # Уровни берём из каталога в памяти, без JOIN на каждый самокат
+    user_scooters_qs = list(models.UserScooter.objects.filter(user=user).only('level_id', 'quantity'))
+    if not user_scooters_qs:
         return # Если самокатов нет, выходим
+    levels = get_catalog()
 
     final_total_distance = Decimal('0.0')
     final_total_trips = 0
     final_total_profit = Decimal('0.0')
 
     for user_scooter in user_scooters_qs:
-        level = user_scooter.level
+        level = levels.get(user_scooter.level_id)
         
         # Проверяем, что уровень существует, прежде чем его использовать.
         if not level:
@@ -528,25 +717,3 @@ def generate_scooter_stats(user, total_investment, report_date):
 def monitoring_view(request):
     count = UserScooter.objects.filter(user=request.user).aggregate(total=Sum('quantity'))['total'] or 0
     return render(request, 'monitoring.html', {'user_scooter_count': count})
-
-
-def distribute_referral_bonuses(user, deposit_amount):
-    try:
-        ref = user.profile.invited_by
-        for pct in [Decimal('0.09'), Decimal('0.03'), Decimal('0.01')]:
-            if not ref:
-                break
-            bonus = deposit_amount * pct
-            with transaction.atomic():
-                ref.profile.balance += bonus
-                ref.profile.save()
-                Transaction.objects.create(
-                    user=ref, type='referral', amount=bonus,
-                    comment=f'Бонус {pct*100}% от {user.username}'
-                )
-                notify_balance_credit(ref, bonus, source='referral')
-            ref = ref.profile.invited_by
-    except Profile.DoesNotExist:
-        pass
-
-
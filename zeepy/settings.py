@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+from datetime import timedelta
 import dj_database_url
 from dotenv import load_dotenv
 import cloudinary
@@ -21,7 +22,7 @@ ALLOWED_HOSTS = raw_hosts.replace(",", " ").split()
 
 # Приложения
 INSTALLED_APPS = [
-    "django.contrib.admin",
+    "core.apps.ZeepyAdminConfig",
     "django.contrib.auth",
     "django.contrib.contenttypes",
     "django.contrib.sessions",
@@ -39,6 +40,7 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.db_router.ReplicaRoutingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -63,14 +65,123 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "zeepy.wsgi.application"
+# Асинхронные версии API начислений и заявок (core/api_async.py) — для запуска под ASGI
+ASYNC_API = os.environ.get("ASYNC_API", "0") == "1"
 
 # База данных
+# Соединения постоянные (DB_CONN_MAX_AGE сек) и проверяются перед повторным
+# использованием. PostgreSQL подключается через core.db.backends.postgresql:
+# он считает открытия и повторные использования (core/db/metrics.py), а при
+# DB_POOL_SIZE > 0 берёт соединения из общего для потоков процесса пула —
+# для gunicorn --threads и ASGI.
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", "600"))
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "0"))
+# SQLite на одном сервере: профиль для конкурентной записи (SQLITE_PROFILE=0 — стандартный бэкенд)
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "1") == "1"
+
+
+def database_config(url):
+    config = dj_database_url.parse(url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True)
+    if config.get("ENGINE") == "django.db.backends.postgresql":
+        config["ENGINE"] = "core.db.backends.postgresql"
+        if DB_POOL_SIZE:
+            config["POOL"] = {
+                "max_size": DB_POOL_SIZE,
+                "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),
+                "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", "600")),
+            }
+            # Соединение возвращается в пул в конце запроса
+            config["CONN_MAX_AGE"] = 0
+    elif config.get("ENGINE") == "django.db.backends.sqlite3" and SQLITE_PROFILE:
+        # WAL, busy_timeout и BEGIN IMMEDIATE — см. core/db/backends/sqlite3/base.py
+        config["ENGINE"] = "core.db.backends.sqlite3"
+    return config
+
+
 DATABASES = {
-    "default": dj_database_url.config(
-        default=os.environ.get("DATABASE_URL")
-    )
+    "default": database_config(os.environ["DATABASE_URL"]) if os.environ.get("DATABASE_URL") else {},
 }
 
+# Реплика для чтения (core/db_router.py). Локально — два файла SQLite:
+# DATABASE_URL=sqlite:////tmp/primary.db DATABASE_REPLICA_URL=sqlite:////tmp/replica.db
+if os.environ.get("DATABASE_REPLICA_URL"):
+    DATABASES["replica"] = database_config(os.environ["DATABASE_REPLICA_URL"])
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+# Сколько секунд после записи чтения пользователя идут в основную базу
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", "10"))
+# Представления (имена URL, допускаются маски), которые читают с реплики;
+# отдельный view — декораторами replica_reads / primary_reads
+REPLICA_READ_VIEWS = [
+    "dashboard",
+    "history",
+    "my_scooters",
+    "referral",
+    "monitoring",
+    "admin:core_*_changelist",
+]
+
+# Общий кэш для всех воркеров и инстансов. Перед ним в процессе — LRU из
+# core/cache.py. TIMEOUT None: записи без явного срока (версии каталога и
+# данных пользователей) не должны истекать.
+# В продакшене — Redis (REDIS_URL, встроенный RedisCache, пакет redis):
+# запись — одна команда SET, вытеснение делает сам Redis
+# (maxmemory-policy allkeys-lru).
+# Без REDIS_URL (локально, один небольшой инстанс) — таблица в той же БД
+# (миграция core 0030). Django перед каждым set/add считает её строки
+# SELECT COUNT(*) ради вытеснения по MAX_ENTRIES, а через set идут горячие
+# записи: версии данных пользователей, привязки к основной базе, версия
+# каталога. Под нагрузкой без Redis не запускать.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+            "TIMEOUT": None,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "core_cache",
+            "TIMEOUT": None,
+            "OPTIONS": {"MAX_ENTRIES": 50000, "CULL_FREQUENCY": 4},
+        },
+    }
+
+# Сессии. С Redis — cached_db поверх default: сессия читается из Redis,
+# django_session — только при промахе, а выход на одном инстансе сразу
+# видят остальные. Кэш в БД (core_cache) cached_db ничего не экономит:
+# попадание — тот же запрос, промах — три (кэш, django_session, запись в
+# кэш с подсчётом строк). Поэтому без Redis — db: один SELECT по
+# первичному ключу django_session на запрос.
+# Для установки на одном инстансе можно включить файловый кэш
+# (SESSION_CACHE_DIR) и cached_db поверх него — тогда сессия читается без
+# обращения к БД. С несколькими инстансами его не включать — каждый держал
+# бы свою копию сессии и принимал бы её после выхода на другом.
+# MAX_ENTRIES не поднимаем: FileBasedCache на каждой записи перечисляет
+# каталог, а вытесненная сессия просто перечитается из django_session.
+if os.environ.get("REDIS_URL"):
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+elif os.environ.get("SESSION_CACHE_DIR"):
+    CACHES["sessions"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ["SESSION_CACHE_DIR"],
+    }
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    SESSION_CACHE_ALIAS = "sessions"
+else:
+    SESSION_ENGINE = "django.contrib.sessions.backends.db"
+
+# Пользователь с профилем одним запросом (core/auth.py). ModelBackend
+# остаётся вторым, чтобы не разлогинить сессии, созданные до его появления.
+AUTHENTICATION_BACKENDS = [
+    "core.auth.ProfileBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
 # Валидация пароля
 AUTH_PASSWORD_VALIDATORS = [
     { "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator" },
@@ -111,6 +222,36 @@ TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 _default_telegram_chat_ids = "6110685730,8350084460"
 TELEGRAM_CHAT_IDS = os.environ.get("TELEGRAM_CHAT_IDS", _default_telegram_chat_ids).split(",")
 
+# Адрес Bot API (для локального стенда — см. core/telegram_fake.py) и лимиты
+# отправки: ~30 сообщений/с на бота и ~1 сообщение/с в один чат
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_GLOBAL_RATE = float(os.environ.get("TELEGRAM_GLOBAL_RATE", "30"))
+TELEGRAM_PER_CHAT_RATE = float(os.environ.get("TELEGRAM_PER_CHAT_RATE", "1"))
+# Имя бота для ссылок привязки t.me/<бот>?start=<токен> (core/broadcast.py)
+TELEGRAM_BOT_USERNAME = os.environ.get("TELEGRAM_BOT_USERNAME", "")
+
+# Через сколько после claim напоминать в Telegram, что доход снова готов
+# (см. core/reminders.py; в шаблоне my_scooters.html прокат длится 24 часа)
+CLAIM_REMINDER_DELAY = timedelta(seconds=int(os.environ.get("CLAIM_REMINDER_DELAY", str(24 * 60 * 60))))
+
+# Окна сводок для массовых уведомлений, сек (0 — отправлять каждое событие сразу).
+# Категории: earning, registration, referral_signup, referral (см. core/outbox.py)
+TELEGRAM_DIGEST_WINDOWS = {
+    "earning": int(os.environ.get("TELEGRAM_DIGEST_EARNING", "900")),
+    "registration": int(os.environ.get("TELEGRAM_DIGEST_REGISTRATION", "900")),
+    "referral_signup": int(os.environ.get("TELEGRAM_DIGEST_REFERRAL_SIGNUP", "900")),
+    "referral": int(os.environ.get("TELEGRAM_DIGEST_REFERRAL", "900")),
+}
+
+# Кэш публичных страниц для анонимов (core/pagecache.py): сколько страница
+# живёт на сервере и сколько браузер/CDN может не перепроверять её, сек
+PAGE_CACHE_TIMEOUT = int(os.environ.get("PAGE_CACHE_TIMEOUT", "300"))
+PAGE_CACHE_MAX_AGE = int(os.environ.get("PAGE_CACHE_MAX_AGE", "60"))
+
+# Сколько живут фрагменты {% cache %} в личном кабинете, сек. Устаревают они
+# раньше — по версии данных пользователя (core/versioning.py)
+TEMPLATE_FRAGMENT_TIMEOUT = int(os.environ.get("TEMPLATE_FRAGMENT_TIMEOUT", "86400"))
+
 
 LOGGING = {
     "version": 1,